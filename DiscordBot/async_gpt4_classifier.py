@@ -0,0 +1,211 @@
+import asyncio
+import random
+
+import aiohttp
+
+from classifier_registry import ClassificationError
+from gpt4_classifier import (
+    BATCH_MAX_ATTEMPTS,
+    BATCH_SIZE,
+    BATCH_SYSTEM_PROMPT,
+    CLASSIFIER_TYPE,
+    MODEL,
+    ClassificationResult,
+    SYSTEM_PROMPT,
+    format_batch_request,
+    parse_batch_response,
+    parse_classification,
+)
+from rate_limit import TokenBucket
+
+
+OPENAI_API_BASE = 'https://api.openai.com/v1'
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+MAX_REPLY_TOKENS = 50
+REPLY_TOKENS_PER_ITEM = 30
+
+
+def reply_content(body):
+    # The reply text of a chat completion body, or None if it has none
+    try:
+        content = body['choices'][0]['message']['content']
+    except (KeyError, IndexError, TypeError):
+        return None
+    return content if isinstance(content, str) else None
+
+
+def estimate_tokens(text):
+    # Rough OpenAI heuristic of ~4 characters per token
+    return len(text) // 4 + 1
+
+
+class AsyncGPT4MisinformationClassifier:
+    '''
+    asyncio GPT-4 backend. Requests share one pooled aiohttp session and go
+    through request-per-minute and token-per-minute buckets. 429s, 5xx
+    responses and network errors are retried with exponential backoff and
+    full jitter (honouring Retry-After). Every call returns a
+    ClassificationResult; failures are reported in its `error` field.
+
+    With `batch_size` > 1, classify_batch packs that many messages into each
+    chat request and re-requests only the items missing from the reply.
+
+    Point `base_url` at a local stub server to test or benchmark offline.
+    '''
+
+    def __init__(
+            self,
+            api_key,
+            base_url=OPENAI_API_BASE,
+            model=MODEL,
+            requests_per_minute=200,
+            tokens_per_minute=40000,
+            max_connections=16,
+            max_retries=5,
+            base_delay=1.0,
+            max_delay=30.0,
+            timeout=60.0,
+            batch_size=BATCH_SIZE,
+            max_batch_attempts=BATCH_MAX_ATTEMPTS,
+    ):
+        self.api_key = api_key
+        self.url = f'{base_url.rstrip("/")}/chat/completions'
+        self.model = model
+        self.classifier_type = CLASSIFIER_TYPE
+        self.model_id = model
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_connections = max_connections
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_batch_attempts = max_batch_attempts
+        self.session = None
+        self.counters = {
+            'requests': 0,
+            'retries': 0,
+            'rate_limited': 0,
+            'errors': 0,
+        }
+
+    def get_session(self):
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                headers={'Authorization': f'Bearer {self.api_key}'},
+                timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def complete(self, messages, reply_tokens=MAX_REPLY_TOKENS):
+        '''
+        Sends one chat completion request and returns the reply text.
+        Raises ClassificationError once all retries are exhausted; a 200
+        whose body has no reply text is retried like a 5xx.
+        '''
+        payload = {'model': self.model, 'messages': messages}
+        estimate = sum(estimate_tokens(m['content']) for m in messages) + reply_tokens
+        session = self.get_session()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.counters['retries'] += 1
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(estimate)
+            self.counters['requests'] += 1
+            retry_after = None
+            try:
+                async with session.post(self.url, json=payload) as response:
+                    if response.status == 200:
+                        body = await response.json()
+                        content = reply_content(body)
+                        if content is not None:
+                            usage = body.get('usage')
+                            used = usage.get('total_tokens') if isinstance(usage, dict) else None
+                            if isinstance(used, int) and used < estimate:
+                                self.token_bucket.refund(estimate - used)
+                            return content
+                        error = f'Malformed response body: {str(body)[:200]}'
+                    else:
+                        error = f'HTTP {response.status}'
+                    if response.status == 429:
+                        self.counters['rate_limited'] += 1
+                    if response.status != 200 and response.status not in RETRYABLE_STATUSES:
+                        break
+                    if 'Retry-After' in response.headers:
+                        try:
+                            retry_after = float(response.headers['Retry-After'])
+                        except ValueError:
+                            pass
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError: a 200 whose body is not JSON
+                error = f'{type(e).__name__}: {e}'
+            if attempt < self.max_retries:
+                await asyncio.sleep(self.backoff(attempt, retry_after))
+        self.counters['errors'] += 1
+        raise ClassificationError(error)
+
+    async def classify_message(self, message):
+        try:
+            output = await self.complete([
+                {'role': 'system', 'content': SYSTEM_PROMPT},
+                {'role': 'user', 'content': message},
+            ])
+        except ClassificationError as e:
+            return ClassificationResult(None, None, str(e))
+        try:
+            score, classification = parse_classification(output)
+        except ValueError as e:
+            self.counters['errors'] += 1
+            return ClassificationResult(None, None, str(e))
+        return ClassificationResult(score, classification)
+
+    async def classify_packed(self, messages):
+        output = await self.complete(
+            [
+                {'role': 'system', 'content': BATCH_SYSTEM_PROMPT},
+                {'role': 'user', 'content': format_batch_request(messages)},
+            ],
+            reply_tokens=REPLY_TOKENS_PER_ITEM * len(messages))
+        return parse_batch_response(output, range(len(messages)))
+
+    async def classify_chunk(self, messages):
+        results = [None] * len(messages)
+        pending = list(range(len(messages)))
+        error = 'Item missing from batch reply'
+        for _ in range(self.max_batch_attempts):
+            if not pending:
+                break
+            try:
+                parsed = await self.classify_packed([messages[i] for i in pending])
+            except ClassificationError as e:
+                error = str(e)
+                break
+            for j, i in enumerate(pending):
+                if j in parsed:
+                    results[i] = ClassificationResult(*parsed[j])
+            pending = [i for i in pending if results[i] is None]
+        if pending:
+            self.counters['errors'] += len(pending)
+        for i in pending:
+            results[i] = ClassificationResult(None, None, error)
+        return results
+
+    async def classify_batch(self, messages):
+        if self.batch_size <= 1:
+            return await asyncio.gather(*(self.classify_message(m) for m in messages))
+        chunks = await asyncio.gather(*(
+            self.classify_chunk(messages[i:i + self.batch_size])
+            for i in range(0, len(messages), self.batch_size)))
+        return [result for chunk in chunks for result in chunk]
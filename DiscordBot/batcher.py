@@ -0,0 +1,70 @@
+import asyncio
+import inspect
+
+from classifier_registry import ClassificationError
+
+
+class MicroBatcher:
+    '''
+    Collects classification requests from concurrent coroutines and scores
+    them together with a single `classify_batch` call.
+
+    A batch is flushed when `max_batch_size` texts are pending or when the
+    oldest pending text has waited `max_wait` seconds, whichever comes first.
+    Every caller gets back the (score, classification) tuple for its own text.
+    Whatever the backend raises reaches callers as ClassificationError.
+    '''
+
+    def __init__(self, classify_batch, max_batch_size=32, max_wait=0.005):
+        self.classify_batch = classify_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = []
+        self.flush_handle = None
+        self.tasks = set()
+
+    async def classify(self, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    async def classify_many(self, texts):
+        return await asyncio.gather(*(self.classify(text) for text in texts))
+
+    def flush(self):
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        while self.pending:
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self.run_batch(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run_batch(self, batch):
+        texts = [text for text, _ in batch]
+        try:
+            results = self.classify_batch(texts)
+            if inspect.isawaitable(results):
+                results = await results
+            if len(results) != len(texts):
+                raise ValueError(
+                    f'classify_batch returned {len(results)} results for {len(texts)} texts')
+        except Exception as e:
+            error = e
+            if not isinstance(e, ClassificationError):
+                error = ClassificationError(f'{type(e).__name__}: {e}')
+                error.__cause__ = e
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
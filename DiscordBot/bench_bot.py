@@ -0,0 +1,387 @@
+# End-to-end load benchmark for ModBot with a local Discord stand-in.
+#
+# Fake guild, channel, user and message objects feed the real on_message
+# handlers: channel messages go through run_disinfo_model -> compute_priority
+# -> assign_report_priority -> mod channel posting, and user report DM flows
+# walk the full Report conversation. The classifier is a stub with
+# configurable latency, so no network or model is needed. With --edits, that
+# many posted messages then get an embed unfurl followed by a burst of
+# --edit-burst text edits each, through on_raw_message_edit. With --cascade
+# the stub is the local tier and uncertain scores escalate to a slower stub
+# standing in for GPT-4.
+#
+# Reports p50/p95/p99 latency per stage, throughput and peak memory.
+#
+# Usage: python bench_bot.py [--messages 5000] [--reports 500] [--latency 0.01] [--prefilter prefilter.npz]
+#        [--edits 1000 --edit-burst 5] [--intake-max-bytes 1000000 --queue-capacity 500] [--cascade]
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+GROUP_NUM = '0'
+REMOTE_LATENCY = 0.2  # seconds per batch for the --cascade escalation stub
+
+
+class StubClassifier:
+    '''
+    Sleeps `latency` seconds per batch and returns a random score, above
+    the flagging threshold for roughly `flag_rate` of messages.
+    '''
+
+    def __init__(self, latency=0.01, flag_rate=0.2):
+        self.latency = latency
+        self.flag_rate = flag_rate
+        self.classifier_type = 'stub'
+        self.model_id = 'stub'
+
+    def classify_batch(self, messages):
+        time.sleep(self.latency)
+        return [
+            (random.uniform(0.5, 1.0) if random.random() < self.flag_rate else random.uniform(0.0, 0.2), None)
+            for _ in messages]
+
+
+class StubRemote(StubClassifier):
+    # Escalation tier for --cascade; the bot builds that tier itself from
+    # the classifier registry, with a local backend's constructor arguments
+    def __init__(self, num_threads=None, model_path=None):
+        super().__init__(REMOTE_LATENCY, flag_rate=0.5)
+
+
+class Stages:
+    def __init__(self):
+        self.samples = {}
+
+    def add(self, stage, seconds):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap_async(self, stage, fn):
+        @functools.wraps(fn)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def wrap(self, stage, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.add(stage, time.perf_counter() - start)
+        return timed
+
+    def report(self):
+        print(f'\n{"stage":<26} {"count":>7} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"max ms":>9}')
+        for stage, values in self.samples.items():
+            values = sorted(values)
+            pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))] * 1e3
+            print(f'{stage:<26} {len(values):>7} {pick(50):>9.3f} {pick(95):>9.3f} '
+                  f'{pick(99):>9.3f} {values[-1] * 1e3:>9.3f}')
+
+
+class FakeUser:
+    def __init__(self, user_id, name):
+        self.id = user_id
+        self.name = name
+        self.dm_channel = None
+
+    async def send(self, content=None, **kwargs):
+        return await self.dm_channel.send(content, **kwargs)
+
+
+class FakeGuild:
+    def __init__(self, guild_id, name):
+        self.id = guild_id
+        self.name = name
+        self.channels = {}
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class FakeChannel:
+    def __init__(self, channel_id, name, guild=None, send_latency=0.0, stages=None, stage=None):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.send_latency = send_latency
+        self.stages = stages
+        self.stage = stage
+        self.messages = {}
+        self.sent = 0
+        if guild is not None:
+            guild.channels[channel_id] = self
+
+    async def send(self, content=None, embed=None, **kwargs):
+        start = time.perf_counter()
+        if self.send_latency:
+            await asyncio.sleep(self.send_latency)
+        self.sent += 1
+        if self.stages is not None and self.stage is not None:
+            self.stages.add(self.stage, time.perf_counter() - start)
+
+    async def fetch_message(self, message_id):
+        if message_id not in self.messages:
+            # As Discord answers for a deleted message
+            import discord
+            raise discord.NotFound(types.SimpleNamespace(status=404, reason='Not Found'), 'Unknown Message')
+        return self.messages[message_id]
+
+    def get_partial_message(self, message_id):
+        return self.messages[message_id]
+
+
+class FakeMessage:
+    def __init__(self, message_id, content, author, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        channel.messages[message_id] = self
+
+    async def delete(self):
+        self.channel.messages.pop(self.id, None)
+
+
+class FakeEdit:
+    # Stands in for discord.RawMessageUpdateEvent
+    def __init__(self, message, before=None, data=None):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id
+        self.message = message
+        self.cached_message = before
+        self.data = data if data is not None else {'id': message.id, 'content': message.content}
+
+
+def load_bot_module(workdir):
+    '''
+    bot.py reads tokens.json and moderators.json from the working directory
+    at import time (and key.json for cascade mode), so import it from a
+    scratch directory holding dummies.
+    '''
+    with open(os.path.join(workdir, 'tokens.json'), 'w') as f:
+        json.dump({'discord': 'bench-token'}, f)
+    with open(os.path.join(workdir, 'key.json'), 'w') as f:
+        json.dump({'gpt4': 'bench-key'}, f)
+    with open(os.path.join(workdir, 'moderators.json'), 'w') as f:
+        json.dump({}, f)
+    os.chdir(workdir)
+    sys.path.insert(0, BOT_DIR)
+    import bot
+    return bot
+
+
+def build_bot(bot_module, args, stages):
+    classifier_type = bot_module.Classifier.ROBERTA_FAKENEWS
+    if args.cascade:
+        import classifier_registry
+        classifier_registry.register('bench_remote', 'bench_bot', 'StubRemote', 'stub', 'remote', warmup=False)
+        bot_module.CASCADE_REMOTE_BACKEND = 'bench_remote'
+        classifier_type = bot_module.Classifier.CASCADE
+    client = bot_module.ModBot(
+        mode=bot_module.Mode[args.mode],
+        classifier_type=classifier_type,
+        classifier_factory=functools.partial(StubClassifier, args.latency, args.flag_rate))
+    client._connection.user = FakeUser(1, f'Group {GROUP_NUM} Bot')
+    client.group_num = GROUP_NUM
+
+    guild = FakeGuild(100, 'bench guild')
+    channel = FakeChannel(200, f'group-{GROUP_NUM}', guild)
+    mod_channel = FakeChannel(
+        201, f'group-{GROUP_NUM}-mod', guild,
+        send_latency=args.send_latency, stages=stages, stage='mod_channel_send')
+    client.mod_channels[guild.id] = mod_channel
+    if args.deadline is not None:
+        client.deadline = args.deadline
+    if args.prefilter is not None:
+        client.prefilter = bot_module.Prefilter.load(args.prefilter)
+    if args.intake_max_bytes is not None:
+        client.intake = bot_module.Intake(
+            max_bytes=args.intake_max_bytes,
+            degrade_fraction=client.intake.degrade_bytes / client.intake.max_bytes)
+    if args.queue_capacity is not None:
+        client.queue_capacity = args.queue_capacity
+    client.get_guild = lambda guild_id: guild if guild_id == guild.id else None
+    client.get_all_channels = lambda: iter(guild.channels.values())
+    client.get_channel = guild.get_channel
+
+    # Time the hot-path stages on this instance only
+    client.run_disinfo_model = stages.wrap_async('run_disinfo_model', client.run_disinfo_model)
+    client.compute_priority = stages.wrap('compute_priority', client.compute_priority)
+    client.assign_report_priority = stages.wrap('assign_report_priority', client.assign_report_priority)
+    client.handle_channel_message = stages.wrap_async('handle_channel_message', client.handle_channel_message)
+    client.handle_dm = stages.wrap_async('handle_dm', client.handle_dm)
+    client.handle_edit = stages.wrap_async('handle_edit', client.handle_edit)
+    return client, guild, channel
+
+
+async def channel_traffic(client, channel, corpus, n, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    author = FakeUser(10, 'poster')
+
+    async def post(i):
+        async with semaphore:
+            message = FakeMessage(10_000 + i, f'{random.choice(corpus)} #{i}', author, channel)
+            await client.on_message(message)
+
+    await asyncio.gather(*(post(i) for i in range(n)))
+
+
+async def edit_traffic(client, channel, n, burst, interval=0.05):
+    # Edits the first n posted messages: an embed unfurl (text unchanged),
+    # then `burst` text edits `interval` seconds apart
+    author = FakeUser(10, 'poster')
+
+    async def edit(message_id):
+        before = channel.messages[message_id]
+        unfurled = FakeMessage(message_id, before.content, author, channel)
+        await client.on_raw_message_edit(FakeEdit(unfurled, before=before))
+        for k in range(burst):
+            await asyncio.sleep(interval)
+            before = channel.messages[message_id]
+            edited = FakeMessage(message_id, f'{before.content} (edit {k + 1})', author, channel)
+            await client.on_raw_message_edit(FakeEdit(edited, before=before))
+
+    await asyncio.gather(*(edit(10_000 + i) for i in range(n)))
+    await asyncio.gather(*client.edit_tasks)
+
+
+async def report_flow(client, guild, channel, i):
+    # One user walking the whole report conversation in their DMs
+    user = FakeUser(1_000_000 + i, f'reporter{i}')
+    dm = FakeChannel(2_000_000 + i, f'dm-{i}')
+    user.dm_channel = dm
+    target = FakeMessage(3_000_000 + i, f'Reported claim number {i}: the moon is hollow.', FakeUser(11, 'poster'), channel)
+    link = f'https://discord.com/channels/{guild.id}/{channel.id}/{target.id}'
+    for step, content in enumerate(['report', link, 'yes', '1', '1', '2', '4']):
+        message = FakeMessage(4_000_000 + i * 10 + step, content, user, dm)
+        message.guild = None
+        await client.on_message(message)
+
+
+async def dm_traffic(client, guild, channel, n, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def flow(i):
+        async with semaphore:
+            await report_flow(client, guild, channel, i)
+
+    await asyncio.gather(*(flow(i) for i in range(n)))
+
+
+async def run(args, bot_module, corpus):
+    stages = Stages()
+    client, guild, channel = build_bot(bot_module, args, stages)
+    await client.setup_hook()
+    await client.classifier_ready.wait()
+
+    start = time.perf_counter()
+    await channel_traffic(client, channel, corpus, args.messages, args.concurrency)
+    channel_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    await dm_traffic(client, guild, channel, args.reports, args.concurrency)
+    dm_elapsed = time.perf_counter() - start
+
+    await asyncio.gather(*client.late_results)
+    start = time.perf_counter()
+    await edit_traffic(client, channel, min(args.edits, args.messages), args.edit_burst)
+    edit_elapsed = time.perf_counter() - start
+
+    await asyncio.gather(*client.late_results)
+    # Posting the coalesced digests within the mod channel's rate budget
+    start = time.perf_counter()
+    await client.notifier.close()
+    drain_elapsed = time.perf_counter() - start
+    await client.report_store.close()
+    for pool in client.classifier_pools:
+        pool.shutdown(wait=True)
+    client.score_store.close()
+    return stages, client, channel_elapsed, dm_elapsed, edit_elapsed, drain_elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--reports', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=256)
+    parser.add_argument('--latency', type=float, default=0.01, help='stub classifier seconds per batch')
+    parser.add_argument('--flag-rate', type=float, default=0.2)
+    parser.add_argument('--send-latency', type=float, default=0.0, help='seconds per mod channel post')
+    parser.add_argument('--mode', default='BEST_ACCURACY', choices=['BEST_ACCURACY', 'RAPID_RESPONSE_TO_HARM'])
+    parser.add_argument('--deadline', type=float, default=None, help="override the mode's scoring deadline (seconds)")
+    parser.add_argument('--edits', type=int, default=0, help='posted messages to edit afterwards')
+    parser.add_argument('--edit-burst', type=int, default=5, help='text edits per edited message')
+    parser.add_argument('--intake-max-bytes', type=int, default=None, help='override the intake memory bound')
+    parser.add_argument('--queue-capacity', type=int, default=None, help='override the report queue capacity')
+    parser.add_argument('--prefilter', default=None, help='trained prefilter to put in front of the classifier')
+    parser.add_argument('--cascade', action='store_true', help='escalate uncertain scores to a slower remote stub')
+    parser.add_argument('--trace-memory', action='store_true', help='track peak Python heap (slower)')
+    parser.add_argument('--verbose', action='store_true', help="keep the bot's debug prints")
+    args = parser.parse_args()
+    if args.prefilter is not None:
+        # Resolved before the bot module switches to its own working directory
+        args.prefilter = os.path.abspath(args.prefilter)
+
+    with open(os.path.join(BOT_DIR, 'data', 'messages-binary.csv')) as f:
+        corpus = [line.rsplit(',', 1)[0] for line in f if line.strip()]
+    random.seed(0)
+    workdir = tempfile.mkdtemp(prefix='bench_bot_')
+    bot_module = load_bot_module(workdir)
+
+    if args.trace_memory:
+        tracemalloc.start()
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    with quiet:
+        stages, client, channel_elapsed, dm_elapsed, edit_elapsed, drain_elapsed = asyncio.run(run(args, bot_module, corpus))
+
+    print(f'channel messages: {args.messages} in {channel_elapsed:.2f} s '
+          f'({args.messages / channel_elapsed:.0f} msg/s)')
+    print(f'report DM flows:  {args.reports} in {dm_elapsed:.2f} s '
+          f'({args.reports / dm_elapsed:.0f} flows/s, {7 * args.reports / dm_elapsed:.0f} DMs/s)')
+    if args.edits:
+        print(f'edited messages:  {min(args.edits, args.messages)} x {args.edit_burst} edits in {edit_elapsed:.2f} s, '
+              f'{client.edit_stats}')
+    print(f'queued reports:   high={len(client.high_priority_queue)} low={len(client.low_priority_queue)}')
+    load = client.load_stats()
+    cascade_stats = load.pop('cascade', None)
+    print(f'load:             {load}')
+    if cascade_stats is not None:
+        print(f'cascade:          {cascade_stats}')
+    print(f'result cache:     {client.result_cache.stats()}')
+    print(f'campaign index:   {client.campaign_index.stats()}')
+    print(f'notifications:    {client.notifier.stats()}, drained in {drain_elapsed:.1f} s')
+    if client.prefilter is not None:
+        print(f'prefilter:        {client.prefilter_stats}')
+    if client.deadline is not None:
+        print(f'deadline ({client.deadline} s): {client.deadline_stats}')
+    stages.report()
+    print(f'\npeak RSS:         {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB')
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f'peak Python heap: {peak / 2 ** 20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Benchmark: CampaignIndex insert and query rates.
+#
+# Indexes N messages from the labelled CSV as flagged, then queries lightly
+# edited copies of indexed messages (word swaps, drops, appended hashtags)
+# and unrelated messages. Reports inserts/s, queries/s, how many edited
+# copies were matched, how many unrelated messages matched by mistake, and
+# the index's memory footprint.
+#
+# Usage: python bench_campaign_index.py [--n 50000] [--queries 20000] [--edits 2]
+
+import argparse
+import random
+import time
+import tracemalloc
+
+from campaign_index import Campaign, CampaignIndex
+from evaluation import read_dataset
+
+
+SUFFIXES = ['#wakeup', '#truth', 'share this!!', 'RT', '#breaking', 'they dont want you to know']
+
+
+def light_edit(text, edits):
+    words = text.split()
+    for _ in range(edits):
+        op = random.random()
+        if op < 0.4 and len(words) > 3:
+            i = random.randrange(len(words) - 1)
+            words[i], words[i + 1] = words[i + 1], words[i]
+        elif op < 0.7 and len(words) > 6:
+            del words[random.randrange(len(words))]
+        else:
+            words.append(random.choice(SUFFIXES))
+    return ' '.join(words)
+
+
+def synthetic_messages(vocabulary, n):
+    # The CSVs only hold a few hundred lines, so build distinct messages of
+    # chat length from their vocabulary instead
+    return [' '.join(random.choices(vocabulary, k=random.randint(12, 40))) for _ in range(n)]
+
+
+def build_index(flagged, threshold):
+    index = CampaignIndex(threshold=threshold, max_entries=len(flagged))
+    for i, text in enumerate(flagged):
+        index.add(text, Campaign(f'report_{i}', 0.9, {}))
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', nargs='+', default=['data/messages-binary.csv', 'data/messages-gpt3-generated.csv'])
+    parser.add_argument('--n', type=int, default=50000, help='flagged messages indexed')
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--edits', type=int, default=2, help='edits per near-duplicate copy')
+    parser.add_argument('--threshold', type=float, default=0.7)
+    args = parser.parse_args()
+
+    random.seed(0)
+    vocabulary = sorted({word for path in args.data for line in read_dataset(path)[0] for word in line.split()})
+    flagged = synthetic_messages(vocabulary, args.n)
+    copies = [light_edit(random.choice(flagged), args.edits) for _ in range(args.queries // 2)]
+    unrelated = synthetic_messages(vocabulary, args.queries // 2)
+
+    start = time.perf_counter()
+    index = build_index(flagged, args.threshold)
+    insert_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matched = sum(index.query(text) is not None for text in copies)
+    false_matches = sum(index.query(text) is not None for text in unrelated)
+    query_elapsed = time.perf_counter() - start
+
+    queries = len(copies) + len(unrelated)
+    print(f'insert: {args.n} in {insert_elapsed:.2f} s ({args.n / insert_elapsed:,.0f}/s, '
+          f'{insert_elapsed / args.n * 1e6:.1f} us each)')
+    print(f'query:  {queries} in {query_elapsed:.2f} s ({queries / query_elapsed:,.0f}/s, '
+          f'{query_elapsed / queries * 1e6:.1f} us each)')
+    print(f'near-duplicate copies matched: {matched}/{len(copies)} ({matched / len(copies):.1%})')
+    print(f'unrelated messages matched:    {false_matches}/{len(unrelated)} '
+          f'({false_matches / len(unrelated):.2%})')
+
+    # Memory is measured on a second build since tracing slows inserts down
+    tracemalloc.start()
+    traced = build_index(flagged, args.threshold)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f'index memory: {memory / 2 ** 20:.1f} MiB for {len(traced)} entries '
+          f'({memory / len(index):.0f} B each), {index.stats()["buckets"]} buckets')
+
+
+if __name__ == '__main__':
+    main()
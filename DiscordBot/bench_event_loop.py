@@ -0,0 +1,103 @@
+# Benchmark: event-loop latency while N classifications run at once.
+#
+# A ticker coroutine wakes up every TICK seconds and records how late it was.
+# With "inline" scoring (the old synchronous run_disinfo_model) the lag grows
+# with the classifier latency; with the ClassifierPool it should stay flat.
+#
+# Usage: python bench_event_loop.py [--kind thread|process] [--latency 0.2]
+
+import argparse
+import asyncio
+import functools
+import time
+
+import classifier_pool
+
+
+TICK = 0.01
+
+
+class StubClassifier:
+    '''
+    Stand-in for a real classifier. `latency` seconds of waiting per batch
+    (like a GPT-4 round trip), optionally with `cpu` seconds of busy work
+    (like a local forward pass).
+    '''
+
+    def __init__(self, latency=0.2, cpu=0.0):
+        self.latency = latency
+        self.cpu = cpu
+
+    def classify_batch(self, messages):
+        deadline = time.perf_counter() + self.cpu
+        while time.perf_counter() < deadline:
+            pass
+        time.sleep(self.latency)
+        return [(0.5, None) for _ in messages]
+
+
+async def ticker(stop, lags):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def run(n, classify):
+    stop = asyncio.Event()
+    lags = []
+    tick_task = asyncio.ensure_future(ticker(stop, lags))
+    await asyncio.sleep(5 * TICK)
+    start = time.perf_counter()
+    await asyncio.gather(*(classify([f'message {i}']) for i in range(n)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await tick_task
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--kind', default=classifier_pool.THREAD,
+                        choices=[classifier_pool.THREAD, classifier_pool.PROCESS])
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--cpu', type=float, default=0.0)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--n', type=int, nargs='+', default=[1, 4, 16, 32])
+    args = parser.parse_args()
+
+    stub = StubClassifier(args.latency, args.cpu)
+
+    async def inline(messages):
+        return stub.classify_batch(messages)
+
+    print(f'{"mode":<8} {"N":>4} {"wall s":>8} {"lag p50 ms":>11} {"lag p99 ms":>11} {"lag max ms":>11}')
+    for n in args.n:
+        for name in ['inline', args.kind]:
+            if name == 'inline':
+                pool = None
+                classify = inline
+            else:
+                pool = classifier_pool.ClassifierPool(
+                    functools.partial(StubClassifier, args.latency, args.cpu),
+                    kind=args.kind,
+                    max_workers=args.workers,
+                    max_concurrency=args.workers)
+                classify = pool.classify_batch
+            elapsed, lags = asyncio.run(run(n, classify))
+            if pool is not None:
+                pool.shutdown(wait=True)
+            print(f'{name:<8} {n:>4} {elapsed:>8.2f} {percentile(lags, 50) * 1e3:>11.2f} '
+                  f'{percentile(lags, 99) * 1e3:>11.2f} {max(lags, default=0) * 1e3:>11.2f}')
+
+
+if __name__ == '__main__':
+    main()
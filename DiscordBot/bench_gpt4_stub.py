@@ -0,0 +1,122 @@
+# Benchmark: AsyncGPT4MisinformationClassifier against a local stub of the
+# chat completions endpoint, so throughput under rate limits can be measured
+# offline without an API key.
+#
+# The stub enforces its own requests-per-minute limit (answering 429 with
+# Retry-After) and adds a configurable latency per request. Run with a client
+# rpm above the stub's to exercise the retry path, or below it to check that
+# the token bucket alone keeps us out of 429s.
+#
+# Usage: python bench_gpt4_stub.py [--n 200] [--server-rpm 600] [--client-rpm 500]
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+from async_gpt4_classifier import AsyncGPT4MisinformationClassifier
+from gpt4_classifier import BATCH_SYSTEM_PROMPT
+
+
+class StubServer:
+    def __init__(self, rpm, latency, error_rate, garbage_rate):
+        self.rpm = rpm
+        self.latency = latency
+        self.error_rate = error_rate
+        self.garbage_rate = garbage_rate
+        self.window = []
+        self.served = 0
+        self.rejected = 0
+
+    async def chat_completions(self, request):
+        body = await request.json()
+        now = time.monotonic()
+        self.window = [t for t in self.window if now - t < 60]
+        if len(self.window) >= self.rpm:
+            self.rejected += 1
+            retry_after = 60 - (now - self.window[0])
+            return web.json_response(
+                {'error': {'message': 'Rate limit reached'}},
+                status=429,
+                headers={'Retry-After': f'{retry_after:.2f}'})
+        self.window.append(now)
+        await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            return web.json_response({'error': {'message': 'overloaded'}}, status=503)
+        self.served += 1
+        if body['messages'][0]['content'] == BATCH_SYSTEM_PROMPT:
+            items = json.loads(body['messages'][1]['content'])
+            # Drop the occasional item so the partial re-request path runs
+            content = json.dumps([
+                {'id': item['id'], 'score': round(random.random(), 2),
+                 'classification': 'Misleading information'}
+                for item in items if random.random() >= self.garbage_rate])
+        elif random.random() < self.garbage_rate:
+            content = 'I cannot help with that.'
+        else:
+            content = f'Score: {random.random():.2f}\nClassification: Misleading information'
+        prompt_tokens = sum(len(m['content']) // 4 + 1 for m in body['messages'])
+        return web.json_response({
+            'choices': [{'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'total_tokens': prompt_tokens + 12},
+        })
+
+    async def start(self, port):
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', port)
+        await site.start()
+        return runner
+
+
+async def run(args):
+    server = StubServer(args.server_rpm, args.latency, args.error_rate, args.garbage_rate)
+    runner = await server.start(args.port)
+    classifier = AsyncGPT4MisinformationClassifier(
+        'stub-key',
+        base_url=f'http://127.0.0.1:{args.port}/v1',
+        requests_per_minute=args.client_rpm,
+        tokens_per_minute=args.client_tpm,
+        max_connections=args.connections,
+        base_delay=0.05,
+        max_delay=2.0,
+        batch_size=args.batch_size)
+    messages = [f'Message number {i}: the moon landing was staged.' for i in range(args.n)]
+    start = time.perf_counter()
+    results = await classifier.classify_batch(messages)
+    elapsed = time.perf_counter() - start
+    await classifier.close()
+    await runner.cleanup()
+
+    ok = sum(1 for r in results if r.error is None)
+    print(f'messages:        {args.n}')
+    print(f'succeeded:       {ok}')
+    print(f'error results:   {args.n - ok}')
+    print(f'wall time:       {elapsed:.2f} s')
+    print(f'throughput:      {args.n / elapsed:.1f} msg/s ({args.n / elapsed * 60:.0f} msg/min)')
+    print(f'client counters: {classifier.counters}')
+    print(f'server 429s:     {server.rejected}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=200)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--server-rpm', type=int, default=600)
+    parser.add_argument('--client-rpm', type=int, default=500)
+    parser.add_argument('--client-tpm', type=int, default=400000)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--garbage-rate', type=float, default=0.01)
+    parser.add_argument('--batch-size', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
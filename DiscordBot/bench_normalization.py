@@ -0,0 +1,83 @@
+# Micro-benchmark: message normalization before classification.
+#
+# Compares the old path (always unidecode + uni2ascii, two classifier calls
+# per message) with MessageNormalizer on a mix of plain ASCII messages and
+# homoglyph-laden copies of the same messages.
+#
+# Usage: python bench_normalization.py [--homoglyph-share 0.1] [--n 100000]
+
+import argparse
+import csv
+import random
+import time
+
+from uni2ascii import uni2ascii
+from unidecode import unidecode
+
+from normalization import MessageNormalizer
+
+
+# Latin letters and look-alikes commonly used to dodge keyword filters
+HOMOGLYPHS = {
+    'a': ['а', 'ɑ', 'ａ'],
+    'c': ['с', 'ϲ'],
+    'e': ['е', 'е', 'ｅ'],
+    'i': ['і', 'ı'],
+    'o': ['о', 'ο', '০'],
+    'p': ['р'],
+    's': ['ѕ'],
+    'x': ['х'],
+    'y': ['у'],
+}
+
+
+def obfuscate(text, rate=0.3):
+    return ''.join(
+        random.choice(HOMOGLYPHS[ch]) if ch in HOMOGLYPHS and random.random() < rate else ch
+        for ch in text)
+
+
+def build_corpus(path, n, homoglyph_share):
+    with open(path, 'r') as f:
+        base = [row[0] for row in csv.reader(f) if row]
+    corpus = []
+    for _ in range(n):
+        text = random.choice(base)
+        if random.random() < homoglyph_share:
+            text = obfuscate(text)
+        corpus.append(text)
+    return corpus
+
+
+def old_variants(text):
+    return [unidecode(text), uni2ascii(text)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/messages-binary.csv')
+    parser.add_argument('--n', type=int, default=100000)
+    parser.add_argument('--homoglyph-share', type=float, default=0.1)
+    args = parser.parse_args()
+
+    random.seed(0)
+    corpus = build_corpus(args.data, args.n, args.homoglyph_share)
+
+    start = time.perf_counter()
+    old_calls = sum(len(old_variants(text)) for text in corpus)
+    old_elapsed = time.perf_counter() - start
+
+    normalizer = MessageNormalizer()
+    start = time.perf_counter()
+    new_calls = sum(len(normalizer.variants(text)) for text in corpus)
+    new_elapsed = time.perf_counter() - start
+
+    print(f'messages:            {args.n} ({args.homoglyph_share:.0%} homoglyph-laden)')
+    print(f'old: {old_elapsed / args.n * 1e6:8.2f} us/msg, {old_calls} classifier calls')
+    print(f'new: {new_elapsed / args.n * 1e6:8.2f} us/msg, {new_calls} classifier calls')
+    print(f'normalizer stats:    {normalizer.stats()}')
+    print(f'calls saved:         {1 - new_calls / old_calls:.1%}')
+
+
+if __name__ == '__main__':
+    main()
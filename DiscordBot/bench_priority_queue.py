@@ -0,0 +1,85 @@
+# Benchmark: IndexedPriorityQueue with a million queued reports.
+#
+# Pushes N reports with random priorities 0-10, re-prioritizes and withdraws
+# a share of them, then drains the queue. The old list-and-sort queue (sort on
+# every enqueue, pop(0) on every dequeue) is timed at a much smaller size for
+# comparison since it is quadratic.
+#
+# Usage: python bench_priority_queue.py [--n 1000000] [--legacy-n 5000]
+
+import argparse
+import random
+import time
+
+from priority_queue import IndexedPriorityQueue
+
+
+class LegacyPriorityQueue:
+    # The list-based queue bot.py used before IndexedPriorityQueue
+    def __init__(self):
+        self.queue = []
+
+    def enqueue(self, item, priority):
+        self.queue.append((item, priority))
+        self.queue.sort(key=lambda x: x[1], reverse=True)
+
+    def dequeue(self):
+        return self.queue.pop(0)[0]
+
+
+def timed(label, n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {n:>9} ops {elapsed:8.3f} s {elapsed / max(n, 1) * 1e6:8.2f} us/op')
+
+
+def bench_indexed(n, update_share, remove_share):
+    clock = [0.0]
+    q = IndexedPriorityQueue(aging_rate=1 / 3600, clock=lambda: clock[0])
+    ids = [f'report_{i}' for i in range(n)]
+    priorities = [random.randint(0, 10) for _ in range(n)]
+
+    def push():
+        for item_id, priority in zip(ids, priorities):
+            clock[0] += 0.01
+            q.push(item_id, priority)
+    timed('push', n, push)
+
+    updated = random.sample(ids, int(n * update_share))
+    timed('update (re-prioritize)', len(updated),
+          lambda: [q.update(item_id, random.randint(0, 10)) for item_id in updated])
+
+    removed = random.sample(ids, int(n * remove_share))
+    timed('remove (withdraw)', len(removed), lambda: [q.remove(item_id) for item_id in removed])
+
+    remaining = len(q)
+
+    def drain():
+        while q:
+            q.pop()
+    timed('pop', remaining, drain)
+
+
+def bench_legacy(n):
+    q = LegacyPriorityQueue()
+    timed('legacy enqueue', n, lambda: [q.enqueue(i, random.randint(0, 10)) for i in range(n)])
+    timed('legacy dequeue', n, lambda: [q.dequeue() for _ in range(n)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=1000000)
+    parser.add_argument('--legacy-n', type=int, default=5000)
+    parser.add_argument('--update-share', type=float, default=0.1)
+    parser.add_argument('--remove-share', type=float, default=0.1)
+    args = parser.parse_args()
+
+    random.seed(0)
+    bench_indexed(args.n, args.update_share, args.remove_share)
+    if args.legacy_n:
+        bench_legacy(args.legacy_n)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Benchmark: fp32 DistilRoBERTa vs the dynamically quantized int8 backend.
+#
+# Parity: scores every message in the labelled CSV with both models and
+# compares accuracy, precision/recall and how often the two disagree at the
+# threshold. Latency: single-message p50/p95 and batched throughput for each.
+#
+# Usage: python bench_quantization.py [--threads 4] [--limit 500] [--batch-size 16]
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from evaluation import precision_recall, read_dataset
+from fn_classifier import DistilRoBERTaFakeNewsClassifier, QuantizedDistilRoBERTaFakeNewsClassifier
+
+
+def model_megabytes(model):
+    # State dict size; packed int8 Linear weights are included
+    return sum(
+        t.numel() * t.element_size()
+        for t in model.state_dict().values() if isinstance(t, torch.Tensor)) / 2 ** 20
+
+
+def score_all(classifier, messages, batch_size):
+    scores = []
+    for i in range(0, len(messages), batch_size):
+        scores.extend(score for score, _ in classifier.classify_batch(messages[i:i + batch_size]))
+    return np.array(scores)
+
+
+def latency(classifier, messages, batch_size):
+    single = []
+    for message in messages:
+        start = time.perf_counter()
+        classifier.classify_message(message)
+        single.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    score_all(classifier, messages, batch_size)
+    batched = time.perf_counter() - start
+    return np.percentile(single, 50) * 1e3, np.percentile(single, 95) * 1e3, len(messages) / batched
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/messages-binary.csv')
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--limit', type=int, default=None, help='only use the first N messages')
+    parser.add_argument('--latency-n', type=int, default=200, help='messages timed for latency')
+    args = parser.parse_args()
+
+    messages, labels = read_dataset(args.data)
+    if args.limit:
+        messages, labels = messages[:args.limit], labels[:args.limit]
+    y_true = np.asarray(labels)
+
+    backends = [
+        ('fp32', DistilRoBERTaFakeNewsClassifier(args.threads)),
+        ('int8', QuantizedDistilRoBERTaFakeNewsClassifier(args.threads)),
+    ]
+    print(f'{len(messages)} messages, {torch.get_num_threads()} intra-op threads\n')
+
+    scores = {}
+    print(f'{"backend":<8} {"size MB":>8} {"accuracy":>8} {"precision":>9} {"recall":>7} {"f1":>6}')
+    for name, classifier in backends:
+        scores[name] = score_all(classifier, messages, args.batch_size)
+        y_pred = (scores[name] > args.threshold).astype(int)
+        precision, recall, f1 = precision_recall(y_true, y_pred)
+        print(f'{name:<8} {model_megabytes(classifier.model):>8.1f} {np.mean(y_pred == y_true):>8.4f} '
+              f'{precision:>9.4f} {recall:>7.4f} {f1:>6.4f}')
+
+    diff = np.abs(scores['fp32'] - scores['int8'])
+    flips = np.sum((scores['fp32'] > args.threshold) != (scores['int8'] > args.threshold))
+    print(f'\nscore |fp32 - int8|: mean {diff.mean():.4f}, max {diff.max():.4f}')
+    print(f'decisions flipped at {args.threshold}: {flips}/{len(messages)}')
+
+    sample = messages[:args.latency_n]
+    print(f'\n{"backend":<8} {"p50 ms":>8} {"p95 ms":>8} {"batched msg/s":>14}')
+    for name, classifier in backends:
+        p50, p95, throughput = latency(classifier, sample, args.batch_size)
+        print(f'{name:<8} {p50:>8.2f} {p95:>8.2f} {throughput:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+# Benchmark: semantic verdict cache in front of GPT-4.
+#
+# Offline replay of the GPT-3-scored CSV, whose scores stand in for GPT-4
+# verdicts. Messages are embedded with DistilRoBERTa and streamed in order;
+# each one looks up its most similar earlier message. For each similarity
+# threshold, reports how many messages would have been served from the
+# cache (and so cost no API request), and how often the reused verdict
+# agrees with the message's own score, both as a binary label (see
+# convert_to_binary) and exactly. Exact repeats are dropped first since the
+# exact-text ResultCache already serves them.
+#
+# Also times SemanticCache lookups against a full cache.
+#
+# Usage: python bench_semantic_cache.py [--thresholds 0.9 0.95 0.97 0.99] [--capacity 20000]
+
+import argparse
+import time
+
+import numpy as np
+
+from convert_to_binary import binary_label
+from evaluation import read_dataset
+from fn_classifier import DistilRoBERTaFakeNewsClassifier
+from result_cache import normalize_text
+from semantic_cache import SemanticCache
+
+
+def embed_all(encoder, messages, batch_size):
+    return np.concatenate([
+        encoder.embed(messages[i:i + batch_size]) for i in range(0, len(messages), batch_size)])
+
+
+def distinct(messages, scores):
+    seen = set()
+    kept_messages, kept_scores = [], []
+    for message, score in zip(messages, scores):
+        key = normalize_text(message)
+        if key in seen:
+            continue
+        seen.add(key)
+        kept_messages.append(message)
+        kept_scores.append(score)
+    return kept_messages, kept_scores
+
+
+def replay(vectors, scores, thresholds):
+    # Row i's best match among rows 0..i-1: mask the diagonal and above
+    similarity = vectors @ vectors.T
+    similarity[np.triu_indices(len(vectors))] = -np.inf
+    best = similarity.argmax(axis=1)[1:]
+    best_similarity = similarity.max(axis=1)[1:]
+    own = np.asarray(scores)[1:]
+    reused = np.asarray(scores)[best]
+    own_labels = np.array([binary_label(s) for s in own])
+    reused_labels = np.array([binary_label(s) for s in reused])
+    for threshold in thresholds:
+        hits = best_similarity >= threshold
+        n = int(hits.sum())
+        if n:
+            label_agreement = float(np.mean(own_labels[hits] == reused_labels[hits]))
+            exact_agreement = float(np.mean(own[hits] == reused[hits]))
+            agreement = f'label agreement {label_agreement:6.1%}, exact score {exact_agreement:6.1%}'
+        else:
+            agreement = 'no hits'
+        print(f'  threshold {threshold:.2f}: hit rate {n / len(own):6.1%} ({n}/{len(own)}), {agreement}')
+
+
+def time_queries(dim, capacity, batch_sizes, threshold, repeats=200):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((capacity, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    cache = SemanticCache(dim, capacity=capacity, threshold=threshold)
+    start = time.perf_counter()
+    cache.add(vectors, [(1.0, None)] * capacity)
+    print(f'  fill {capacity} rows: {time.perf_counter() - start:.2f} s, '
+          f'{cache.vectors.nbytes / 2 ** 20:.1f} MiB of embeddings')
+    for batch_size in batch_sizes:
+        queries = vectors[rng.integers(0, capacity, batch_size)]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            cache.query(queries)
+        elapsed = (time.perf_counter() - start) / repeats
+        print(f'  query batch {batch_size:3d}: {elapsed * 1e3:7.2f} ms '
+              f'({elapsed / batch_size * 1e6:.0f} us per message)')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/messages-gpt3-generated.csv')
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.9, 0.95, 0.97, 0.99])
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--capacity', type=int, default=20000, help='cache size for the lookup timings')
+    args = parser.parse_args()
+
+    messages, scores = distinct(*read_dataset(args.data))
+    encoder = DistilRoBERTaFakeNewsClassifier()
+    start = time.perf_counter()
+    vectors = embed_all(encoder, messages, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f'embedded {len(messages)} distinct messages in {elapsed:.2f} s '
+          f'({elapsed / len(messages) * 1e3:.1f} ms each)')
+
+    print('replay (each message queries the ones before it):')
+    replay(vectors, scores, args.thresholds)
+
+    print('lookup cost:')
+    time_queries(vectors.shape[1], args.capacity, [1, 8, 32], max(args.thresholds))
+
+
+if __name__ == '__main__':
+    main()
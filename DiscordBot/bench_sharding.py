@@ -0,0 +1,196 @@
+# Benchmark: messages/s of the sharded mode as shards and classifier workers
+# are added, on one Linux box.
+#
+# For each core count N, runs N shard processes (ModBot with shard_id and
+# the fake Discord objects from bench_bot) and N classifier worker processes
+# behind one ClassifierService; shard 0 is the coordinator and files what the
+# others forward. The classifier burns `--work-ms` of CPU per message with
+# the GIL held, standing in for tokenization and inference. The fixed total
+# of `--messages` channel messages is split across the shards, and the
+# baseline is a single ModBot scoring on an in-process thread pool.
+#
+# Only run this on as many cores as the largest count: with fewer, the extra
+# shards and workers share them and only add queue and pickling overhead
+# (on a 1-core box 2 shards run at ~0.7x of the baseline, 4 at ~0.6-0.8x).
+#
+# Usage: python bench_sharding.py [--cores 1 2 4 8] [--messages 20000] [--work-ms 1.0]
+
+import argparse
+import asyncio
+import contextlib
+import functools
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from bench_bot import BOT_DIR, GROUP_NUM, FakeChannel, FakeGuild, FakeMessage, FakeUser, load_bot_module
+from sharding import CONTEXT, ClassifierService
+
+
+class BusyClassifier:
+    '''
+    Holds the CPU (and the GIL) for `work_ms` per message and returns a
+    random score, above the flagging threshold for `flag_rate` of them.
+    '''
+
+    def __init__(self, work_ms=1.0, flag_rate=0.2):
+        self.work = work_ms / 1e3
+        self.flag_rate = flag_rate
+        self.classifier_type = 'stub'
+        self.model_id = 'stub'
+
+    def classify_batch(self, messages):
+        end = time.perf_counter() + self.work * len(messages)
+        while time.perf_counter() < end:
+            pass
+        return [
+            (random.uniform(0.5, 1.0) if random.random() < self.flag_rate else random.uniform(0.0, 0.2), None)
+            for _ in messages]
+
+
+def corpus_text(corpus, message_id):
+    # Shards and the coordinator derive the same text from a message id
+    return f'{corpus[message_id % len(corpus)]} #{message_id}'
+
+
+def build_shard(bot_module, shard_id, shard_count, classifier_client, filings, factory):
+    client = bot_module.ModBot(
+        mode=bot_module.Mode.BEST_ACCURACY,
+        classifier_type=bot_module.Classifier.ROBERTA_FAKENEWS,
+        classifier_factory=factory,
+        shard_id=shard_id,
+        shard_count=shard_count,
+        classifier_client=classifier_client,
+        filings=filings)
+    client._connection.user = FakeUser(1, f'Group {GROUP_NUM} Bot')
+    client.group_num = GROUP_NUM
+    guild = FakeGuild(100 + shard_id, f'shard {shard_id} guild')
+    channel = FakeChannel(1000 + shard_id, f'group-{GROUP_NUM}', guild)
+    client.mod_channels[guild.id] = FakeChannel(2000 + shard_id, f'group-{GROUP_NUM}-mod', guild)
+
+    async def fetch_channel(channel_id):
+        # Stands in for the REST fetch of another shard's mod channel, made
+        # once per guild; forwarded messages themselves are never fetched
+        return FakeChannel(channel_id, f'group-{GROUP_NUM}-mod')
+
+    client.fetch_channel = fetch_channel
+    return client, channel
+
+
+async def shard_traffic(client, channel, corpus, shard_id, n, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    author = FakeUser(10, 'poster')
+
+    async def post(i):
+        async with semaphore:
+            message_id = (shard_id + 1) * 10_000_000 + i
+            await client.on_message(FakeMessage(message_id, corpus_text(corpus, message_id), author, channel))
+
+    await asyncio.gather(*(post(i) for i in range(n)))
+    await asyncio.gather(*client.late_results)
+
+
+async def run_shard_async(bot_module, args, shard_id, shard_count, classifier_client, filings,
+                          corpus, start_barrier, shards_done, results):
+    factory = None if classifier_client is not None else functools.partial(BusyClassifier, args.work_ms)
+    client, channel = build_shard(bot_module, shard_id, shard_count, classifier_client, filings, factory)
+    await client.setup_hook()
+    await client.classifier_ready.wait()
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, start_barrier.wait)
+    await shard_traffic(client, channel, corpus, shard_id, args.messages // shard_count, args.concurrency)
+    if not client.is_coordinator:
+        # Flush this process's buffered filings into the pipe, so they all
+        # precede the coordinator's end marker
+        filings.close()
+        await loop.run_in_executor(None, filings.join_thread)
+    await loop.run_in_executor(None, shards_done.wait)
+    if client.is_coordinator and filings is not None:
+        # Every shard has forwarded all it will; file the rest and stop
+        filings.put(None)
+        while client.filing_tasks:
+            await asyncio.gather(*client.filing_tasks)
+    results.put((shard_id, time.time(), len(client.high_priority_queue) + len(client.low_priority_queue)))
+    await client.notifier.close()
+    if client.report_store is not None:
+        await client.report_store.close()
+    for pool in client.classifier_pools:
+        pool.shutdown(wait=True)
+    client.score_store.close()
+    if classifier_client is not None:
+        classifier_client.close()
+
+
+def run_shard(workdir, args, shard_id, shard_count, classifier_client, filings, start_barrier, shards_done, results):
+    with contextlib.redirect_stdout(io.StringIO()):
+        # measure() wrote the dummy config files already; just import
+        os.chdir(workdir)
+        sys.path.insert(0, BOT_DIR)
+        import bot as bot_module
+        random.seed(shard_id)
+        with open(os.path.join(BOT_DIR, 'data', 'messages-binary.csv')) as f:
+            corpus = [line.rsplit(',', 1)[0] for line in f if line.strip()]
+        asyncio.run(run_shard_async(
+            bot_module, args, shard_id, shard_count, classifier_client, filings,
+            corpus, start_barrier, shards_done, results))
+
+
+def measure(args, cores, sharded):
+    workdir = tempfile.mkdtemp(prefix='bench_sharding_')
+    with contextlib.redirect_stdout(io.StringIO()):
+        load_bot_module(workdir)
+    shard_count = cores if sharded else 1
+    service = None
+    filings = None
+    if sharded:
+        service = ClassifierService(functools.partial(BusyClassifier, args.work_ms), shard_count, workers=cores)
+        service.start()
+        filings = CONTEXT.Queue()
+    start_barrier = CONTEXT.Barrier(shard_count + 1)
+    shards_done = CONTEXT.Barrier(shard_count)
+    results = CONTEXT.Queue()
+    processes = [
+        CONTEXT.Process(
+            target=run_shard,
+            args=(workdir, args, shard_id, shard_count, service.client(shard_id) if service else None,
+                  filings, start_barrier, shards_done, results))
+        for shard_id in range(shard_count)]
+    for process in processes:
+        process.start()
+    start_barrier.wait()
+    start = time.time()
+    finished = [results.get() for _ in processes]
+    elapsed = max(done for _, done, _ in finished) - start
+    queued = sum(count for _, _, count in finished)
+    for process in processes:
+        process.join()
+    if service is not None:
+        service.shutdown()
+    return elapsed, queued
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cores', type=int, nargs='+', default=None, help='default: powers of two up to the core count')
+    parser.add_argument('--messages', type=int, default=20000, help='total channel messages per run')
+    parser.add_argument('--work-ms', type=float, default=1.0, help='classifier CPU time per message')
+    parser.add_argument('--concurrency', type=int, default=256, help='in-flight messages per shard')
+    args = parser.parse_args()
+    cores = args.cores or [2 ** i for i in range(os.cpu_count().bit_length()) if 2 ** i <= os.cpu_count()]
+
+    print(f'{os.cpu_count()} cores, {args.messages} messages, {args.work_ms} ms classifier CPU each\n')
+    print(f'{"setup":<34} {"seconds":>8} {"msg/s":>8} {"speedup":>8} {"queued":>7}')
+    baseline, queued = measure(args, 1, sharded=False)
+    print(f'{"1 process, in-process thread pool":<34} {baseline:>8.2f} {args.messages / baseline:>8.0f} '
+          f'{1:>8.2f} {queued:>7}')
+    for n in cores:
+        elapsed, queued = measure(args, n, sharded=True)
+        print(f'{f"{n} shards + {n} classifier workers":<34} {elapsed:>8.2f} {args.messages / elapsed:>8.0f} '
+              f'{baseline / elapsed:>8.2f} {queued:>7}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# Benchmark: worker memory and time to first inference with and without
+# shared DistilRoBERTa weights.
+#
+# For each worker count, starts N worker processes three ways:
+#   separate  spawned workers each load their own copy with from_pretrained
+#             (what the process pool does today)
+#   mapped    spawned workers each memory-map the exported safetensors file
+#   forked    this process maps it once and forks the workers
+#             (ClassifierPool kind FORK, sharding.py --share-weights)
+# Each worker scores one message, then reports its USS (private pages) and
+# PSS (private pages plus its share of shared ones) from
+# /proc/self/smaps_rollup while all N are still alive. Time to first
+# inference runs from the start of the run until the last worker has scored
+# its message. Total PSS includes this process, which holds the forked
+# workers' weights.
+#
+# Usage: python bench_shared_weights.py [--workers 1 4 8] [--model-dir shared_model]
+
+import argparse
+import functools
+import multiprocessing
+import os
+import time
+
+from fn_classifier import DistilRoBERTaFakeNewsClassifier, WEIGHTS_FILE, export_model
+
+
+MESSAGE = 'Scientists confirm the moon landing was filmed on the moon.'
+MODES = ['separate', 'mapped', 'forked']
+
+
+def memory_rollup():
+    fields = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0]) * 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'uss': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def worker(factory, start, results, done):
+    classifier = factory()
+    classifier.classify_message(MESSAGE)
+    results.put((time.time() - start, memory_rollup()))
+    done.wait()
+
+
+def measure(mode, workers, model_dir):
+    start = time.time()
+    if mode == 'forked':
+        context = multiprocessing.get_context('fork')
+        classifier = DistilRoBERTaFakeNewsClassifier(num_threads=1, model_path=model_dir)
+        factory = lambda: classifier
+    else:
+        context = multiprocessing.get_context('spawn')
+        model_path = model_dir if mode == 'mapped' else None
+        factory = functools.partial(DistilRoBERTaFakeNewsClassifier, 1, model_path=model_path)
+    results = context.Queue()
+    done = context.Event()
+    processes = [context.Process(target=worker, args=(factory, start, results, done)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    parent = memory_rollup()
+    done.set()
+    for process in processes:
+        process.join()
+    first_inference = max(elapsed for elapsed, _ in reports)
+    mean = lambda key: sum(memory[key] for _, memory in reports) / workers / 2 ** 20
+    total_pss = (sum(memory['pss'] for _, memory in reports) + parent['pss']) / 2 ** 20
+    return first_inference, mean('uss'), mean('pss'), parent['pss'] / 2 ** 20, total_pss
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--model-dir', default='shared_model', help='exported here first if missing')
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    args = parser.parse_args()
+
+    if not os.path.isfile(os.path.join(args.model_dir, WEIGHTS_FILE)):
+        export_model(args.model_dir)
+    size = os.path.getsize(os.path.join(args.model_dir, WEIGHTS_FILE)) / 2 ** 20
+    print(f'weights: {size:.0f} MiB ({args.model_dir}/{WEIGHTS_FILE})\n')
+    print(f'{"mode":<9} {"workers":>7} {"first inf s":>11} {"USS/worker":>10} {"PSS/worker":>10} '
+          f'{"parent PSS":>10} {"total PSS":>10}   (MiB)')
+    # Forked runs last: forking is only safe before this process has
+    # started threads of its own
+    for mode in args.modes:
+        for workers in args.workers:
+            first_inference, uss, pss, parent_pss, total_pss = measure(mode, workers, args.model_dir)
+            print(f'{mode:<9} {workers:>7} {first_inference:>11.2f} {uss:>10.1f} {pss:>10.1f} '
+                  f'{parent_pss:>10.1f} {total_pss:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
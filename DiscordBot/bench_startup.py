@@ -0,0 +1,101 @@
+# Benchmark: bot startup time per classifier backend.
+#
+# Each backend is measured in a fresh interpreter so import costs are real:
+#   import   - `import bot` (backends are no longer imported here)
+#   init     - ModBot(...) construction
+#   ready    - setup_hook until the classifier is loaded and warmed up, while
+#              a simulated gateway connect of --connect seconds runs alongside
+#   first    - latency of the first message scored after ready
+# The `eager` row imports both classifier modules up front, which is what
+# every startup paid before the registry, whichever backend was selected.
+#
+# Usage: python bench_startup.py [--backends gpt4 roberta_fakenews] [--connect 1.5]
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+
+
+def child(backend, connect):
+    timings = {}
+    start = time.perf_counter()
+    if backend == 'eager':
+        import fn_classifier
+        import gpt4_classifier
+    import bot
+    timings['import'] = time.perf_counter() - start
+    if backend == 'eager':
+        print(json.dumps(timings))
+        return
+
+    start = time.perf_counter()
+    client = bot.ModBot(mode=bot.Mode.BEST_ACCURACY, classifier_type=bot.Classifier[backend.upper()])
+    timings['init'] = time.perf_counter() - start
+
+    async def run():
+        start = time.perf_counter()
+        await client.setup_hook()
+        await asyncio.gather(asyncio.sleep(connect), client.classifier_ready.wait())
+        timings['ready'] = time.perf_counter() - start
+        if bot.classifier_registry.get(client.classifier_backend).warmup:
+            # Remote backends would spend a real API call here
+            start = time.perf_counter()
+            await client.run_disinfo_model(FakeMessage('The earth is flat.'))
+            timings['first'] = time.perf_counter() - start
+        await client.report_store.close()
+        for pool in client.classifier_pools:
+            pool.shutdown()
+
+    asyncio.run(run())
+    print(json.dumps(timings))
+
+
+def measure(backend, connect):
+    # bot.py reads its config files from the working directory at import
+    workdir = tempfile.mkdtemp(prefix='bench_startup_')
+    for name, content in [
+            ('tokens.json', {'discord': 'bench-token'}),
+            ('moderators.json', {}),
+            ('key.json', {'gpt4': 'sk-bench'})]:
+        with open(os.path.join(workdir, name), 'w') as f:
+            json.dump(content, f)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [BOT_DIR, os.environ.get('PYTHONPATH')])))
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', backend, '--connect', str(connect)],
+        cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', nargs='+', default=['eager', 'gpt4', 'gpt4_async', 'roberta_fakenews'])
+    parser.add_argument('--connect', type=float, default=1.5, help='simulated gateway connect seconds')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.connect)
+        return
+
+    print(f'{"backend":<22} {"import s":>9} {"init s":>8} {"ready s":>8} {"first ms":>9}')
+    for backend in args.backends:
+        t = measure(backend, args.connect)
+        cell = lambda key, width, scale=1: f'{t[key] * scale:>{width}.2f}' if key in t else f'{"-":>{width}}'
+        print(f'{backend:<22} {cell("import", 9)} {cell("init", 8)} {cell("ready", 8)} {cell("first", 9, 1e3)}')
+
+
+if __name__ == '__main__':
+    main()
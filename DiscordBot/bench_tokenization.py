@@ -0,0 +1,111 @@
+# Benchmark: length-aware tokenization on a length-skewed corpus.
+#
+# Builds a synthetic corpus where most messages are single chat lines from
+# the labelled CSV and a tail are long pastes (several to a hundred lines
+# joined, many past the 512-token limit). Compares:
+#   padded     - the old path: each batch padded to its longest message
+#                (truncated at 512 here, since the old path errored past it)
+#   truncate   - length buckets, long messages truncated
+#   chunk-max  - length buckets, long messages scored as overlapping windows
+#   chunk-mean   and aggregated by max or mean
+# and reports throughput, the share of computed tokens that were padding and
+# the number of windows run.
+#
+# Usage: python bench_tokenization.py [--n 1000] [--long-share 0.05] [--batch-size 32]
+
+import argparse
+import random
+import time
+
+import torch
+from torch import nn
+
+from evaluation import read_dataset
+from fn_classifier import MAX_LENGTH, DistilRoBERTaFakeNewsClassifier
+
+
+def synthetic_corpus(lines, n, medium_share, long_share):
+    corpus = []
+    for _ in range(n):
+        r = random.random()
+        if r < long_share:
+            count = random.randint(30, 120)
+        elif r < long_share + medium_share:
+            count = random.randint(3, 15)
+        else:
+            count = 1
+        corpus.append(' '.join(random.choices(lines, k=count)))
+    random.shuffle(corpus)
+    return corpus
+
+
+def run_padded(classifier, corpus, batch_size):
+    tokens = pad_tokens = 0
+    for i in range(0, len(corpus), batch_size):
+        encoding = classifier.tokenizer(
+            corpus[i:i + batch_size],
+            padding=True,
+            truncation=True,
+            max_length=MAX_LENGTH,
+            return_tensors='pt')
+        tokens += encoding['attention_mask'].numel()
+        pad_tokens += int((encoding['attention_mask'] == 0).sum())
+        with torch.inference_mode():
+            outputs = classifier.model(**encoding)
+        nn.functional.softmax(outputs.logits, dim=-1)
+    return tokens, pad_tokens, len(corpus)
+
+
+def run_bucketed(classifier, corpus, batch_size):
+    # Same work as classify_batch, with padding counted per bucket
+    tokens = pad_tokens = windows = 0
+    for i in range(0, len(corpus), batch_size):
+        batch = corpus[i:i + batch_size]
+        lengths = sorted(len(ids) for _, ids in classifier.tokenize(batch))
+        windows += len(lengths)
+        for j in range(0, len(lengths), classifier.bucket_size):
+            bucket = lengths[j:j + classifier.bucket_size]
+            tokens += bucket[-1] * len(bucket)
+            pad_tokens += sum(bucket[-1] - length for length in bucket)
+        classifier.classify_batch(batch)
+    return tokens, pad_tokens, windows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--data', default='data/messages-binary.csv')
+    parser.add_argument('--n', type=int, default=1000)
+    parser.add_argument('--medium-share', type=float, default=0.15)
+    parser.add_argument('--long-share', type=float, default=0.05)
+    parser.add_argument('--batch-size', type=int, default=32, help='messages per classify_batch call')
+    parser.add_argument('--threads', type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(0)
+    lines, _ = read_dataset(args.data)
+    corpus = synthetic_corpus(lines, args.n, args.medium_share, args.long_share)
+    classifier = DistilRoBERTaFakeNewsClassifier(args.threads)
+    lengths = sorted(len(ids) for ids in classifier.tokenizer(corpus)['input_ids'])
+    print(f'{len(corpus)} messages; tokens p50 {lengths[len(lengths) // 2]}, '
+          f'p99 {lengths[int(len(lengths) * 0.99)]}, max {lengths[-1]}, '
+          f'{sum(length > MAX_LENGTH for length in lengths)} over {MAX_LENGTH}\n')
+
+    variants = [
+        ('padded', run_padded, {}),
+        ('truncate', run_bucketed, {'chunk_long': False}),
+        ('chunk-max', run_bucketed, {'aggregate': 'max'}),
+        ('chunk-mean', run_bucketed, {'aggregate': 'mean'}),
+    ]
+    print(f'{"path":<11} {"seconds":>8} {"msg/s":>8} {"windows":>8} {"padding":>8}')
+    for name, run, settings in variants:
+        classifier.chunk_long = settings.get('chunk_long', True)
+        classifier.aggregate = settings.get('aggregate', 'max')
+        start = time.perf_counter()
+        tokens, pad_tokens, windows = run(classifier, corpus, args.batch_size)
+        elapsed = time.perf_counter() - start
+        print(f'{name:<11} {elapsed:>8.2f} {len(corpus) / elapsed:>8.1f} {windows:>8} '
+              f'{pad_tokens / tokens:>8.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,27 +1,44 @@
 # bot.py
 from enum import Enum, auto
-from collections import defaultdict
+import asyncio
 from datetime import datetime
+import functools
+import heapq
 import json
 import logging
 import os
 import pdb
 import pprint
-import queue
 import random
 import re
 import requests
+import time
 from time import sleep
 
 import discord
 from discord.ext import commands
 import numpy as np
-from uni2ascii import uni2ascii
-from unidecode import unidecode
 
-import fn_classifier
-import gpt4_classifier
+from batcher import MicroBatcher
+from campaign_index import Campaign, CampaignIndex
+import cascade
+from cascade import Cascade
+import classifier_pool
+import classifier_registry
+from classifier_registry import ClassificationError
+from intake import DEGRADE, SHED, Intake, WaitTimes
+from normalization import MessageNormalizer
+from notifier import NotificationDispatcher
+from prefilter import PREFILTER_PATH, Prefilter
+from message_versions import MessageVersions
+from priority_queue import IndexedPriorityQueue
+from false_report_tracker import FalseReportTracker
 from report import Report
+from report_store import ReportStore
+from result_cache import ResultCache
+from score_store import PersistentScoreCache
+from semantic_cache import SemanticCache
+from sharding import ForwardedMessage
 
 
 # Set up logging to the console
@@ -48,15 +65,70 @@ with open(MODERATOR_LIST_PATH) as f:
 
 API_KEY_PATH = 'key.json'
 FALSE_REPORTING_LIMIT = 1
-FALSE_REPORTING_MEMORY_SPAN = 7
+FALSE_REPORTING_MEMORY_SPAN = 7  # days
 LOW_MID_TH = 0.2
 # MID_HIGH_TH = 0.8
 DISTRIBUTION_TH = 6
 VULNERABILITY_TH = 6
 MODEL_AUTHOR_ID = 'AUTO_FLAGGING_MODEL'
-MAX_QUEUE_SIZE = 1000000
+FORWARDED = 'FORWARDED_TO_COORDINATOR'  # a shard's stand-in report id for messages it forwarded
 OVERRIDE_HIGH_PRIORITY = 'Special attention needed'
 USER_REPORTING_PRIORITY = 9
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT = 0.005  # seconds
+CLASSIFIER_POOL_KIND = classifier_pool.THREAD
+CLASSIFIER_POOL_WORKERS = 2
+CLASSIFIER_MAX_CONCURRENCY = 4
+CLASSIFIER_TIMEOUT = 30  # seconds
+ROBERTA_NUM_THREADS = None  # torch intra-op threads; None uses one per core
+# Directory written by fn_classifier.export_model: weights are memory-mapped
+# instead of loaded. None loads the checkpoint from the hub. Workers sharing
+# one copy are forked by the launcher (sharding.py --share-weights): the bot
+# builds its pool once it is running threads, where forking is unsafe, so
+# CLASSIFIER_POOL_KIND cannot be classifier_pool.FORK.
+ROBERTA_MODEL_PATH = None
+CASCADE_LOCAL_BACKEND = 'roberta_fakenews'  # scores every message
+CASCADE_REMOTE_BACKEND = 'gpt4_async'  # scores only the uncertain band
+CASCADE_BAND = 0.1  # escalate local scores within this distance of LOW_MID_TH
+# Latency budget for scoring a channel message, per mode (seconds; None
+# waits for the primary classifier however long it takes)
+RAPID_RESPONSE_DEADLINE = 2.0
+BEST_ACCURACY_DEADLINE = None
+DEADLINE_FALLBACK_BACKEND = 'roberta_fakenews_int8'  # local scorer behind a remote primary
+PROVISIONAL_PRIORITY = 6  # used when a late message has no fallback score
+PRIMARY_TIER = 'primary'
+ESCALATION_TIER = 'escalation'
+FALLBACK_TIER = 'fallback'
+CAMPAIGN_SIMILARITY_TH = 0.7  # estimated Jaccard similarity of character 5-grams
+CAMPAIGN_TTL = 6 * 60 * 60  # seconds a flagged message stays in the campaign index
+CAMPAIGN_MAX_ENTRIES = 50000
+SEMANTIC_CACHE_CAPACITY = 20000  # GPT-4 verdicts kept for paraphrase lookups
+SEMANTIC_CACHE_TH = 0.97  # cosine similarity of DistilRoBERTa embeddings
+WARMUP_TEXT = 'Scientists confirm the moon landing was filmed on the moon.'
+GPT4_REQUESTS_PER_MINUTE = 200
+GPT4_TOKENS_PER_MINUTE = 40000
+RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+RESULT_CACHE_TTL = 6 * 60 * 60  # seconds
+SCORE_CACHE_PATH = 'scores.sqlite3'
+PRIORITY_AGING_PER_HOUR = 1  # priority points a queued report gains per hour
+REPORT_STORE_PATH = 'reports.sqlite3'
+REPORT_STORE_FLUSH_INTERVAL = 0.5  # seconds
+REPORT_RESTORE_CONCURRENCY = 8  # reported messages fetched at once when restoring reports
+NOTIFICATION_INTERVAL = 1.0  # seconds mod channel notifications wait to be coalesced
+NOTIFICATION_CLOSE_TIMEOUT = 10  # seconds spent posting queued notifications at shutdown
+MOD_CHANNEL_MESSAGES_PER_5S = 5  # Discord's per-channel send limit
+DISCORD_REQUESTS_PER_SECOND = 50  # Discord's global limit
+EDIT_DEBOUNCE = 1.0  # seconds without further edits before an edited message is re-scored
+EDIT_DEBOUNCE_MAX_WAIT = 5.0  # ... but no longer than this after its first edit
+EDIT_TRACKING_MAX_MESSAGES = 100000  # scored versions kept to recognize unchanged edits
+INTAKE_MAX_BYTES = 16 * 1024 * 1024  # messages waiting on the classifier; shed beyond this
+INTAKE_DEGRADE_FRACTION = 0.5  # above this share of it, score on the cheap local tier
+REPORT_QUEUE_MAX_BYTES = 64 * 1024 * 1024  # queued reports held in memory
+REPORT_QUEUE_ENTRY_BYTES = 4 * 1024  # a queued report and its entries (~1 KiB) plus its discord.Message
+REPORT_QUEUE_OVERFLOW = 'spill'  # or 'drop': what happens to the lowest-priority auto reports
+REPORT_QUEUE_SHED_TO = 0.9  # share of capacity an overflow sheds down to
+REPORT_QUEUE_REFILL_AT = 0.5  # spilled reports are reloaded once the queues drain below this share
+REPORT_QUEUE_REFILL_BATCH = 100
 
 
 class Mode(Enum):
@@ -67,53 +139,167 @@ class Mode(Enum):
 class Classifier(Enum):
     GPT4 = auto()
     ROBERTA_FAKENEWS = auto()
-
-
-# Simple priority queue implementation to rank reports by urgency 1-10
-class PriorityQueue:
-    def __init__(self):
-        self.queue = []
-
-    def is_empty(self):
-        return len(self.queue) == 0
-
-    def enqueue(self, item, priority):
-        self.queue.append((item, priority))
-        self.queue.sort(key=lambda x: x[1], reverse=True)
-
-    def dequeue(self):
-        if self.is_empty():
-            raise Exception("Priority queue is empty.")
-        return self.queue.pop(0)[0]
-
-    def peek(self):
-        if self.is_empty():
-            raise Exception("Priority queue is empty.")
-        return self.queue[0][0]
+    GPT4_ASYNC = auto()
+    ROBERTA_FAKENEWS_INT8 = auto()
+    CASCADE = auto()
 
 
 class ModBot(discord.Client):
-    def __init__(self, mode, classifier_type): 
+    def __init__(self, mode, classifier_type, classifier_factory=None,
+                 shard_id=None, shard_count=None, classifier_client=None, filings=None):
+        '''
+        `classifier_factory` overrides the classifier built for
+        `classifier_type`, e.g. with a stub in offline benchmarks.
+
+        In the sharded mode (see sharding.py) each gateway shard runs in its
+        own process: `classifier_client` replaces the primary classifier with
+        the shared worker pool, and `filings` is the queue over which shards
+        hand auto-flagged messages to shard 0, the coordinator, which alone
+        holds reports, queues and the campaign index.
+        '''
+        if CLASSIFIER_POOL_KIND == classifier_pool.FORK:
+            raise ValueError('CLASSIFIER_POOL_KIND cannot be FORK; use sharding.py --share-weights')
         intents = discord.Intents.default()
         intents.messages = True
-        super().__init__(command_prefix='.', intents=intents)
+        super().__init__(command_prefix='.', intents=intents, shard_id=shard_id, shard_count=shard_count)
         self.group_num = None
         self.mod_channels = {} # Map from guild to the mod channel id for that guild
-        self.high_priority_queue = queue.PriorityQueue(maxsize=MAX_QUEUE_SIZE)
-        self.low_priority_queue = queue.PriorityQueue(maxsize=MAX_QUEUE_SIZE) #Order reports by priority
+        # Order reports by priority; both queues are keyed by report id
+        self.high_priority_queue = IndexedPriorityQueue(aging_rate=PRIORITY_AGING_PER_HOUR / 3600)
+        self.low_priority_queue = IndexedPriorityQueue(aging_rate=PRIORITY_AGING_PER_HOUR / 3600)
         self.reports = {} # Map from user IDs to the state of their report
         self.moderators = moderators
         self.moderator_assignments = {}
-        self.false_report_history = defaultdict(list)
+        self.is_coordinator = not shard_id
+        self.false_report_tracker = FalseReportTracker(
+            limit=FALSE_REPORTING_LIMIT,
+            span_seconds=FALSE_REPORTING_MEMORY_SPAN * 24 * 60 * 60)
+        # Reports live on the coordinator; other shards never open the store
+        # (loading it prunes, so every shard would write to the shared file)
+        self.report_store = None
+        if self.is_coordinator:
+            self.report_store = ReportStore(
+                REPORT_STORE_PATH,
+                flush_interval=REPORT_STORE_FLUSH_INTERVAL)
+            self.false_report_tracker.restore(self.report_store.load_false_reports(
+                since=time.time() - self.false_report_tracker.span))
+        self.reports_restored = False
+        # Bounds the REST fetches of restored and reloaded reports' messages
+        self.restore_semaphore = asyncio.Semaphore(REPORT_RESTORE_CONCURRENCY)
         self.mode = mode
-        if classifier_type == Classifier.GPT4:
+        self.classifier_pools = []
+        self.async_classifier = None
+        # Scoring tiers: the primary classifier, the cascade's GPT-4 tier and
+        # the local model used when the primary misses its deadline
+        self.tier_namespaces = {}
+        self.tier_backends = {}
+        self.batchers = {}
+        # The backend is imported and loaded in setup_hook, overlapping the
+        # gateway connect; scoring waits on this until warmup has finished
+        self.classifier_ready = asyncio.Event()
+        self.classifier_task = None
+        self.classifier_error = None
+        self.classifier_factory = classifier_factory
+        self.classifier_client = classifier_client
+        self.filings = filings
+        self.filing_chain = {}
+        self.filing_tasks = set()
+        self.cascade = None
+        if classifier_type == Classifier.CASCADE:
+            # classifier_factory, if given, replaces the local tier only
+            self.classifier_backend = CASCADE_LOCAL_BACKEND
+            self.cascade = Cascade(LOW_MID_TH, CASCADE_BAND)
+            self.tier_backends[ESCALATION_TIER] = CASCADE_REMOTE_BACKEND
+        else:
+            self.classifier_backend = classifier_type.name.lower()
+        self.tier_backends[PRIMARY_TIER] = self.classifier_backend
+        if mode == Mode.RAPID_RESPONSE_TO_HARM:
+            self.deadline = RAPID_RESPONSE_DEADLINE
+        else:
+            self.deadline = BEST_ACCURACY_DEADLINE
+        primary_is_remote = classifier_factory is None and not classifier_registry.get(self.classifier_backend).warmup
+        if self.deadline is not None and self.cascade is None and primary_is_remote and DEADLINE_FALLBACK_BACKEND:
+            self.tier_backends[FALLBACK_TIER] = DEADLINE_FALLBACK_BACKEND
+        self.deadline_stats = {
+            'timeouts': 0,  # messages that missed the deadline
+            'fallbacks': 0,  # ... and were queued on a local fallback score
+            'provisional': 0,  # ... and were queued at PROVISIONAL_PRIORITY
+            'late_results': 0,  # primary answers that arrived after the deadline
+            'late_updates': 0,  # ... and re-prioritized a queued report
+            'late_failures': 0,
+        }
+        self.late_results = set()
+        self.api_key = None
+        if classifier_type == Classifier.CASCADE or (
+                classifier_factory is None and classifier_type in (Classifier.GPT4, Classifier.GPT4_ASYNC)):
             if not os.path.isfile(API_KEY_PATH):
                 raise Exception(f"{API_KEY_PATH} not found!")
             with open(API_KEY_PATH) as f:
-                api_key = json.load(f)['gpt4']
-            self.classifier = gpt4_classifier.GPT4MisinformationClassifier(api_key)
+                self.api_key = json.load(f)['gpt4']
+        self.tier_namespaces = {
+            tier: classifier_registry.namespace(backend) for tier, backend in self.tier_backends.items()}
+        # Remote tiers reuse verdicts for paraphrases of scored messages,
+        # embedded by a local DistilRoBERTa tier when one is loaded
+        self.semantic_tiers = {
+            tier for tier, backend in self.tier_backends.items()
+            if not classifier_registry.get(backend).warmup
+            and not (tier == PRIMARY_TIER and (classifier_factory or classifier_client) is not None)}
+        self.encoder_pool = None
+        self.semantic_cache = None
+        if self.cascade is not None and self.deadline is not None:
+            # The cascade's local score is the fallback; it is already cached
+            # by the time the GPT-4 tier misses the deadline
+            self.tier_namespaces[FALLBACK_TIER] = self.tier_namespaces[PRIMARY_TIER]
+        self.result_cache = ResultCache(
+            max_bytes=RESULT_CACHE_MAX_BYTES,
+            ttl=RESULT_CACHE_TTL)
+        self.score_store = PersistentScoreCache(SCORE_CACHE_PATH)
+        self.normalizer = MessageNormalizer()
+        self.notifier = NotificationDispatcher(
+            interval=NOTIFICATION_INTERVAL,
+            channel_rate=MOD_CHANNEL_MESSAGES_PER_5S,
+            channel_period=5.0,
+            global_rate=DISCORD_REQUESTS_PER_SECOND)
+        # Tier 0: channel messages it is confident are benign skip the
+        # classifier. Trained offline with prefilter.py; optional.
+        self.prefilter = None
+        if os.path.isfile(PREFILTER_PATH):
+            self.prefilter = Prefilter.load(PREFILTER_PATH)
+        self.prefilter_stats = {'skipped': 0, 'passed': 0}
+        # Edits are debounced, then re-scored only if the text changed; a
+        # message's report (known on the coordinator) is updated in place
+        self.message_versions = MessageVersions(max_entries=EDIT_TRACKING_MAX_MESSAGES)
+        self.pending_edits = {}  # message id -> [latest version, first edit, last edit]
+        self.edit_tasks = set()
+        self.edit_stats = {
+            'edits': 0,
+            'debounced': 0,  # superseded by a later edit within the window
+            'unchanged': 0,  # embed unfurls, pins, whitespace-only changes
+            'rescored': 0,
+            'updates': 0,  # ... and updated the message's open report
+        }
+        self.campaign_index = CampaignIndex(
+            threshold=CAMPAIGN_SIMILARITY_TH,
+            ttl=CAMPAIGN_TTL,
+            max_entries=CAMPAIGN_MAX_ENTRIES)
+        # Overload: messages past the intake's memory bound are scored on the
+        # cheap tier (the local fallback, or the cascade without GPT-4), then
+        # shed; past the report queues' bound the lowest-priority auto
+        # reports are spilled to the report store (or dropped)
+        if FALLBACK_TIER in self.tier_namespaces:
+            self.degrade_tier = FALLBACK_TIER
+        elif self.cascade is not None:
+            self.degrade_tier = PRIMARY_TIER
         else:
-            self.classifier = fn_classifier.DistilRoBERTaFakeNewsClassifier()
+            self.degrade_tier = None
+        self.intake = Intake(
+            max_bytes=INTAKE_MAX_BYTES,
+            degrade_fraction=INTAKE_DEGRADE_FRACTION if self.degrade_tier is not None else 1.0)
+        self.queue_capacity = REPORT_QUEUE_MAX_BYTES // REPORT_QUEUE_ENTRY_BYTES
+        self.spilled = set()  # ids of reports spilled to the report store
+        self.refill_task = None
+        self.queue_stats = {'spilled': 0, 'dropped': 0, 'reloaded': 0}
+        self.queue_wait_times = WaitTimes()
 
 
     async def on_ready(self):
@@ -134,7 +320,161 @@ class ModBot(discord.Client):
             for channel in guild.text_channels:
                 if channel.name == f'group-{self.group_num}-mod':
                     self.mod_channels[guild.id] = channel
-        
+
+        # on_ready fires again on reconnects; only restore once
+        if self.is_coordinator and not self.reports_restored:
+            self.reports_restored = True
+            await self.restore_reports()
+
+
+    async def setup_hook(self):
+        self.notifier.start()
+        if self.is_coordinator:
+            self.report_store.start()
+            if self.filings is not None:
+                task = asyncio.create_task(self.drain_filings())
+                self.filing_tasks.add(task)
+                task.add_done_callback(self.filing_tasks.discard)
+        self.classifier_task = asyncio.create_task(self.load_classifier())
+
+
+    def build_classifier(self, backend, factory=None):
+        # Blocking: imports the backend and loads its model, so it runs on a
+        # worker thread rather than the event loop. A cascade pairs a pooled
+        # local model with the native asyncio GPT-4 client.
+        encoder = False
+        if factory is None:
+            cls = classifier_registry.load(backend)
+            if backend == 'gpt4_async':
+                # Native asyncio backend: no worker pool needed
+                self.async_classifier = cls(
+                    self.api_key,
+                    requests_per_minute=GPT4_REQUESTS_PER_MINUTE,
+                    tokens_per_minute=GPT4_TOKENS_PER_MINUTE,
+                    timeout=CLASSIFIER_TIMEOUT)
+                return self.async_classifier.classify_batch
+            if backend == 'gpt4':
+                factory = functools.partial(cls, self.api_key)
+            else:
+                factory = functools.partial(cls, ROBERTA_NUM_THREADS, model_path=ROBERTA_MODEL_PATH)
+                encoder = classifier_registry.get(backend).encoder
+        pool = classifier_pool.ClassifierPool(
+            factory,
+            kind=CLASSIFIER_POOL_KIND,
+            max_workers=CLASSIFIER_POOL_WORKERS,
+            max_concurrency=CLASSIFIER_MAX_CONCURRENCY,
+            timeout=CLASSIFIER_TIMEOUT)
+        self.classifier_pools.append(pool)
+        if encoder and self.encoder_pool is None:
+            self.encoder_pool = pool
+        return pool.classify_batch
+
+
+    async def load_classifier(self):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        classifiers = {}
+        try:
+            for tier, backend in self.tier_backends.items():
+                if tier == PRIMARY_TIER and self.classifier_client is not None:
+                    # Shared worker processes, loaded and warmed up there
+                    classifiers[tier] = self.classifier_client.classify_batch
+                    continue
+                factory = self.classifier_factory if tier == PRIMARY_TIER else None
+                classifiers[tier] = await loop.run_in_executor(None, self.build_classifier, backend, factory)
+            loaded = time.perf_counter()
+            for tier, classify_batch in classifiers.items():
+                if tier == PRIMARY_TIER and self.classifier_client is not None:
+                    continue
+                if (tier == PRIMARY_TIER and self.classifier_factory is not None) or \
+                        classifier_registry.get(self.tier_backends[tier]).warmup:
+                    # The first forward pass is much slower than the rest (lazy
+                    # allocations, kernel selection); pay for it before real traffic
+                    await classify_batch([WARMUP_TEXT])
+        except Exception as e:
+            # Release waiting messages; classify_texts reports the failure
+            print(f'\n[DEBUG] Classifier {self.classifier_backend} failed to load: {e!r}')
+            self.classifier_error = e
+            self.classifier_ready.set()
+            return
+        for tier, classify_batch in classifiers.items():
+            self.batchers[tier] = MicroBatcher(
+                classify_batch,
+                max_batch_size=BATCH_MAX_SIZE,
+                max_wait=BATCH_MAX_WAIT)
+        if FALLBACK_TIER in self.tier_namespaces and FALLBACK_TIER not in self.batchers:
+            self.batchers[FALLBACK_TIER] = self.batchers[PRIMARY_TIER]
+        self.classifier_ready.set()
+        print(f'Classifier {self.classifier_backend} loaded in {loaded - start:.2f} s, '
+              f'warmed up in {time.perf_counter() - loaded:.2f} s')
+
+
+    async def restore_reports(self):
+        # Rebuild reports and queues from the open-report snapshots
+        records = self.report_store.load_open_reports()
+        spilled = [record for record in records if record['spilled']]
+        records = [record for record in records if not record['spilled']]
+        self.spilled = {record['report_id'] for record in spilled}
+        start = time.perf_counter()
+        restored = await asyncio.gather(*(self.restore_report(record) for record in records))
+        print(f'Restored {sum(restored)} of {len(records)} open reports in {time.perf_counter() - start:.2f} s '
+              f'({len(spilled)} more spilled to disk)')
+        self.enforce_queue_bound()
+
+
+    async def restore_report(self, record):
+        channel = self.get_channel(record['channel_id'])
+        message = None
+        if channel is not None:
+            try:
+                async with self.restore_semaphore:
+                    message = await channel.fetch_message(record['message_id'])
+            except (discord.errors.NotFound, discord.errors.Forbidden):
+                pass
+        if message is None:
+            # The reported message (or its channel) is gone
+            self.report_store.record_closed(record['report_id'], 'lost')
+            return False
+        self.reports[record['report_id']] = Report.from_record(self, message, record)
+        queue = self.high_priority_queue if record['tier'] == 'high' else self.low_priority_queue
+        # Carry over the time already spent queued so aging survives restarts
+        queue.push(
+            record['report_id'],
+            record['priority'],
+            enqueued_at=time.monotonic() - (time.time() - record['enqueued_at']))
+        return True
+
+
+    async def close(self):
+        # Post what is still queued while the connection is up, within
+        # bounds: the reports themselves are in the report store
+        dropped = await self.notifier.close(NOTIFICATION_CLOSE_TIMEOUT)
+        if dropped:
+            print(f'\n[DEBUG] Dropped {dropped} mod channel notification messages still queued at shutdown')
+        await super().close()
+        if self.classifier_task is not None and not self.classifier_task.done():
+            self.classifier_task.cancel()
+        for task in self.late_results:
+            task.cancel()
+        for task in self.edit_tasks:
+            task.cancel()
+        if self.refill_task is not None:
+            self.refill_task.cancel()
+        if self.filings is not None and self.is_coordinator:
+            # Unblocks drain_filings
+            self.filings.put(None)
+        for task in self.filing_tasks:
+            task.cancel()
+        for pool in self.classifier_pools:
+            pool.shutdown()
+        if self.classifier_client is not None:
+            self.classifier_client.close()
+        if self.async_classifier is not None:
+            await self.async_classifier.close()
+        self.score_store.close()
+        if self.report_store is not None:
+            await self.report_store.close()
+
 
     async def on_message(self, message):
         '''
@@ -156,12 +496,64 @@ class ModBot(discord.Client):
         '''
         Called when a message is edited. 
         '''
-        # message = payload.cached_message
-        # if message is None:
-        channel = self.get_channel(payload.channel_id)
-        message = await channel.fetch_message(payload.message_id)
+        before = payload.cached_message
+        message = payload.message
+        if message.author.id == self.user.id:
+            return
+        if 'content' not in payload.data or (before is not None and before.content == message.content):
+            # An embed unfurled or the message was pinned; the text is as scored
+            self.edit_stats['unchanged'] += 1
+            return
+        if not message.guild:
+            await self.handle_dm(message)
+            return
+        self.edit_stats['edits'] += 1
+        now = time.monotonic()
+        pending = self.pending_edits.get(message.id)
+        if pending is not None:
+            # Only the latest version of a burst is scored
+            self.edit_stats['debounced'] += 1
+            pending[0], pending[2] = message, now
+            return
+        self.pending_edits[message.id] = [message, now, now]
+        task = asyncio.create_task(self.debounce_edit(message.id))
+        self.edit_tasks.add(task)
+        task.add_done_callback(self.edit_tasks.discard)
+
+
+    async def debounce_edit(self, message_id):
+        pending = self.pending_edits[message_id]
+        while True:
+            _, first, last = pending
+            delay = min(last + EDIT_DEBOUNCE, first + EDIT_DEBOUNCE_MAX_WAIT) - time.monotonic()
+            if delay <= 0:
+                break
+            await asyncio.sleep(delay)
+        del self.pending_edits[message_id]
+        await self.handle_edit(pending[0])
 
-        await self.on_message(message)
+
+    async def handle_edit(self, message):
+        if not message.channel.name == f'group-{self.group_num}':
+            return
+        if self.message_versions.unchanged(message.id, message.content):
+            self.edit_stats['unchanged'] += 1
+            return
+        self.edit_stats['rescored'] += 1
+        if self.message_versions.report_id(message.id) is None:
+            # Nothing filed for it here (on a shard: the coordinator knows);
+            # score it like a new message
+            await self.handle_channel_message(message)
+            return
+        # Re-score straight away: the message's campaign is its own report,
+        # and the provisional path has already queued it once
+        self.message_versions.scored(message.id, message.content)
+        try:
+            score, info = await self.run_disinfo_model(message)
+        except (asyncio.TimeoutError, ClassificationError) as e:
+            print(f'\n[DEBUG] Classifier failed on edited message {message.id}: {e!r}')
+            return
+        await self.file_auto_report(message, score, info)
 
 
     async def process_message(self, message, author_id):
@@ -197,21 +589,29 @@ class ModBot(discord.Client):
                 await message.channel.send('`...ongoing moderation...`')
             else:
                 print('\n[DEBUG] Priority queues')
-                print(self.high_priority_queue.qsize())
-                print(self.low_priority_queue.qsize())
+                print(len(self.high_priority_queue))
+                print(len(self.low_priority_queue))
+                if self.high_priority_queue.empty() and self.low_priority_queue.empty():
+                    refill = self.refill_queues_soon()
+                    if refill is not None:
+                        await asyncio.wait({refill})
                 # Get next report with highest priority
                 if not self.high_priority_queue.empty():
-                    _, next_report = self.high_priority_queue.get()
+                    next_report = self.take_report(self.high_priority_queue)
                 elif not self.low_priority_queue.empty():
-                    _, next_report = self.low_priority_queue.get()
+                    next_report = self.take_report(self.low_priority_queue)
                 else:
                     await message.channel.send(
                         'There are no active reports to moderate. Thank you for checking.')
                     return
                 self.moderator_assignments[author_id] = next_report
+                self.report_store.record('assigned', next_report, moderator=author_id)
             await self.process_message(
                 message=message,
                 author_id=self.moderator_assignments[author_id])
+            self.report_store.record_state(
+                self.moderator_assignments[author_id],
+                self.reports[self.moderator_assignments[author_id]])
             # If the report is complete or cancelled, remove it from our map
             if (self.reports[self.moderator_assignments[author_id]].report_complete()
                 or self.reports[self.moderator_assignments[author_id]].report_escalated()):
@@ -219,16 +619,23 @@ class ModBot(discord.Client):
                     reporting_user = await self.fetch_user(int(self.moderator_assignments[author_id]))
                     await reporting_user.send((
                         f'Your earlier report has been resolved: {self.reports[self.moderator_assignments[author_id]].final_action}'))
-                mod_channel = discord.utils.get(
-                    self.get_all_channels(),
-                    name=f'group-{self.group_num}-mod')
-                await mod_channel.send(self.mod_summary(
-                    self.moderator_assignments[author_id],
-                    self.reports[self.moderator_assignments[author_id]]))
+                self.notify_mods(
+                    self.reports[self.moderator_assignments[author_id]].message_obj.guild.id,
+                    self.mod_summary(
+                        self.moderator_assignments[author_id],
+                        self.reports[self.moderator_assignments[author_id]]))
                 stats = self.reports[self.moderator_assignments[author_id]].report_stats()
                 if stats['false_reporting'] and not MODEL_AUTHOR_ID in stats['reporting_user']:
-                    self.false_report_history[str(stats['reporting_user'])].append(datetime.now())
+                    ts = self.false_report_tracker.record(str(stats['reporting_user']))
+                    self.report_store.record_false_report(
+                        self.moderator_assignments[author_id], str(stats['reporting_user']), ts)
                     print('False reporting updated:', stats)
+                self.report_store.record_closed(
+                    self.moderator_assignments[author_id],
+                    'resolved',
+                    state=self.reports[self.moderator_assignments[author_id]].state.name,
+                    final_action=self.reports[self.moderator_assignments[author_id]].final_action,
+                    false_reporting=stats['false_reporting'])
                 self.reports.pop(self.moderator_assignments[author_id])
                 self.moderator_assignments.pop(author_id)
         else:
@@ -240,7 +647,7 @@ class ModBot(discord.Client):
             if author_id not in self.reports and not message.content.startswith(Report.START_KEYWORD):
                 return
             if author_id not in self.reports and message.content.startswith(Report.START_KEYWORD):
-                if self.check_false_report_history(author_id):
+                if self.false_report_tracker.allowed(author_id):
                     self.reports[author_id] = Report(self)
                     # self.assign_report_priority(author_id, USER_REPORTING_PRIORITY)
                 else:
@@ -255,75 +662,355 @@ class ModBot(discord.Client):
             await self.process_message(
                 message=message,
                 author_id=author_id)
+            self.report_store.record_state(author_id, self.reports[author_id])
+            if self.reports[author_id].report_complete():
+                # Cancelled by the user: withdraw it from the moderation queues
+                self.withdraw_report(author_id)
+                return
             if self.reports[author_id].message_obj is None:
                 adding_message = False
             if adding_message:
                 # Generate a priority and assign to appropriate queue
-                score, info = self.run_disinfo_model(
-                    self.reports[author_id].message_obj)
-                priority = self.compute_priority(self.reports[author_id].message_obj, score, info)[0]
+                try:
+                    score, info = await self.run_disinfo_model(
+                        self.reports[author_id].message_obj)
+                    priority = self.compute_priority(self.reports[author_id].message_obj, score, info)[0]
+                except (asyncio.TimeoutError, ClassificationError) as e:
+                    print(f'\n[DEBUG] Classifier failed ({e!r}); using default user reporting priority')
+                    priority = USER_REPORTING_PRIORITY
                 self.assign_report_priority(author_id, priority)
                 print('\n[DEBUG] Assigning priority to user report')
-                mod_channel = discord.utils.get(
-                    self.get_all_channels(),
-                    name=f'group-{self.group_num}-mod')
-                await mod_channel.send(
-                    f'--------------------------------------------------\n'
-                    f'Reports needing your attention:\n'
-                    f'- # reports in **high-priority** queue: **{self.high_priority_queue.qsize()}**\n'
-                    f'- # reports in **low-priority** queue: **{self.low_priority_queue.qsize()}**\n'
-                    f'--------------------------------------------------')
-
-
-    def check_false_report_history(self, author_id):
-        history = self.false_report_history[author_id]
-        updated_history = []
-        for event in history:
-            diff = datetime.now() - event
-            if diff.days > FALSE_REPORTING_MEMORY_SPAN:
-                continue
-            updated_history.append(event)
-        self.false_report_history[author_id] = updated_history
-        return len(self.false_report_history[author_id]) < FALSE_REPORTING_LIMIT
+                self.notify_mods(self.reports[author_id].message_obj.guild.id, banner=True)
 
 
     async def handle_channel_message(self, message):
         # Only handle messages sent in the "group-#" channel
         if not message.channel.name == f'group-{self.group_num}':
             return
+        self.message_versions.scored(message.id, message.content)
+        # Campaigns live with the reports on the coordinator
+        if self.is_coordinator and await self.attach_to_campaign(message):
+            return
+        # Computed once; the prefilter and every scoring tier share them
+        variants = self.normalizer.variants(message.content)
+        if self.prefilter is not None:
+            if self.prefilter.is_benign(variants):
+                self.prefilter_stats['skipped'] += 1
+                return
+            self.prefilter_stats['passed'] += 1
+        decision, ticket = self.intake.admit(message.content)
+        if decision == SHED:
+            print(f'\n[DEBUG] Intake full ({self.intake.bytes} bytes); shedding message {message.id}')
+            return
+
+        scoring = asyncio.ensure_future(self.run_disinfo_model(message, degraded=decision == DEGRADE, variants=variants))
+        scoring.add_done_callback(lambda _: self.intake.release(ticket))
+        # With no deadline (None) this waits for the classifier
+        await asyncio.wait({scoring}, timeout=self.deadline)
+        if not scoring.done():
+            # Don't hold a possibly harmful message back on a slow classifier:
+            # queue it now on a provisional score and re-prioritize it in
+            # place once the real answer arrives
+            self.deadline_stats['timeouts'] += 1
+            score, info = await self.provisional_score(message, variants)
+            reporting_user_id = await self.file_auto_report(message, score, info)
+            task = asyncio.create_task(self.apply_late_result(message, scoring, reporting_user_id))
+            self.late_results.add(task)
+            task.add_done_callback(functools.partial(self.late_result_done, message.id))
+            return
+        try:
+            score, info = scoring.result()
+        except (asyncio.TimeoutError, ClassificationError) as e:
+            print(f'\n[DEBUG] Classifier failed on message {message.id}: {e!r}')
+            return
+        await self.file_auto_report(message, score, info)
+
+
+    async def provisional_score(self, message, variants):
+        # Local fallback score if there is one, else no score and a fixed
+        # provisional priority (see compute_priority)
+        info = {'provisional': True}
+        if FALLBACK_TIER in self.tier_namespaces:
+            try:
+                results = await self.classify_texts(variants, tier=FALLBACK_TIER)
+            except (asyncio.TimeoutError, ClassificationError) as e:
+                print(f'\n[DEBUG] Fallback classifier failed on message {message.id}: {e!r}')
+                results = []
+            scored = [r[0] for r in results if r[0] is not None]
+            if scored:
+                self.deadline_stats['fallbacks'] += 1
+                info['score'] = max(scored)
+                return info['score'], info
+        self.deadline_stats['provisional'] += 1
+        info['score'] = None
+        return None, info
+
 
-        score, info = self.run_disinfo_model(message)
+    def late_result_done(self, message_id, task):
+        self.late_results.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            # Classifier failures are handled inside; this is anything else
+            self.deadline_stats['late_failures'] += 1
+            print(f'\n[DEBUG] Late result for message {message_id} failed: {task.exception()!r}')
+
+
+    async def apply_late_result(self, message, scoring, reporting_user_id):
+        try:
+            score, info = await scoring
+        except (asyncio.TimeoutError, ClassificationError) as e:
+            self.deadline_stats['late_failures'] += 1
+            print(f'\n[DEBUG] Classifier failed on message {message.id}: {e!r}')
+            return
+        self.deadline_stats['late_results'] += 1
+        if reporting_user_id is None:
+            # The provisional score let it through; file it if the real one
+            # doesn't (on a shard, forward it for the coordinator to decide)
+            await self.file_auto_report(message, score, info)
+            return
+        if await self.rescore_report(message, reporting_user_id, score, info):
+            self.deadline_stats['late_updates'] += 1
+
+
+    async def rescore_report(self, message, reporting_user_id, score, info):
+        '''
+        Re-prioritizes a queued report on a new score for its message (the
+        final one after a provisional score, or one for edited text),
+        withdrawing it if the message no longer needs moderation. Returns
+        False if the report has left the queues.
+        '''
+        if reporting_user_id not in self.high_priority_queue and reporting_user_id not in self.low_priority_queue:
+            # Already with a moderator (or withdrawn); leave it be
+            return False
+        priority, further_moderation_needed = self.compute_priority(message, score, info)
+        info['priority'] = priority
+        override_high_priority = OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY]
+        if not (further_moderation_needed or override_high_priority):
+            self.withdraw_report(reporting_user_id)
+            # Moderators saw it filed; tell them it is off the queues
+            self.notify_mods(
+                message.guild.id,
+                f'**WITHDRAWN**: the auto flagged message below no longer needs moderation\n'
+                f'{self.code_format(message, score, info)}',
+                banner=True)
+            return True
+        report = self.reports[reporting_user_id]
+        edited = report.message_obj.content != message.content
+        report.update_score(message, score, info)
+        self.assign_report_priority(
+            reporting_user_id,
+            priority,
+            override_high_priority=override_high_priority)
+        if report.campaign is None:
+            if not info.get('provisional'):
+                self.index_campaign(report, message, Campaign(reporting_user_id, score, info))
+        else:
+            # Same campaign, new verdict; re-indexed only if the text changed
+            report.campaign.score, report.campaign.info = score, info
+            if edited:
+                self.campaign_index.remove(report.campaign_entry)
+                self.index_campaign(report, message, report.campaign)
+        if reporting_user_id in self.spilled:
+            return True
+        self.notify_mods(
+            message.guild.id,
+            f'**SCORE UPDATE** for the auto flagged message below\n{self.code_format(message, score, info)}')
+        return True
+
+
+    async def attach_to_campaign(self, message):
+        '''
+        Handles `message` without a model call if it is a near-duplicate of a
+        recently flagged message: it joins that campaign's open report, or,
+        if the report has been dealt with, is filed on the campaign's
+        verdict as the campaign's new report. Returns False otherwise.
+        '''
+        match = self.campaign_index.query(message.content)
+        if match is None:
+            return False
+        campaign, similarity = match
+        campaign.copies += 1
+        report = self.reports.get(campaign.report_id)
+        if report is not None and not report.report_complete():
+            report.attach_copy(message)
+            print(f'\n[DEBUG] Near-duplicate ({similarity:.2f}) attached to report {campaign.report_id}')
+            return True
+        if campaign.report_id in self.spilled:
+            # Still open, on disk; counted in the campaign's copies
+            return True
+        info = dict(campaign.info, campaign_similarity=similarity)
+        await self.file_auto_report(message, campaign.score, info, campaign=campaign)
+        return True
+
+
+    async def file_auto_report(self, message, score, info, campaign=None):
+        '''
+        Queues `message` as an auto-flagged report if its score calls for
+        moderation. Returns the report id, or None if nothing was filed.
+        Filed messages with a final score seed (or, given `campaign`, extend)
+        a campaign in the near-duplicate index.
+
+        A message already filed is re-scored in its queued report instead;
+        once that report has left the queues, only edited text is filed anew.
+        '''
+        if not self.is_coordinator:
+            # Reports and queues are held by the coordinator alone. It hears
+            # of messages that may need a report, and of every new score for
+            # one it may have filed (to update or withdraw it)
+            if self.message_versions.report_id(message.id) is None:
+                further_moderation_needed = self.compute_priority(message, score, info)[1]
+                if not (further_moderation_needed or (OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY])):
+                    return None
+            self.forward_filing(message, score, info)
+            self.message_versions.filed(message.id, message.content, FORWARDED)
+            return None
+        reporting_user_id = self.message_versions.report_id(message.id)
+        if reporting_user_id in self.spilled:
+            # Still open, on disk, with the score it was spilled at
+            return None
+        if reporting_user_id is not None:
+            edited = not self.message_versions.report_unchanged(message.id, message.content)
+            if await self.rescore_report(message, reporting_user_id, score, info):
+                if edited:
+                    self.edit_stats['updates'] += 1
+                else:
+                    # The final score after a provisional one
+                    self.deadline_stats['late_updates'] += 1
+                self.message_versions.filed(message.id, message.content, reporting_user_id)
+                return reporting_user_id
+            if not edited:
+                return None
         priority, further_moderation_needed = self.compute_priority(
             message, score, info)
         info['priority'] = priority
         print('\n[DEBUG] handle_channel_message')
         print(score, info, priority, further_moderation_needed)
-        if further_moderation_needed or (OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY]):
-            reporting_user_id = f'{MODEL_AUTHOR_ID}_{datetime.now()}'
-            self.reports[reporting_user_id] = Report(
-                client=self,
-                message=message,
-                reporting_user_id=reporting_user_id,
-                score=score,
-                info=info)
-            self.assign_report_priority(
-                reporting_user_id,
-                priority,
-                override_high_priority=OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY])
-            print(f'Auto flagged message filed as report for {reporting_user_id}')
-
-            # Forward the message to the mod channel
-            mod_channel = self.mod_channels[message.guild.id]
-            await mod_channel.send(self.code_format(message, score, info))
-            await mod_channel.send(
-                f'--------------------------------------------------\n'
-                f'Reports needing your attention:\n'
-                f'- # reports in **high-priority** queue: **{self.high_priority_queue.qsize()}**\n'
-                f'- # reports in **low-priority** queue: **{self.low_priority_queue.qsize()}**\n'
-                f'--------------------------------------------------')
+        if not (further_moderation_needed or (OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY])):
+            return None
+        reporting_user_id = f'{MODEL_AUTHOR_ID}_{datetime.now()}'
+        report = Report(
+            client=self,
+            message=message,
+            reporting_user_id=reporting_user_id,
+            score=score,
+            info=info)
+        self.reports[reporting_user_id] = report
+        self.message_versions.filed(message.id, message.content, reporting_user_id)
+        if not info.get('provisional'):
+            if campaign is None:
+                campaign = Campaign(reporting_user_id, score, info)
+            campaign.report_id = reporting_user_id
+            # Indexed before it is queued: a report spilled straight away
+            # still collects its copies (see attach_to_campaign)
+            self.index_campaign(report, message, campaign)
+        self.assign_report_priority(
+            reporting_user_id,
+            priority,
+            override_high_priority=OVERRIDE_HIGH_PRIORITY in info and info[OVERRIDE_HIGH_PRIORITY])
+        print(f'Auto flagged message filed as report for {reporting_user_id}')
+        if reporting_user_id in self.spilled:
+            # Shed to disk by full queues; only the banner counts it for now
+            return reporting_user_id
+
+        # Forward the message to the mod channel
+        self.notify_mods(message.guild.id, self.code_format(message, score, info), banner=True)
+        return reporting_user_id
+
+
+    def index_campaign(self, report, message, campaign):
+        report.campaign = campaign
+        report.campaign_entry = self.campaign_index.add(message.content, campaign)
+
+
+    def notify_mods(self, guild_id, text=None, banner=False):
+        # Queued for the guild's mod channel; the dispatcher coalesces a
+        # burst into digests and closes each with one queue-size banner
+        mod_channel = self.mod_channels.get(guild_id)
+        if mod_channel is None:
+            print(f'\n[DEBUG] No mod channel for guild {guild_id}; dropping notification')
+            return
+        self.notifier.notify(mod_channel, text, footer=self.queue_banner if banner else None)
+
+
+    def queue_banner(self):
+        spilled = f'- # reports spilled to disk: **{len(self.spilled)}**\n' if self.spilled else ''
+        return (
+            f'--------------------------------------------------\n'
+            f'Reports needing your attention:\n'
+            f'- # reports in **high-priority** queue: **{len(self.high_priority_queue)}**\n'
+            f'- # reports in **low-priority** queue: **{len(self.low_priority_queue)}**\n'
+            f'{spilled}'
+            f'--------------------------------------------------')
+
+
+    def forward_filing(self, message, score, info):
+        if 'errors' in info:
+            # Exceptions need not pickle; their text is enough downstream
+            info = dict(info, errors=[repr(e) for e in info['errors']])
+        mod_channel = self.mod_channels.get(message.guild.id)
+        self.filings.put({
+            'guild_id': message.guild.id,
+            'channel_id': message.channel.id,
+            'message_id': message.id,
+            'mod_channel_id': None if mod_channel is None else mod_channel.id,
+            'content': message.content,
+            'author_id': message.author.id,
+            'author_name': message.author.name,
+            'score': score,
+            'info': info,
+        })
+
+
+    async def drain_filings(self):
+        # Coordinator: file what the other shards forward, in arrival order
+        loop = asyncio.get_running_loop()
+        while True:
+            record = await loop.run_in_executor(None, self.filings.get)
+            if record is None:
+                return
+            # Records for one message (provisional, then final) apply in order
+            message_id = record['message_id']
+            task = asyncio.create_task(self.file_forwarded(record, after=self.filing_chain.get(message_id)))
+            self.filing_chain[message_id] = task
+            self.filing_tasks.add(task)
+            task.add_done_callback(functools.partial(self.filing_done, message_id))
+
+
+    def filing_done(self, message_id, task):
+        self.filing_tasks.discard(task)
+        if self.filing_chain.get(message_id) is task:
+            del self.filing_chain[message_id]
+
+
+    async def file_forwarded(self, record, after=None):
+        if after is not None:
+            await asyncio.wait({after})
+        await self.resolve_mod_channel(record)
+        message = ForwardedMessage(self, record)
+        score, info = record['score'], record['info']
+        # A message already filed (on a provisional score, or before an edit)
+        # is updated in its report by file_auto_report
+        filed = self.message_versions.report_id(message.id) is not None
+        if not filed and not info.get('provisional') and await self.attach_to_campaign(message):
+            return
+        await self.file_auto_report(message, score, info)
+
+
+    async def resolve_mod_channel(self, record):
+        # Other shards' guilds are not in this shard's cache; their mod
+        # channels are fetched over REST once per guild
+        guild_id, channel_id = record['guild_id'], record['mod_channel_id']
+        if guild_id in self.mod_channels or channel_id is None:
+            return
+        try:
+            self.mod_channels[guild_id] = self.get_channel(channel_id) or await self.fetch_channel(channel_id)
+        except (discord.errors.NotFound, discord.errors.Forbidden) as e:
+            print(f'\n[DEBUG] Mod channel {channel_id} of guild {guild_id} unavailable: {e!r}')
 
 
     def compute_priority(self, message, score, info):
+        if score is None:
+            # Unscored message that missed the deadline
+            return PROVISIONAL_PRIORITY, True
         if score <= LOW_MID_TH:
             return 0, False
         # elif score > MID_HIGH_TH:
@@ -338,16 +1025,126 @@ class ModBot(discord.Client):
                     vulnerability_score,
                     6,
                     int(score * 10))
+            else:
+                priority = int(score * 10)
         else:
             priority = int(score * 10)
         return priority, True
 
 
     def assign_report_priority(self, author_id, priority, override_high_priority=False):
+        # Re-assigning a queued report re-prioritizes it in place, moving it
+        # between the two queues if it crosses the high/low boundary
         if priority <= 5 and not override_high_priority:
-            self.low_priority_queue.put((-1. * priority, author_id))
+            target, other = self.low_priority_queue, self.high_priority_queue
         else:
-            self.high_priority_queue.put((-1. * priority, author_id))
+            target, other = self.high_priority_queue, self.low_priority_queue
+        # Keep the time already spent queued when moving between tiers
+        enqueued_at = other.enqueued_at(author_id) if author_id in other else None
+        other.remove(author_id)
+        target.push(author_id, priority, enqueued_at=enqueued_at)
+        self.report_store.record_queued(
+            author_id,
+            self.reports[author_id],
+            tier='low' if target is self.low_priority_queue else 'high',
+            priority=priority,
+            enqueued_at=time.time() - (time.monotonic() - target.enqueued_at(author_id)))
+        self.enforce_queue_bound()
+
+
+    def enforce_queue_bound(self):
+        '''
+        Over capacity, spills (or drops) auto reports down to
+        REPORT_QUEUE_SHED_TO of it, low-priority queue first and lowest aged
+        priority first. User reports are never shed.
+        '''
+        queued = len(self.high_priority_queue) + len(self.low_priority_queue)
+        if queued <= self.queue_capacity:
+            return
+        excess = queued - int(self.queue_capacity * REPORT_QUEUE_SHED_TO)
+        now = time.monotonic()
+        candidates = [
+            (queue is self.high_priority_queue, priority + queue.aging_rate * (now - enqueued_at), item_id)
+            for queue in (self.low_priority_queue, self.high_priority_queue)
+            for item_id, priority, enqueued_at in queue.items()
+            if MODEL_AUTHOR_ID in item_id]
+        for high, _, report_id in heapq.nsmallest(excess, candidates):
+            (self.high_priority_queue if high else self.low_priority_queue).remove(report_id)
+            self.reports.pop(report_id, None)
+            if REPORT_QUEUE_OVERFLOW == 'spill':
+                self.report_store.record('spilled', report_id)
+                self.spilled.add(report_id)
+                self.queue_stats['spilled'] += 1
+            else:
+                self.report_store.record_closed(report_id, 'dropped')
+                self.queue_stats['dropped'] += 1
+        print(f'\n[DEBUG] Report queues over capacity ({queued}/{self.queue_capacity}); '
+              f'{REPORT_QUEUE_OVERFLOW} {min(excess, len(candidates))} auto reports')
+
+
+    def take_report(self, queue):
+        report_id, _ = queue.peek()
+        self.queue_wait_times.add(time.monotonic() - queue.enqueued_at(report_id))
+        queue.pop()
+        self.refill_queues_soon()
+        return report_id
+
+
+    def refill_queues_soon(self):
+        # Starts reloading spilled reports once the queues have drained;
+        # returns the running reload, if any
+        queued = len(self.high_priority_queue) + len(self.low_priority_queue)
+        if self.refill_task is None and self.spilled and queued < self.queue_capacity * REPORT_QUEUE_REFILL_AT:
+            self.refill_task = asyncio.create_task(self.refill_queues())
+        return self.refill_task
+
+
+    async def refill_queues(self):
+        try:
+            target = int(self.queue_capacity * REPORT_QUEUE_SHED_TO)
+            while self.spilled:
+                room = target - len(self.high_priority_queue) - len(self.low_priority_queue)
+                if room <= 0:
+                    return
+                records = await self.report_store.load_spilled(
+                    min(room, REPORT_QUEUE_REFILL_BATCH),
+                    aging_rate=PRIORITY_AGING_PER_HOUR / 3600)
+                if not records:
+                    self.spilled.clear()
+                    return
+                for record in records:
+                    self.report_store.record('reloaded', record['report_id'])
+                self.spilled.difference_update(record['report_id'] for record in records)
+                # Spilled messages that were deleted meanwhile are closed as lost
+                restored = await asyncio.gather(*(self.restore_report(record) for record in records))
+                self.queue_stats['reloaded'] += sum(restored)
+        finally:
+            self.refill_task = None
+
+
+    def load_stats(self):
+        stats = {
+            'intake': self.intake.stats(),
+            'high_priority_queue': len(self.high_priority_queue),
+            'low_priority_queue': len(self.low_priority_queue),
+            'queue_capacity': self.queue_capacity,
+            'spilled_now': len(self.spilled),
+            **self.queue_stats,
+            'time_in_queue': self.queue_wait_times.stats(),
+            'normalizer': self.normalizer.stats(),
+        }
+        if self.cascade is not None:
+            stats['cascade'] = self.cascade.stats()
+        return stats
+
+
+    def withdraw_report(self, author_id):
+        self.high_priority_queue.remove(author_id)
+        self.low_priority_queue.remove(author_id)
+        self.report_store.record_closed(author_id, 'withdrawn')
+        # A report a moderator is working on is cleaned up by the moderation flow
+        if author_id not in self.moderator_assignments.values():
+            self.reports.pop(author_id, None)
 
     
     def code_format(self, message, score, info):
@@ -358,25 +1155,115 @@ class ModBot(discord.Client):
         '''
         return (
             f'**AUTO FLAGGING**\n{message.author.name}: "{message.content}"\n'
-            f'- Score: {score:.3f}\n'
+            f'- Score: {"pending" if score is None else f"{score:.3f}"}\n'
             f'- Info: {pprint.pformat(info, indent=4)}\n')
 
 
-    def run_disinfo_model(self, message):
-        ascii_content_v1 = unidecode(message.content)
-        ascii_content_v2 = uni2ascii(message.content)
+    async def classify_texts(self, texts, tier=PRIMARY_TIER):
+        # Serve repeats from the in-memory cache, then the on-disk score
+        # store; only texts missing from both reach the model. Each tier is
+        # cached under its own backend's namespace.
+        namespace = self.tier_namespaces[tier]
+        results = [self.result_cache.get(namespace, t) for t in texts]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            stored = await self.score_store.fetch_many(
+                namespace, [texts[i] for i in missing])
+            for i, result in zip(missing, stored):
+                if result is not None:
+                    results[i] = result
+                    self.result_cache.put(namespace, texts[i], result)
+            missing = [i for i in missing if results[i] is None]
+        if missing:
+            await self.classifier_ready.wait()
+            batcher = self.batchers.get(tier)
+            if batcher is None:
+                raise ClassificationError(f'Classifier failed to load: {self.classifier_error!r}')
+            vectors = None
+            if tier in self.semantic_tiers and self.encoder_pool is not None:
+                vectors, missing = await self.semantic_lookup(namespace, texts, results, missing)
+            if missing:
+                scored = await batcher.classify_many([texts[i] for i in missing])
+                for i, result in zip(missing, scored):
+                    results[i] = result
+                    self.result_cache.put(namespace, texts[i], result)
+                self.score_store.put_many_soon(
+                    namespace, [(texts[i], results[i]) for i in missing])
+                if vectors is not None:
+                    # Error results are not verdicts; leave them out
+                    kept = [j for j, i in enumerate(missing) if results[i][0] is not None]
+                    self.semantic_cache.add(vectors[kept], [results[missing[j]] for j in kept])
+        return results
+
+
+    async def semantic_lookup(self, namespace, texts, results, missing):
+        '''
+        Fills `results` for texts in `missing` that paraphrase an already
+        classified message. Returns the embeddings of the texts still
+        missing, to be cached once they are scored, and their indices.
+        '''
+        try:
+            vectors = await self.encoder_pool.embed([texts[i] for i in missing])
+        except Exception as e:
+            # The cache is an optimization; score everything on failure
+            print(f'\n[DEBUG] Semantic cache embedding failed: {e!r}')
+            return None, missing
+        if self.semantic_cache is None:
+            self.semantic_cache = SemanticCache(
+                vectors.shape[1],
+                capacity=SEMANTIC_CACHE_CAPACITY,
+                threshold=SEMANTIC_CACHE_TH)
+        remaining = []
+        for j, (i, match) in enumerate(zip(missing, self.semantic_cache.query(vectors))):
+            if match is None:
+                remaining.append(j)
+                continue
+            results[i] = match[0]
+            self.result_cache.put(namespace, texts[i], match[0])
+        return vectors[remaining], [missing[j] for j in remaining]
+
+
+    async def run_disinfo_model(self, message, degraded=False, variants=None):
+        # Only distinct ascii variants are scored (one for pure-ASCII text);
+        # under overload (degraded) only by the cheap tier
+        if variants is None:
+            variants = self.normalizer.variants(message.content)
         print(f'\n[DEBUG] original message: {message.content}')
-        print(f'[DEBUG] ascii v1: {ascii_content_v1}')
-        print(f'[DEBUG] ascii v2: {ascii_content_v2}')
-        score_v1, classification_v1 = self.classifier.classify_message(ascii_content_v1)
-        score_v2, classification_v2 = self.classifier.classify_message(ascii_content_v2)
-        score = max(score_v1, score_v2)
-        classification = classification_v1 if score_v1 > score_v2 else classification_v2
-        info = {
+        for i, variant in enumerate(variants):
+            print(f'[DEBUG] ascii v{i + 1}: {variant}')
+        start = time.perf_counter()
+        results = await self.classify_texts(variants, tier=self.degrade_tier if degraded else PRIMARY_TIER)
+        # Backends may return explicit error results (score None); score on
+        # whichever variants succeeded and surface the errors in info
+        errors = [getattr(r, 'error', None) for r in results if r[0] is None]
+        scored = [r for r in results if r[0] is not None]
+        if not scored:
+            raise ClassificationError('; '.join(str(e) for e in errors))
+        score, classification = max(scored, key=lambda r: r[0])[:2]
+        info = {}
+        if degraded:
+            info['degraded'] = True
+        if self.cascade is not None:
+            self.cascade.record(cascade.LOCAL, start)
+            info['local_score'] = score
+            info['escalated'] = not degraded and self.cascade.escalate(score)
+        if info.get('escalated'):
+            # The local score is too close to the threshold to trust; GPT-4
+            # decides, falling back to the local score if it fails
+            start = time.perf_counter()
+            results = await self.classify_texts(variants, tier=ESCALATION_TIER)
+            self.cascade.record(cascade.REMOTE, start)
+            errors += [getattr(r, 'error', None) for r in results if r[0] is None]
+            scored = [r for r in results if r[0] is not None]
+            if scored:
+                score, classification = max(scored, key=lambda r: r[0])[:2]
+        info.update({
             'score': score,
             'classification': classification,
             OVERRIDE_HIGH_PRIORITY: random.random() > 0.5,
-        }
+        })
+        if errors:
+            info['errors'] = errors
         print(f'\n[DEBUG] disinfo model: {score}, {info}')
         return score, info
 
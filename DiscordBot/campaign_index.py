@@ -0,0 +1,175 @@
+from collections import OrderedDict
+import time
+import zlib
+
+import numpy as np
+
+from result_cache import normalize_text
+
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+class Campaign:
+    '''
+    A cluster of near-duplicate flagged messages sharing one verdict and
+    one report.
+    '''
+
+    __slots__ = ('report_id', 'score', 'info', 'copies')
+
+    def __init__(self, report_id, score, info):
+        self.report_id = report_id
+        self.score = score
+        self.info = info
+        self.copies = 0
+
+
+class CampaignIndex:
+    '''
+    Streaming MinHash/LSH index over recently flagged message text.
+
+    Each message is reduced to a `num_perm`-value MinHash signature of its
+    character `shingle_size`-grams; the signature is split into `bands`
+    bands, and two messages become candidates when any band matches exactly.
+    Candidates whose estimated Jaccard similarity is at least `threshold`
+    count as near-duplicates. With the defaults (16 bands of 4 rows), pairs
+    at 0.7 similarity are found ~99% of the time and pairs at 0.3 ~12%.
+
+    Entries expire `ttl` seconds after insertion and at most `max_entries`
+    are kept (oldest evicted first), so memory stays bounded.
+    '''
+
+    def __init__(self, num_perm=64, bands=16, threshold=0.7, shingle_size=5,
+                 ttl=6 * 60 * 60, max_entries=50000, clock=time.monotonic, seed=1):
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.rows = num_perm // bands
+        self.bands = bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        # Odd multipliers folding each band's rows into a single int key
+        self.fold = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64) | np.uint64(1)
+        # entry id -> (signature, band keys, campaign, inserted at), oldest first
+        self.entries = OrderedDict()
+        # One dict per band: band key -> entry id, or a list of them
+        self.buckets = [{} for _ in range(bands)]
+        self.next_id = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def shingles(self, text):
+        text = normalize_text(text).lower()
+        k = self.shingle_size
+        if len(text) <= k:
+            return {text}
+        return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+    def signature(self, text):
+        # crc32 rather than hash(), which is salted per process: with it the
+        # same `seed` gives the same signatures in every run
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode()) for s in self.shingles(text)), dtype=np.uint64)
+        # Universal hashing stands in for random permutations; uint64
+        # arithmetic wraps, which is fine for hashing
+        permuted = (hashes[:, None] * self.a + self.b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature):
+        bands = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        return (bands * self.fold).sum(axis=1).tolist()
+
+    def query(self, text, signature=None):
+        '''
+        Returns (campaign, estimated similarity) for the closest indexed
+        near-duplicate of `text`, or None.
+        '''
+        self.evict()
+        if signature is None:
+            signature = self.signature(text)
+        candidates = set()
+        for buckets, key in zip(self.buckets, self.band_keys(signature)):
+            bucket = buckets.get(key)
+            if bucket is None:
+                continue
+            if type(bucket) is list:
+                candidates.update(bucket)
+            else:
+                candidates.add(bucket)
+        best, best_similarity = None, self.threshold
+        for entry_id in candidates:
+            other, _, campaign, _ = self.entries[entry_id]
+            similarity = float(np.mean(signature == other))
+            if similarity >= best_similarity:
+                best, best_similarity = campaign, similarity
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return best, best_similarity
+
+    def add(self, text, campaign, signature=None):
+        if signature is None:
+            signature = self.signature(text)
+        entry_id = self.next_id
+        self.next_id += 1
+        keys = self.band_keys(signature)
+        self.entries[entry_id] = (signature, keys, campaign, self.clock())
+        for buckets, key in zip(self.buckets, keys):
+            # Most buckets hold a single entry; store it bare to save memory
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = entry_id
+            elif type(bucket) is list:
+                bucket.append(entry_id)
+            else:
+                buckets[key] = [bucket, entry_id]
+        self.evict()
+        return entry_id
+
+    def remove(self, entry_id):
+        '''
+        Drops the entry `add` returned as `entry_id`. Returns False if it
+        has already expired or been evicted.
+        '''
+        entry = self.entries.pop(entry_id, None)
+        if entry is None:
+            return False
+        for buckets, key in zip(self.buckets, entry[1]):
+            bucket = buckets[key]
+            if type(bucket) is not list:
+                del buckets[key]
+                continue
+            bucket.remove(entry_id)
+            if len(bucket) == 1:
+                buckets[key] = bucket[0]
+        return True
+
+    def evict(self):
+        cutoff = self.clock() - self.ttl
+        while self.entries:
+            entry_id, (_, _, _, inserted_at) = next(iter(self.entries.items()))
+            if inserted_at > cutoff and len(self.entries) <= self.max_entries:
+                break
+            self.remove(entry_id)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'buckets': sum(len(buckets) for buckets in self.buckets),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
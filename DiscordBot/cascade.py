@@ -0,0 +1,48 @@
+from collections import deque
+import time
+
+
+LOCAL = 'local'
+REMOTE = 'remote'
+
+
+class Cascade:
+    '''
+    Escalation policy and bookkeeping for two-tier classification.
+
+    The local model scores every message; only scores within `band` of
+    `threshold` (the decision boundary, where the local model is least
+    reliable) are escalated to the remote model. Keeps the escalated share
+    of traffic and the latest `window` latencies of each tier.
+    '''
+
+    def __init__(self, threshold, band, window=1000):
+        self.low = threshold - band
+        self.high = threshold + band
+        self.messages = 0
+        self.escalated = 0
+        self.latencies = {LOCAL: deque(maxlen=window), REMOTE: deque(maxlen=window)}
+
+    def escalate(self, score):
+        self.messages += 1
+        if self.low <= score <= self.high:
+            self.escalated += 1
+            return True
+        return False
+
+    def record(self, tier, start):
+        # `start` is a time.perf_counter() reading taken before the tier ran
+        self.latencies[tier].append(time.perf_counter() - start)
+
+    def stats(self):
+        stats = {
+            'messages': self.messages,
+            'escalated': self.escalated,
+            'escalation_rate': self.escalated / self.messages if self.messages else 0.0,
+        }
+        for tier, latencies in self.latencies.items():
+            ordered = sorted(latencies)
+            for p in (50, 95):
+                stats[f'{tier}_p{p}_ms'] = (
+                    ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1e3 if ordered else None)
+        return stats
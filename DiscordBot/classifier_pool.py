@@ -0,0 +1,119 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import threading
+
+
+THREAD = 'thread'
+PROCESS = 'process'
+FORK = 'fork'  # process pool sharing one classifier built in this process
+
+# Classifier instance owned by a process-pool worker, built once by the
+# pool initializer so that every batch reuses the loaded model
+_worker_classifier = None
+
+
+def _init_worker(factory):
+    global _worker_classifier
+    _worker_classifier = factory()
+
+
+def _worker_classify_batch(messages):
+    return _worker_classifier.classify_batch(messages)
+
+
+def _worker_embed(messages):
+    return _worker_classifier.embed(messages)
+
+
+class ClassifierPool:
+    '''
+    Runs a classifier's `classify_batch` on a thread or process pool so that
+    scoring never blocks the asyncio event loop.
+
+    `factory` is a zero-argument callable returning a classifier. With the
+    process pool it must be picklable (a class or functools.partial) since
+    each worker builds its own classifier. The fork pool instead builds the
+    classifier once, here, and forks workers that inherit it, so they share
+    its weights copy-on-write (memory-mapped weights, see
+    fn_classifier.export_model, stay shared outright). Forking a process
+    that already runs other threads can deadlock the children, so the fork
+    pool must be built before any start: from a launcher, never from a
+    running bot. At most `max_concurrency` batches are in flight at once; a
+    batch taking longer than `timeout` seconds raises asyncio.TimeoutError
+    in the awaiting coroutine.
+    '''
+
+    def __init__(self, factory, kind=THREAD, max_workers=2, max_concurrency=None, timeout=None):
+        if kind not in (THREAD, PROCESS, FORK):
+            raise ValueError(f'Unknown classifier pool kind: {kind}')
+        self.kind = kind
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency or max_workers)
+        self.completed = 0
+        self.timeouts = 0
+        if kind == PROCESS:
+            self.classifier = None
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_worker,
+                initargs=(factory,))
+        elif kind == FORK:
+            if threading.active_count() > 1:
+                raise RuntimeError(
+                    'A fork pool must be built before any threads start; '
+                    'share weights with sharding.py --share-weights instead')
+            _init_worker(factory)
+            self.classifier = None
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context('fork'))
+            # A fork pool starts every worker on the first submit; do it now,
+            # before this process runs inference (and starts torch's threads)
+            self.executor.submit(int).result()
+        else:
+            self.classifier = factory()
+            self.executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='classifier')
+
+    async def classify_batch(self, messages):
+        if self.classifier is None:
+            fn = _worker_classify_batch
+        else:
+            fn = self.classifier.classify_batch
+        return await self.run(fn, messages)
+
+    async def embed(self, messages):
+        # For classifiers with an `embed` method (see fn_classifier)
+        if self.classifier is None:
+            fn = _worker_embed
+        else:
+            fn = self.classifier.embed
+        return await self.run(fn, messages)
+
+    async def run(self, fn, messages):
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                results = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, fn, list(messages)),
+                    self.timeout)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                raise
+        self.completed += 1
+        return results
+
+    async def classify_message(self, message):
+        return (await self.classify_batch([message]))[0]
+
+    def stats(self):
+        return {
+            'kind': self.kind,
+            'completed': self.completed,
+            'timeouts': self.timeouts,
+        }
+
+    def shutdown(self, wait=False):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
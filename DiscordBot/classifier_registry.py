@@ -0,0 +1,56 @@
+# Lazy registry of classifier backends.
+#
+# Each backend is registered by name with the module and class implementing
+# it, plus the (classifier_type, model_id) namespace its scores are cached
+# under. Nothing is imported until a backend is loaded, so selecting GPT-4
+# never pays for importing torch and transformers, and vice versa.
+
+from collections import namedtuple
+import importlib
+
+
+Backend = namedtuple('Backend', ['module', 'attr', 'classifier_type', 'model_id', 'warmup', 'encoder'])
+
+BACKENDS = {}
+
+
+class ClassificationError(RuntimeError):
+    # Any failure to score a text, whatever the backend raised underneath
+    pass
+
+
+def register(name, module, attr, classifier_type, model_id, warmup=True, encoder=False):
+    '''
+    `warmup` marks local models worth a throwaway inference before serving;
+    remote APIs are not warmed up since every call costs a request.
+    `encoder` marks classifiers with an `embed` method for the semantic cache.
+    '''
+    BACKENDS[name] = Backend(module, attr, classifier_type, model_id, warmup, encoder)
+
+
+def get(name):
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f'Unknown classifier backend: {name}') from None
+
+
+def namespace(name):
+    backend = get(name)
+    return backend.classifier_type, backend.model_id
+
+
+def load(name):
+    # Imports the backend's module on first use and returns its class
+    backend = get(name)
+    return getattr(importlib.import_module(backend.module), backend.attr)
+
+
+DISTILROBERTA_FAKENEWS = 'vikram71198/distilroberta-base-finetuned-fake-news-detection'
+
+register('gpt4', 'gpt4_classifier', 'GPT4MisinformationClassifier', 'gpt4', 'gpt-4', warmup=False)
+register('gpt4_async', 'async_gpt4_classifier', 'AsyncGPT4MisinformationClassifier', 'gpt4', 'gpt-4', warmup=False)
+register('roberta_fakenews', 'fn_classifier', 'DistilRoBERTaFakeNewsClassifier',
+         'roberta_fakenews', DISTILROBERTA_FAKENEWS, encoder=True)
+register('roberta_fakenews_int8', 'fn_classifier', 'QuantizedDistilRoBERTaFakeNewsClassifier',
+         'roberta_fakenews', DISTILROBERTA_FAKENEWS + '@int8', encoder=True)
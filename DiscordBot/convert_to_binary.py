@@ -1,5 +1,9 @@
 import csv
 
+def binary_label(score):
+    # GPT-3 misinformation scores run 1-10; 5 and up counts as misinformation
+    return 0 if score <= 4 else 1
+
 def process_scores(input_file, output_file):
     with open(input_file, 'r') as file:
         reader = csv.reader(file)
@@ -14,7 +18,7 @@ def process_scores(input_file, output_file):
         if not score.isdigit():
             continue  # Skip rows with non-numeric score
         score = int(score)
-        processed_score = 0 if score <= 4 else 1
+        processed_score = binary_label(score)
         processed_rows.append([message, processed_score])
 
     with open(output_file, 'w', newline='') as file:
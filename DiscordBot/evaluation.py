@@ -0,0 +1,176 @@
+# Evaluation engine for the misinformation classifiers.
+#
+# Scores every message in a labelled CSV with either classifier, running
+# batches concurrently on a worker pool. Each finished batch is written to the
+# persistent score cache straight away, which doubles as the checkpoint: an
+# interrupted run (say, GPT-4 hitting a quota) picks up where it stopped when
+# re-run, and changing only the metrics below costs no model calls at all.
+#
+# Usage:
+#   python evaluation.py --classifier gpt4
+#   python evaluation.py --classifier roberta_fakenews --threshold 0.2 --report all
+
+import argparse
+import concurrent.futures
+import csv
+
+import numpy as np
+
+import classifier_registry
+from result_cache import is_error
+from score_store import SCORE_CACHE_PATH, PersistentScoreCache
+
+
+CLASSIFIERS = ['gpt4', 'roberta_fakenews', 'roberta_fakenews_int8']
+REPORTS = ['accuracy', 'confusion', 'precision_recall', 'sweep']
+
+
+def read_dataset(file_path):
+    messages = []
+    labels = []
+    with open(file_path, 'r') as file:
+        for row in csv.reader(file):
+            if len(row) != 2 or row[1].strip() == '':
+                continue
+            messages.append(row[0])
+            labels.append(int(row[1].strip()))
+    return messages, labels
+
+
+def load_classifier(name):
+    cls = classifier_registry.load(name)
+    if name == 'gpt4':
+        from gpt4_classifier import load_api_key
+        return cls(load_api_key())
+    return cls()
+
+
+def predict(name, store, messages, workers=4, batch_size=16):
+    '''
+    Returns an array of scores for `messages` from classifier `name`,
+    reading cached scores from `store` and scoring the rest in concurrent
+    batches; the classifier is only loaded if something is missing. Failed
+    batches and error results are reported and left as NaN so a re-run
+    retries only those.
+    '''
+    namespace = classifier_registry.namespace(name)
+    scores = np.full(len(messages), np.nan)
+    for i, result in enumerate(store.get_many(namespace, messages)):
+        if result is not None:
+            scores[i] = result[0]
+    missing = [i for i in range(len(messages)) if np.isnan(scores[i])]
+    print(f'{len(messages) - len(missing)} scores cached, {len(missing)} to compute')
+    if not missing:
+        return scores
+
+    classifier = load_classifier(name)
+    chunks = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    done = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(classifier.classify_batch, [messages[i] for i in chunk]): chunk
+            for chunk in chunks}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                chunk = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f'Batch of {len(chunk)} failed: {e!r}')
+                    continue
+                # Checkpoint: persist each batch as soon as it finishes
+                store.put_many(namespace, [(messages[i], r) for i, r in zip(chunk, results)])
+                failed = 0
+                for i, result in zip(chunk, results):
+                    if is_error(result):
+                        failed += 1
+                    else:
+                        scores[i] = result[0]
+                done += len(chunk)
+                print(f'Scored {done}/{len(missing)}' + (f' ({failed} failed, left for a re-run)' if failed else ''))
+        except KeyboardInterrupt:
+            print('Interrupted; finished batches are saved and will be skipped on the next run.')
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+    return scores
+
+
+def confusion_matrix(y_true, y_pred, num_labels=2):
+    # Rows are true labels, columns predicted labels
+    return np.bincount(
+        y_true * num_labels + y_pred,
+        minlength=num_labels * num_labels).reshape(num_labels, num_labels)
+
+
+def precision_recall(y_true, y_pred):
+    tp = np.sum((y_pred == 1) & (y_true == 1))
+    fp = np.sum((y_pred == 1) & (y_true == 0))
+    fn = np.sum((y_pred == 0) & (y_true == 1))
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return precision, recall, f1
+
+
+def threshold_sweep(y_true, scores, thresholds):
+    '''
+    Precision, recall, F1 and accuracy at every threshold in one vectorized
+    pass: predictions form a (thresholds x messages) boolean matrix.
+    '''
+    positive = y_true == 1
+    preds = scores[None, :] > thresholds[:, None]
+    tp = (preds & positive).sum(axis=1)
+    fp = (preds & ~positive).sum(axis=1)
+    fn = (~preds & positive).sum(axis=1)
+    tn = (~preds & ~positive).sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    accuracy = (tp + tn) / len(y_true)
+    return precision, recall, f1, accuracy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Evaluate a misinformation classifier on a labelled CSV.')
+    parser.add_argument('--classifier', choices=CLASSIFIERS, default='roberta_fakenews')
+    parser.add_argument('--data', default='data/messages-binary.csv')
+    parser.add_argument('--db', default=SCORE_CACHE_PATH)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--threshold', type=float, default=0.5)
+    parser.add_argument('--report', choices=REPORTS + ['all'], default='all')
+    args = parser.parse_args(argv)
+
+    messages, labels = read_dataset(args.data)
+    store = PersistentScoreCache(args.db)
+    scores = predict(args.classifier, store, messages, workers=args.workers, batch_size=args.batch_size)
+    store.close()
+
+    scored = ~np.isnan(scores)
+    if not scored.all():
+        print(f'{np.sum(~scored)} messages have no score yet; metrics cover the other {np.sum(scored)}.')
+    y_true = np.asarray(labels)[scored]
+    scores = scores[scored]
+    y_pred = (scores > args.threshold).astype(int)
+    reports = REPORTS if args.report == 'all' else [args.report]
+
+    print(f'\n{args.classifier} on {args.data}, threshold {args.threshold}')
+    if 'accuracy' in reports:
+        print(f'Accuracy: {np.mean(y_pred == y_true):.4f}')
+    if 'confusion' in reports:
+        print('Confusion matrix (rows: true 0/1, columns: predicted 0/1):')
+        print(confusion_matrix(y_true, y_pred))
+    if 'precision_recall' in reports:
+        precision, recall, f1 = precision_recall(y_true, y_pred)
+        print(f'Precision: {precision:.4f}  Recall: {recall:.4f}  F1: {f1:.4f}')
+    if 'sweep' in reports:
+        thresholds = np.round(np.linspace(0.05, 0.95, 19), 2)
+        precision, recall, f1, accuracy = threshold_sweep(y_true, scores, thresholds)
+        print(f'\n{"threshold":>9} {"precision":>9} {"recall":>7} {"f1":>6} {"accuracy":>8}')
+        for row in zip(thresholds, precision, recall, f1, accuracy):
+            print('{:>9.2f} {:>9.3f} {:>7.3f} {:>6.3f} {:>8.3f}'.format(*row))
+
+
+if __name__ == '__main__':
+    main()
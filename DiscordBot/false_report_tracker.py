@@ -0,0 +1,72 @@
+from collections import deque
+import time
+
+
+class FalseReportTracker:
+    '''
+    Sliding-window count of false reports per user.
+
+    Each offender gets a deque of epoch-second timestamps capped at `limit`
+    entries: a user is blocked exactly when their `limit` most recent false
+    reports all fall inside the window, so older ones never need keeping.
+    Expired timestamps are dropped lazily on lookup, and a periodic sweep
+    removes users whose window has emptied, so memory tracks active
+    offenders only. Lookups are O(1) amortized.
+    '''
+
+    def __init__(self, limit, span_seconds, sweep_interval=3600, clock=time.time):
+        self.limit = limit
+        self.span = span_seconds
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self.events = {}  # user_id -> deque of epoch ints, oldest first
+        self.last_sweep = int(clock())
+
+    def __len__(self):
+        return len(self.events)
+
+    def now(self):
+        now = int(self.clock())
+        if now - self.last_sweep >= self.sweep_interval:
+            self.sweep(now)
+        return now
+
+    def expire(self, user_id, now):
+        history = self.events.get(user_id)
+        if history is None:
+            return None
+        while history and now - history[0] > self.span:
+            history.popleft()
+        if not history:
+            del self.events[user_id]
+            return None
+        return history
+
+    def record(self, user_id, when=None):
+        when = self.now() if when is None else int(when)
+        history = self.events.get(user_id)
+        if history is None:
+            history = self.events[user_id] = deque(maxlen=self.limit)
+        history.append(when)
+        return when
+
+    def count(self, user_id):
+        history = self.expire(user_id, self.now())
+        return 0 if history is None else len(history)
+
+    def allowed(self, user_id):
+        return self.count(user_id) < self.limit
+
+    def sweep(self, now=None):
+        now = int(self.clock()) if now is None else now
+        self.last_sweep = now
+        for user_id in [u for u, h in self.events.items() if now - h[-1] > self.span]:
+            del self.events[user_id]
+
+    def snapshot(self):
+        return [(user_id, ts) for user_id, history in self.events.items() for ts in history]
+
+    def restore(self, rows):
+        # rows: (user_id, epoch seconds) pairs, e.g. from ReportStore
+        for user_id, ts in sorted(rows, key=lambda row: row[1]):
+            self.record(user_id, ts)
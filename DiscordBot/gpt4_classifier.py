@@ -1,3 +1,4 @@
+from collections import namedtuple
 import json
 import os
 
@@ -11,38 +12,150 @@ Returns:
 '''
 
 API_KEY_PATH = 'key.json'
+MODEL = 'gpt-4'
+CLASSIFIER_TYPE = 'gpt4'
+BATCH_SIZE = 10
+BATCH_MAX_ATTEMPTS = 2
+SYSTEM_PROMPT = "Classify these messages as disinformation, including categories: conspiracy theory, fabricated information, misleading information, imposter, uncertain, and other. Assign the message a probability score for whether the message constitutes disinformation as a number between 0 and 1. 0 is not likely disinformation or no chance the message is disinformation, and 1 is highly likely or almost certain that the message is disinformation.  Your answer should be two lines, the first line Score: and the second line Classification:"
+
+BATCH_SYSTEM_PROMPT = "Classify these messages as disinformation, including categories: conspiracy theory, fabricated information, misleading information, imposter, uncertain, and other. Assign each message a probability score for whether the message constitutes disinformation as a number between 0 and 1. 0 is not likely disinformation or no chance the message is disinformation, and 1 is highly likely or almost certain that the message is disinformation. The input is a JSON array of objects with fields id and text. Answer with only a JSON array containing one object per input message, with fields id (copied from the input), score and classification."
+
+# `error` is None on success; otherwise score and classification are None
+# and `error` says why, so callers never mistake a failure for a real score
+ClassificationResult = namedtuple(
+    'ClassificationResult', ['score', 'classification', 'error'], defaults=[None])
+
+
+def load_api_key(path=API_KEY_PATH):
+    if not os.path.isfile(path):
+        raise Exception(f"{path} not found!")
+    with open(path) as f:
+        return json.load(f)['gpt4']
+
+
+def format_batch_request(messages):
+    return json.dumps([{'id': i, 'text': message} for i, message in enumerate(messages)])
+
+
+def parse_batch_response(output, ids):
+    '''
+    Strict parser for a multi-message reply. Returns a dict mapping each id
+    that came back with a valid score and classification to its
+    (score, classification) tuple; ids that are missing, duplicated or
+    malformed are left out so the caller can re-request just those.
+    '''
+    text = output.strip()
+    # Tolerate a markdown code fence around the JSON
+    if text.startswith('```'):
+        text = text.split('\n', 1)[-1].rsplit('```', 1)[0]
+    start, end = text.find('['), text.rfind(']')
+    if start == -1 or end < start:
+        return {}
+    try:
+        items = json.loads(text[start:end + 1])
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+    wanted = set(ids)
+    parsed = {}
+    duplicated = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = item.get('id')
+        score = item.get('score')
+        classification = item.get('classification')
+        if item_id not in wanted or isinstance(item_id, bool):
+            continue
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0 <= score <= 1:
+            continue
+        if not isinstance(classification, str) or not classification.strip():
+            continue
+        if item_id in parsed:
+            duplicated.add(item_id)
+        parsed[item_id] = (float(score), classification.strip())
+    for item_id in duplicated:
+        parsed.pop(item_id)
+    return parsed
+
+
+def parse_classification(output):
+    '''
+    Strict parser for a "Score: ... / Classification: ..." reply.
+    Raises ValueError instead of falling back to a default score.
+    '''
+    lines = [line.strip() for line in output.strip().split('\n') if line.strip()]
+    score = classification = None
+    for line in lines:
+        if line.startswith('Score:'):
+            score = float(line.split('Score:', 1)[1].strip())
+        elif line.startswith('Classification:'):
+            classification = line.split('Classification:', 1)[1].strip()
+    if score is None or classification is None:
+        raise ValueError(f'Unparseable classifier reply: {output!r}')
+    if not 0 <= score <= 1:
+        raise ValueError(f'Score out of range: {score}')
+    return score, classification
 
 
 class GPT4MisinformationClassifier:
     def __init__(self, api_key):
         openai.api_key = api_key
+        self.classifier_type = CLASSIFIER_TYPE
+        self.model_id = MODEL
 
     def classify_message(self, message):
-        prompt = "Classify these messages as disinformation, including categories: conspiracy theory, fabricated information, misleading information, imposter, uncertain, and other. Assign the message a probability score for whether the message constitutes disinformation as a number between 0 and 1. 0 is not likely disinformation or no chance the message is disinformation, and 1 is highly likely or almost certain that the message is disinformation.  Your answer should be two lines, the first line Score: and the second line Classification:"
         response = openai.ChatCompletion.create(
-            model="gpt-4",
+            model=MODEL,
             messages=[
-                {"role": "system", "content": prompt},
+                {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": message}
             ]
         )
 
         output = response['choices'][0]['message']['content']
-        score, classification = output.strip().split('\n')[-2:]
         try:
-            score_parsed = min(max(float(score.split('Score:')[-1]), 0), 1)
-        except:
-            score_parsed = 0.5
-        classification_parsed = classification.split('Classification:')[-1].strip()
-        return score_parsed, classification_parsed
+            return ClassificationResult(*parse_classification(output))
+        except ValueError as e:
+            return ClassificationResult(None, None, str(e))
+
+    def classify_packed(self, messages):
+        response = openai.ChatCompletion.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                {"role": "user", "content": format_batch_request(messages)}
+            ]
+        )
+        output = response['choices'][0]['message']['content']
+        return parse_batch_response(output, range(len(messages)))
+
+    def classify_batch(self, messages, batch_size=BATCH_SIZE, max_attempts=BATCH_MAX_ATTEMPTS):
+        '''
+        Classifies messages `batch_size` at a time in one chat request each.
+        Items missing from a reply are re-requested together; anything still
+        unparsed after `max_attempts` goes through classify_message. Replies
+        that cannot be parsed come back as error results, never as a score.
+        '''
+        results = [None] * len(messages)
+        for start in range(0, len(messages), batch_size):
+            pending = list(range(start, min(start + batch_size, len(messages))))
+            for _ in range(max_attempts):
+                if not pending:
+                    break
+                parsed = self.classify_packed([messages[i] for i in pending])
+                for j, i in enumerate(pending):
+                    if j in parsed:
+                        results[i] = ClassificationResult(*parsed[j])
+                pending = [i for i in pending if results[i] is None]
+            for i in pending:
+                results[i] = self.classify_message(messages[i])
+        return results
 
 
 def main():
-    if not os.path.isfile(API_KEY_PATH):
-        raise Exception(f"{API_KEY_PATH} not found!")
-    with open(API_KEY_PATH) as f:
-        api_key = json.load(f)['gpt4']
-    classifier = GPT4MisinformationClassifier(api_key)
+    classifier = GPT4MisinformationClassifier(load_api_key())
 
     # Messages to try
     #message = "The earth is not flat."
@@ -50,9 +163,11 @@ def main():
     #message = "Dinosaurs are dead."
     message = "COVID-19 vaccines cause autism."
 
-    priority, classification = classifier.classify_message(message)
+    priority, classification, error = classifier.classify_message(message)
     print("Priority:", priority)
     print("Classification:", classification)
+    if error is not None:
+        print("Error:", error)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,101 @@
+import collections
+import sys
+import time
+
+
+ADMIT = 'admit'
+DEGRADE = 'degrade'
+SHED = 'shed'
+
+# Rough per-message cost of scoring state beyond the text itself: the
+# handler coroutine, its ASCII variants, batcher futures and result tuples
+ENTRY_OVERHEAD = 4096
+
+
+class WaitTimes:
+    '''
+    Time-in-queue summary over the last `window` samples, plus totals.
+    '''
+
+    def __init__(self, window=4096):
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def stats(self):
+        ordered = sorted(self.samples)
+        pick = lambda p: ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+        return {
+            'count': self.count,
+            'p50': pick(50),
+            'p95': pick(95),
+            'p99': pick(99),
+            'max': self.max,
+        }
+
+
+class Intake:
+    '''
+    Admission control for channel messages waiting on the classifier.
+
+    A Discord gateway cannot be slowed down, so instead of queueing without
+    limit the intake tracks the estimated memory held by messages admitted
+    but not yet scored. Below `degrade_fraction` of `max_bytes` messages are
+    admitted for the full classifier; above it they are admitted degraded,
+    for the cheap local tier (if the caller has one); at `max_bytes` new
+    messages are shed unscored.
+    '''
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, degrade_fraction=0.5, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.degrade_bytes = max_bytes * degrade_fraction
+        self.clock = clock
+        self.bytes = 0
+        self.depth = 0
+        self.peak_depth = 0
+        self.peak_bytes = 0
+        self.counts = {ADMIT: 0, DEGRADE: 0, SHED: 0}
+        self.wait_times = WaitTimes()
+
+    def __len__(self):
+        return self.depth
+
+    def admit(self, text):
+        '''
+        Returns (decision, ticket); pass the ticket to `release` once the
+        message has been scored. Shed messages get no ticket.
+        '''
+        size = sys.getsizeof(text) + ENTRY_OVERHEAD
+        if self.bytes + size > self.max_bytes:
+            self.counts[SHED] += 1
+            return SHED, None
+        decision = DEGRADE if self.bytes + size > self.degrade_bytes else ADMIT
+        self.counts[decision] += 1
+        self.bytes += size
+        self.depth += 1
+        self.peak_depth = max(self.peak_depth, self.depth)
+        self.peak_bytes = max(self.peak_bytes, self.bytes)
+        return decision, (size, self.clock())
+
+    def release(self, ticket):
+        size, admitted_at = ticket
+        self.bytes -= size
+        self.depth -= 1
+        self.wait_times.add(self.clock() - admitted_at)
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'bytes': self.bytes,
+            'peak_depth': self.peak_depth,
+            'peak_bytes': self.peak_bytes,
+            'admitted': self.counts[ADMIT],
+            'degraded': self.counts[DEGRADE],
+            'shed': self.counts[SHED],
+            'time_in_intake': self.wait_times.stats(),
+        }
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import hashlib
+
+from result_cache import normalize_text
+
+
+def content_digest(text):
+    # Whitespace and Unicode-form changes score the same, so they don't count
+    # as edits
+    return hashlib.blake2b(normalize_text(text).encode(), digest_size=16).digest()
+
+
+class MessageVersions:
+    '''
+    The last scored version of recent channel messages: a digest of the
+    text the classifier saw and, if it was filed, the id of its auto report
+    and a digest of the text that report shows. Lets an edit be told apart from an embed unfurling, and a
+    re-score update the message's report instead of filing another.
+
+    At most `max_entries` messages are kept, least recently scored evicted
+    first; an edit to an evicted message is handled like a new message.
+    '''
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        # message id -> [digest, report id, report digest]
+        self.entries = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, message_id):
+        return message_id in self.entries
+
+    def unchanged(self, message_id, text):
+        entry = self.entries.get(message_id)
+        return entry is not None and entry[0] == content_digest(text)
+
+    def report_id(self, message_id):
+        entry = self.entries.get(message_id)
+        return None if entry is None else entry[1]
+
+    def report_unchanged(self, message_id, text):
+        # Whether the message's report was filed on (or updated to) `text`
+        entry = self.entries.get(message_id)
+        return entry is not None and entry[2] == content_digest(text)
+
+    def scored(self, message_id, text):
+        entry = self.entries.get(message_id)
+        if entry is None:
+            entry = [None, None, None]
+        entry[0] = content_digest(text)
+        self.remember(message_id, entry)
+
+    def filed(self, message_id, text, report_id):
+        digest = content_digest(text)
+        self.remember(message_id, [digest, report_id, digest])
+
+    def remember(self, message_id, entry):
+        self.entries[message_id] = entry
+        self.entries.move_to_end(message_id)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'entries': len(self.entries),
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,170 @@
+import asyncio
+
+import discord
+
+from rate_limit import TokenBucket
+
+
+MAX_MESSAGE_LENGTH = 2000  # Discord's limit per message
+
+
+def split_message(text, limit=MAX_MESSAGE_LENGTH):
+    # Pieces of at most `limit` characters, broken at newlines where possible
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind('\n', 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip('\n')
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def pack(notes, limit=MAX_MESSAGE_LENGTH):
+    # Joins notes, in order, into as few messages of at most `limit`
+    # characters as possible
+    digests = []
+    current = ''
+    for note in notes:
+        for piece in split_message(note, limit):
+            if current and len(current) + 1 + len(piece) <= limit:
+                current += '\n' + piece
+                continue
+            if current:
+                digests.append(current)
+            current = piece
+    if current:
+        digests.append(current)
+    return digests
+
+
+class NotificationDispatcher:
+    '''
+    Coalesces channel notifications into digests. Notifications for a
+    channel wait up to `interval` seconds, then go out packed into as few
+    messages of at most `max_length` characters as possible, followed by
+    one `footer` rendered at send time (so a status banner shows the latest
+    state rather than one copy per notification).
+
+    Channels are sent to concurrently. Every message draws on a per-channel
+    bucket (`channel_rate` per `channel_period` seconds) and a shared global
+    one (`global_rate` per second), staying under Discord's rate limits
+    rather than running into 429s; while a channel is still working through
+    its budget, new notifications for it keep accumulating.
+    '''
+
+    def __init__(self, interval=1.0, max_length=MAX_MESSAGE_LENGTH,
+                 channel_rate=5, channel_period=5.0, global_rate=50):
+        self.interval = interval
+        self.max_length = max_length
+        self.channel_rate = channel_rate
+        self.channel_period = channel_period
+        self.global_bucket = TokenBucket(global_rate, period=1.0)
+        self.buckets = {}
+        # channel id -> [channel, notes, footer]
+        self.pending = {}
+        # channel id -> task sending that channel's current digests
+        self.sending = {}
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.notifications = 0
+        self.sent = 0
+        self.failures = 0
+        # Digest messages packed but not yet sent, and those given up on
+        self.unsent = 0
+        self.dropped = 0
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.ensure_future(self.run())
+
+    def notify(self, channel, text=None, footer=None):
+        '''
+        Queues `text` for `channel`. `footer` is a zero-argument callable
+        whose result closes the channel's next digest.
+        '''
+        entry = self.pending.setdefault(channel.id, [channel, [], None])
+        if text is not None:
+            entry[1].append(text)
+        if footer is not None:
+            entry[2] = footer
+        self.notifications += 1
+        self.wakeup.set()
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            # Whatever else arrives meanwhile joins the same digest
+            await asyncio.sleep(self.interval)
+            self.wakeup.clear()
+            self.dispatch()
+
+    def dispatch(self):
+        for channel_id in list(self.pending):
+            if channel_id in self.sending:
+                continue
+            channel, notes, footer = self.pending.pop(channel_id)
+            task = asyncio.ensure_future(self.send_digests(channel, notes, footer))
+            self.sending[channel_id] = task
+            task.add_done_callback(lambda _, channel_id=channel_id: self.sent_digests(channel_id))
+
+    def sent_digests(self, channel_id):
+        del self.sending[channel_id]
+        if channel_id in self.pending:
+            # Arrived while this channel was busy
+            self.wakeup.set()
+
+    async def send_digests(self, channel, notes, footer):
+        if footer is not None:
+            notes = notes + [footer()]
+        bucket = self.buckets.get(channel.id)
+        if bucket is None:
+            bucket = self.buckets[channel.id] = TokenBucket(self.channel_rate, period=self.channel_period)
+        digests = pack(notes, self.max_length)
+        self.unsent += len(digests)
+        for digest in digests:
+            await bucket.acquire()
+            await self.global_bucket.acquire()
+            self.unsent -= 1
+            try:
+                await channel.send(digest)
+                self.sent += 1
+            except discord.HTTPException as e:
+                self.failures += 1
+                print(f'\n[DEBUG] Notification to channel {channel.id} failed: {e!r}')
+
+    async def flush(self):
+        # Sends everything pending now, ignoring the interval
+        while self.pending or self.sending:
+            self.dispatch()
+            await asyncio.gather(*self.sending.values())
+
+    async def close(self, timeout=None):
+        '''
+        Sends what is still queued, giving up after `timeout` seconds (None
+        waits for all of it). Returns the number of digest messages dropped.
+        '''
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        dropped = self.unsent + sum(
+            len(pack(notes, self.max_length)) for _, notes, _ in self.pending.values())
+        self.pending.clear()
+        self.unsent = 0
+        self.dropped += dropped
+        return dropped
+
+    def stats(self):
+        return {
+            'notifications': self.notifications,
+            'messages_sent': self.sent,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'pending_channels': len(self.pending),
+        }
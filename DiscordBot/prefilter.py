@@ -0,0 +1,193 @@
+# Tier-0 prefilter: hashed n-gram logistic regression, NumPy only.
+#
+# Scores a message in microseconds so that traffic it is confident is
+# benign never reaches the heavy classifier. Words and word bigrams are
+# hashed (crc32, stable across processes) into a fixed-size weight vector;
+# nothing but the weights, bias and operating threshold is stored.
+#
+# Training uses the binary labels of data/messages-binary.csv (GPT-3 scores
+# mapped through convert_to_binary.binary_label). The operating threshold is
+# picked from out-of-fold predictions as the highest one that still keeps
+# --target-recall of the misinformation, and the script reports the recall,
+# the share of messages skipped and the cost per message at that point.
+#
+# The bundled CSVs are claim-like sentences, not chat; pass real benign
+# channel traffic (one message per line) with --benign to teach it greetings
+# and the like.
+#
+# Usage: python prefilter.py [--data data/messages-binary.csv] [--benign chat.txt] [--target-recall 0.99] [--out prefilter.npz]
+
+import argparse
+import csv
+import re
+import time
+import zlib
+
+import numpy as np
+
+from convert_to_binary import binary_label
+from evaluation import read_dataset
+from result_cache import normalize_text
+
+
+PREFILTER_PATH = 'prefilter.npz'
+NUM_FEATURES = 1 << 18
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def sigmoid(z):
+    return 1 / (1 + np.exp(-z))
+
+
+class Prefilter:
+    '''
+    Logistic regression over hashed word unigrams and bigrams. Each distinct
+    feature counts once, scaled by 1/sqrt(#features) so long and short
+    messages are on the same footing. A message is benign when its
+    probability of being misinformation is below `threshold`.
+    '''
+
+    def __init__(self, weights, bias=0.0, threshold=0.0):
+        self.weights = weights
+        self.bias = float(bias)
+        self.threshold = float(threshold)
+
+    @classmethod
+    def empty(cls, num_features=NUM_FEATURES):
+        return cls(np.zeros(num_features))
+
+    @classmethod
+    def load(cls, path=PREFILTER_PATH):
+        with np.load(path) as data:
+            return cls(data['weights'], data['bias'], data['threshold'])
+
+    def save(self, path=PREFILTER_PATH):
+        np.savez(path, weights=self.weights, bias=self.bias, threshold=self.threshold)
+
+    def features(self, text):
+        tokens = TOKEN_RE.findall(normalize_text(text).lower())
+        grams = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+        num_features = len(self.weights)
+        return np.fromiter(
+            {zlib.crc32(gram.encode()) % num_features for gram in grams}, dtype=np.int64)
+
+    def probability(self, text):
+        indices = self.features(text)
+        z = self.bias
+        if len(indices):
+            z += self.weights[indices].sum() / np.sqrt(len(indices))
+        return float(sigmoid(z))
+
+    def is_benign(self, texts):
+        # All variants of a message must look benign to skip it
+        return all(self.probability(text) < self.threshold for text in texts)
+
+    def fit(self, texts, labels, epochs=300, learning_rate=0.5, l2=1e-4):
+        '''
+        Full-batch Adagrad on the log loss, with classes weighted equally.
+        The design matrix is kept as flat (row, feature, value) arrays.
+        '''
+        rows = [self.features(text) for text in texts]
+        row_ids = np.repeat(np.arange(len(rows)), [len(r) for r in rows])
+        indices = np.concatenate(rows)
+        values = np.concatenate([np.full(len(r), 1 / np.sqrt(max(len(r), 1))) for r in rows])
+        y = np.asarray(labels, dtype=np.float64)
+        positives = max(y.sum(), 1)
+        sample_weight = np.where(y == 1, len(y) / (2 * positives), len(y) / (2 * max(len(y) - positives, 1)))
+        num_features = len(self.weights)
+        accumulated = np.full(num_features, 1e-8)
+        accumulated_bias = 1e-8
+        for _ in range(epochs):
+            z = np.bincount(row_ids, weights=self.weights[indices] * values, minlength=len(y)) + self.bias
+            error = (sigmoid(z) - y) * sample_weight / len(y)
+            grad = np.bincount(indices, weights=error[row_ids] * values, minlength=num_features)
+            grad += l2 * self.weights
+            grad_bias = error.sum()
+            accumulated += grad ** 2
+            accumulated_bias += grad_bias ** 2
+            self.weights -= learning_rate * grad / np.sqrt(accumulated)
+            self.bias -= learning_rate * grad_bias / np.sqrt(accumulated_bias)
+        return self
+
+
+def operating_threshold(probabilities, labels, target_recall):
+    '''
+    Highest threshold at which messages scoring below it can be skipped while
+    at least `target_recall` of the positives still reach the classifier.
+    '''
+    positive = np.sort(probabilities[labels == 1])
+    if not len(positive):
+        return 0.0
+    # Skipping below positive[k] drops exactly the k lowest-scoring positives
+    k = int(np.floor(len(positive) * (1 - target_recall) + 1e-9))
+    return float(positive[min(k, len(positive) - 1)])
+
+
+def out_of_fold(texts, labels, folds, seed=0, **fit_args):
+    order = np.random.default_rng(seed).permutation(len(texts))
+    probabilities = np.empty(len(texts))
+    for fold in np.array_split(order, folds):
+        held_out = np.zeros(len(texts), dtype=bool)
+        held_out[fold] = True
+        model = Prefilter.empty().fit(
+            [texts[i] for i in np.flatnonzero(~held_out)], labels[~held_out], **fit_args)
+        probabilities[fold] = [model.probability(texts[i]) for i in fold]
+    return probabilities
+
+
+def read_scored(path):
+    # GPT-3-scored CSV (1-10) mapped to binary labels
+    with open(path) as file:
+        rows = [row for row in csv.reader(file) if len(row) == 2 and row[1].strip().isdigit()]
+    return [row[0].strip() for row in rows], [binary_label(int(row[1])) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the tier-0 prefilter.')
+    parser.add_argument('--data', default='data/messages-binary.csv', help='binary-labelled CSV')
+    parser.add_argument('--scored', nargs='*', default=[], help='extra GPT-3-scored CSVs, labelled via binary_label')
+    parser.add_argument('--benign', nargs='*', default=[], help='files of benign messages, one per line')
+    parser.add_argument('--target-recall', type=float, default=0.99)
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--out', default=PREFILTER_PATH)
+    args = parser.parse_args()
+
+    texts, labels = read_dataset(args.data)
+    for path in args.scored:
+        extra_texts, extra_labels = read_scored(path)
+        texts += extra_texts
+        labels += extra_labels
+    for path in args.benign:
+        with open(path) as file:
+            lines = [line.strip() for line in file if line.strip()]
+        texts += lines
+        labels += [0] * len(lines)
+    # The CSVs overlap; a message in two folds would leak into its own evaluation
+    distinct = {}
+    for text, label in zip(texts, labels):
+        distinct.setdefault(normalize_text(text), (text, label))
+    texts = [text for text, _ in distinct.values()]
+    labels = np.asarray([label for _, label in distinct.values()])
+    print(f'{len(texts)} distinct messages, {labels.sum()} misinformation')
+
+    probabilities = out_of_fold(texts, labels, args.folds, epochs=args.epochs)
+    threshold = operating_threshold(probabilities, labels, args.target_recall)
+    passed = probabilities >= threshold
+    recall = passed[labels == 1].mean()
+    print(f'operating point (out-of-fold): threshold {threshold:.3f}, recall {recall:.3f}, '
+          f'skips {1 - passed.mean():.1%} of messages ({1 - passed[labels == 0].mean():.1%} of benign)')
+
+    model = Prefilter.empty().fit(texts, labels, epochs=args.epochs)
+    model.threshold = threshold
+    start = time.perf_counter()
+    for text in texts:
+        model.is_benign([text])
+    elapsed = time.perf_counter() - start
+    print(f'cost: {elapsed / len(texts) * 1e6:.1f} us per message')
+    model.save(args.out)
+    print(f'saved to {args.out}')
+
+
+if __name__ == '__main__':
+    main()
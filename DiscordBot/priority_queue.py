@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import time
+
+
+# Placeholder id for entries that were re-prioritized or withdrawn
+REMOVED = object()
+
+
+class IndexedPriorityQueue:
+    '''
+    Max-priority queue of report ids backed by a binary heap (heapq) with an
+    id -> entry index, so push, pop, re-prioritization and removal are all
+    O(log n) amortized.
+
+    Re-prioritized and withdrawn entries are invalidated in place rather than
+    sifted out; the heap is compacted once invalid entries outnumber live
+    ones, which keeps memory within 2x of the live queue.
+
+    Priorities age: an item's effective priority grows by `aging_rate` per
+    second spent in the queue, so low-priority reports cannot starve. Since
+    every item ages at the same rate, ordering by
+    `priority - aging_rate * enqueued_at` is equivalent at all times and no
+    periodic re-heapify is needed. Equal keys are served first in, first out.
+    '''
+
+    def __init__(self, aging_rate=0.0, clock=time.monotonic):
+        self.aging_rate = aging_rate
+        self.clock = clock
+        # Entries are [-sort_key, seq, item_id, priority, enqueued_at]; seq is
+        # unique, so heap comparisons never look past it
+        self.heap = []
+        self.index = {}  # item_id -> live entry
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, item_id):
+        return item_id in self.index
+
+    def empty(self):
+        return not self.index
+
+    def sort_key(self, priority, enqueued_at):
+        # Negated so that the highest effective priority sorts first
+        return self.aging_rate * enqueued_at - priority
+
+    def push(self, item_id, priority, enqueued_at=None):
+        '''
+        Adds `item_id`, or re-prioritizes it if it is already queued.
+        '''
+        if item_id in self.index:
+            self.update(item_id, priority)
+            return
+        if enqueued_at is None:
+            enqueued_at = self.clock()
+        self.add_entry(item_id, priority, enqueued_at)
+
+    def add_entry(self, item_id, priority, enqueued_at):
+        entry = [self.sort_key(priority, enqueued_at), next(self.counter), item_id, priority, enqueued_at]
+        self.index[item_id] = entry
+        heapq.heappush(self.heap, entry)
+
+    def pop(self):
+        '''
+        Removes and returns (item_id, priority) of the item with the highest
+        effective priority. Raises IndexError if the queue is empty.
+        '''
+        while self.heap:
+            entry = heapq.heappop(self.heap)
+            if entry[2] is not REMOVED:
+                del self.index[entry[2]]
+                return entry[2], entry[3]
+        raise IndexError('pop from an empty priority queue')
+
+    def peek(self):
+        while self.heap and self.heap[0][2] is REMOVED:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            raise IndexError('peek at an empty priority queue')
+        return self.heap[0][2], self.heap[0][3]
+
+    def update(self, item_id, priority):
+        '''
+        Changes the base priority of a queued item (up or down), keeping the
+        aging credit it has already earned.
+        '''
+        entry = self.index[item_id]
+        if entry[3] == priority:
+            return
+        entry[2] = REMOVED
+        self.add_entry(item_id, priority, entry[4])
+        self.maybe_compact()
+
+    def remove(self, item_id):
+        '''
+        Withdraws `item_id` from the queue. Returns False if it was not queued.
+        '''
+        entry = self.index.pop(item_id, None)
+        if entry is None:
+            return False
+        entry[2] = REMOVED
+        self.maybe_compact()
+        return True
+
+    def priority(self, item_id):
+        return self.index[item_id][3]
+
+    def enqueued_at(self, item_id):
+        return self.index[item_id][4]
+
+    def effective_priority(self, item_id, now=None):
+        entry = self.index[item_id]
+        if now is None:
+            now = self.clock()
+        return entry[3] + self.aging_rate * (now - entry[4])
+
+    def items(self):
+        '''
+        (item_id, priority, enqueued_at) for every queued item, unordered.
+        '''
+        return [(entry[2], entry[3], entry[4]) for entry in self.index.values()]
+
+    def maybe_compact(self):
+        if len(self.heap) > 2 * len(self.index) + 64:
+            self.heap = [entry for entry in self.heap if entry[2] is not REMOVED]
+            heapq.heapify(self.heap)
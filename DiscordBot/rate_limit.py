@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    '''
+    Token-bucket limiter allowing `rate` units per `period` seconds with
+    bursts of up to `capacity`. Waiters are served in FIFO order.
+    '''
+
+    def __init__(self, rate, period=60.0, capacity=None):
+        self.rate = rate / period
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self.lock:
+            self.refill()
+            while self.tokens < amount:
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+                self.refill()
+            self.tokens -= amount
+
+    def refund(self, amount):
+        self.refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
@@ -1,4 +1,5 @@
 from enum import Enum, auto
+import asyncio
 import discord
 import pprint
 import re
@@ -59,6 +60,7 @@ class Report:
         '4. Remove content and remove user account',
     ]
     NUM_REPORTS = 0
+    MAX_TRACKED_COPIES = 100
     REPORTS = []
 
     ABUSE_TYPES = ['1', '2', '3', '4']
@@ -76,6 +78,13 @@ class Report:
         self.client = client
         self.final_action = ''
         self.false_reporting = False
+        # Near-duplicate copies attached by the campaign index; only the
+        # first MAX_TRACKED_COPIES are kept for removal
+        self.copies = []
+        self.copy_count = 0
+        # The campaign seeded by this report's message and its index entry
+        self.campaign = None
+        self.campaign_entry = None
         if message is None:
             self.state = State.REPORT_START
             self.message = None
@@ -84,13 +93,34 @@ class Report:
         else:
             # Auto-flagging
             self.state = State.IN_REVIEW_STATE
-            self.message = '-' * 50 + '\n'
-            self.message += f'AUTO REPORT [from: {message.author.name}]\nContent:\n```{message.content}```\n'
-            self.message += f'- Score: {score:.3f}\n'
-            self.message += f'- Info: {pprint.pformat(info, indent=4)}\n'
-            self.message += '-' * 50 + '\n'
-            self.message_obj = message
             self.reporting_user_id = reporting_user_id
+            self.update_score(message, score, info)
+
+
+    def update_score(self, message, score, info):
+        # Rewrites an auto report for a new score (or edited message text),
+        # keeping the near-duplicate copies attached to it
+        self.message = '-' * 50 + '\n'
+        self.message += f'AUTO REPORT [from: {message.author.name}]\nContent:\n```{message.content}```\n'
+        self.message += f'- Score: {"pending" if score is None else f"{score:.3f}"}\n'
+        self.message += f'- Info: {pprint.pformat(info, indent=4)}\n'
+        self.message += '-' * 50 + '\n'
+        self.message_obj = message
+
+
+    @classmethod
+    def from_record(cls, client, message, record):
+        '''
+        Rebuilds a queued report from its ReportStore snapshot after a
+        restart. Reports always resume in review; a moderation flow that was
+        in progress starts over.
+        '''
+        report = cls(client)
+        report.state = State.IN_REVIEW_STATE
+        report.message = record['summary']
+        report.message_obj = message
+        report.reporting_user_id = record['reporting_user_id']
+        return report
 
 
     def run_block_state(self):
@@ -373,19 +403,19 @@ class Report:
         elif self.state == State.MOD_4:
             # TODO: Parse response and store in database
             if '1' in message.content:
-                await self.message_obj.delete()
+                await self.remove_content()
                 reply = ''
                 self.final_action = 'disinformation content removed'
             elif '2' in message.content:
-                await self.message_obj.delete()
+                await self.remove_content()
                 reply = '`<User temporarily forbidden from making posts>`\n'
                 self.final_action = 'disinformation content removed and user temporarily forbidden from making posts'
             elif '3' in message.content:
-                await self.message_obj.delete()
+                await self.remove_content()
                 reply = '`<User account temporarily suspended>`\n'
                 self.final_action = 'disinformation content removed and user account temporarily suspended'
             else:
-                await self.message_obj.delete()
+                await self.remove_content()
                 reply = '`<User account removed>`\n'
                 self.final_action = f'disinformation content removed and user account removed'
             reply += (
@@ -511,8 +541,26 @@ class Report:
         return self.state in [State.EMERGENCY, State.HIGHER_LEVEL_MOD]
 
 
+    def attach_copy(self, message):
+        self.copy_count += 1
+        if len(self.copies) < self.MAX_TRACKED_COPIES:
+            self.copies.append(message)
+
+
+    async def remove_content(self):
+        # Removes the reported message and any near-duplicate copies of it
+        await self.message_obj.delete()
+        results = await asyncio.gather(*(copy.delete() for copy in self.copies), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception) and not isinstance(result, discord.errors.NotFound):
+                print(f'\n[DEBUG] Could not remove near-duplicate copy: {result!r}')
+
+
     def report_summary(self):
-        return f'- Status [{self.state}]\n- Platform action: {self.final_action}\n{self.message}'
+        summary = f'- Status [{self.state}]\n- Platform action: {self.final_action}\n{self.message}'
+        if self.copy_count:
+            summary += f'- Near-duplicate copies in this campaign: {self.copy_count}\n'
+        return summary
 
 
     def report_stats(self):
@@ -0,0 +1,216 @@
+import asyncio
+import concurrent.futures
+import json
+import sqlite3
+import time
+
+
+REPORT_STORE_PATH = 'reports.sqlite3'
+CLOSING_EVENTS = ('resolved', 'withdrawn', 'lost', 'dropped')
+
+
+def report_record(report):
+    message = report.message_obj
+    return {
+        'state': report.state.name,
+        'summary': report.message,
+        'reporting_user_id': str(report.reporting_user_id),
+        'guild_id': message.guild.id if message.guild else None,
+        'channel_id': message.channel.id,
+        'message_id': message.id,
+    }
+
+
+class ReportStore:
+    '''
+    Durable moderation state in SQLite (WAL mode).
+
+    Every report event (queued, state change, assignment, resolution) is
+    appended to the `events` journal, and `open_reports` holds one snapshot
+    row per report that is still open. Startup reads only `open_reports`, so
+    recovery time is proportional to the open reports, not the history.
+    Open reports spilled out of memory to bound the queues are listed in
+    `spilled_reports` until they are reloaded.
+
+    Events are buffered in memory and written in one transaction per flush on
+    a background thread, so recording never waits on disk in handle_dm.
+    '''
+
+    def __init__(self, path=REPORT_STORE_PATH, flush_interval=0.5, max_pending=256):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS events ('
+            ' seq INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' report_id TEXT NOT NULL,'
+            ' ts REAL NOT NULL,'
+            ' kind TEXT NOT NULL,'
+            ' data TEXT)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS open_reports ('
+            ' report_id TEXT PRIMARY KEY,'
+            ' state TEXT NOT NULL,'
+            ' tier TEXT,'
+            ' priority REAL,'
+            ' enqueued_at REAL,'
+            ' reporting_user_id TEXT,'
+            ' guild_id INTEGER,'
+            ' channel_id INTEGER,'
+            ' message_id INTEGER,'
+            ' summary TEXT,'
+            ' updated REAL NOT NULL)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS spilled_reports ('
+            ' report_id TEXT PRIMARY KEY)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS false_reports ('
+            ' user_id TEXT NOT NULL,'
+            ' ts INTEGER NOT NULL)')
+        self.conn.commit()
+        self.pending = []
+        self.open_ids = set()
+        # One writer thread keeps transactions in journal order
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='report-store')
+        self.flush_task = None
+        self.flush_lock = asyncio.Lock()
+        self.flushes = set()
+
+    def load_open_reports(self):
+        # Every open report, spilled ones included (flagged `spilled`)
+        records = self.select_open(
+            ', spilled_reports.report_id IS NOT NULL FROM open_reports'
+            ' LEFT JOIN spilled_reports USING (report_id)',
+            extra_columns=['spilled'])
+        self.open_ids = {record['report_id'] for record in records}
+        return records
+
+    async def load_spilled(self, limit, aging_rate=0.0):
+        '''
+        The `limit` spilled reports with the highest aged priority, once the
+        events recorded so far are on disk.
+        '''
+        await self.flush()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.select_open,
+            ' FROM open_reports JOIN spilled_reports USING (report_id)'
+            ' ORDER BY priority - ? * enqueued_at DESC LIMIT ?',
+            (aging_rate, limit))
+
+    def select_open(self, clause, params=(), extra_columns=()):
+        columns = [
+            'report_id', 'state', 'tier', 'priority', 'enqueued_at', 'reporting_user_id',
+            'guild_id', 'channel_id', 'message_id', 'summary']
+        rows = self.conn.execute(
+            f'SELECT {", ".join(f"open_reports.{c}" for c in columns)}{clause}', params).fetchall()
+        return [dict(zip(columns + list(extra_columns), row)) for row in rows]
+
+    def load_false_reports(self, since):
+        '''
+        (user_id, ts) false-report events newer than `since` (epoch seconds);
+        older rows are pruned since they can no longer affect a window.
+        '''
+        with self.conn:
+            self.conn.execute('DELETE FROM false_reports WHERE ts < ?', (since,))
+        return self.conn.execute('SELECT user_id, ts FROM false_reports').fetchall()
+
+    def record(self, kind, report_id, **data):
+        self.pending.append((kind, report_id, time.time(), data))
+        if len(self.pending) >= self.max_pending and self.flush_task is not None and not self.flushes:
+            task = asyncio.ensure_future(self.try_flush())
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
+
+    def record_queued(self, report_id, report, tier, priority, enqueued_at=None):
+        self.open_ids.add(report_id)
+        self.record(
+            'queued', report_id,
+            tier=tier,
+            priority=priority,
+            enqueued_at=enqueued_at or time.time(),
+            **report_record(report))
+
+    def record_state(self, report_id, report):
+        if report_id in self.open_ids:
+            self.record('state', report_id, state=report.state.name, summary=report.message)
+
+    def record_closed(self, report_id, kind, **data):
+        if report_id in self.open_ids:
+            self.open_ids.discard(report_id)
+            self.record(kind, report_id, **data)
+
+    def record_false_report(self, report_id, user_id, ts):
+        self.record('false_report', report_id, user_id=user_id, ts=ts)
+
+    def write(self, ops):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO events (report_id, ts, kind, data) VALUES (?, ?, ?, ?)',
+                [(report_id, ts, kind, json.dumps(data)) for kind, report_id, ts, data in ops])
+            for kind, report_id, ts, data in ops:
+                if kind == 'queued':
+                    self.conn.execute(
+                        'INSERT OR REPLACE INTO open_reports'
+                        ' (report_id, state, tier, priority, enqueued_at, reporting_user_id,'
+                        ' guild_id, channel_id, message_id, summary, updated)'
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (report_id, data['state'], data['tier'], data['priority'],
+                         data['enqueued_at'], data['reporting_user_id'], data['guild_id'],
+                         data['channel_id'], data['message_id'], data['summary'], ts))
+                elif kind == 'state':
+                    self.conn.execute(
+                        'UPDATE open_reports SET state = ?, summary = ?, updated = ? WHERE report_id = ?',
+                        (data['state'], data['summary'], ts, report_id))
+                elif kind == 'false_report':
+                    self.conn.execute(
+                        'INSERT INTO false_reports (user_id, ts) VALUES (?, ?)',
+                        (data['user_id'], data['ts']))
+                elif kind == 'spilled':
+                    self.conn.execute(
+                        'INSERT OR IGNORE INTO spilled_reports (report_id) VALUES (?)', (report_id,))
+                elif kind == 'reloaded':
+                    self.conn.execute('DELETE FROM spilled_reports WHERE report_id = ?', (report_id,))
+                elif kind in CLOSING_EVENTS:
+                    self.conn.execute('DELETE FROM open_reports WHERE report_id = ?', (report_id,))
+                    self.conn.execute('DELETE FROM spilled_reports WHERE report_id = ?', (report_id,))
+
+    async def flush(self):
+        # One flush at a time, so a failed batch is retried ahead of the
+        # events recorded after it
+        async with self.flush_lock:
+            if not self.pending:
+                return
+            ops, self.pending = self.pending, []
+            try:
+                await asyncio.get_running_loop().run_in_executor(self.executor, self.write, ops)
+            except sqlite3.Error:
+                # The transaction was rolled back; keep the batch for the next flush
+                self.pending[:0] = ops
+                raise
+
+    async def try_flush(self):
+        try:
+            await self.flush()
+        except sqlite3.Error as e:
+            print(f'\n[DEBUG] Report store flush failed ({len(self.pending)} events kept): {e!r}')
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.try_flush()
+
+    def start(self):
+        if self.flush_task is None:
+            self.flush_task = asyncio.ensure_future(self.run())
+
+    async def close(self):
+        if self.flush_task is not None:
+            self.flush_task.cancel()
+            self.flush_task = None
+        await self.flush()
+        self.executor.shutdown(wait=True)
+        self.conn.close()
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+import hashlib
+import sys
+import time
+import unicodedata
+
+
+# Rough per-entry overhead of the OrderedDict slot, key bytes and entry tuple
+ENTRY_OVERHEAD = 200
+
+
+def normalize_text(text):
+    return ' '.join(unicodedata.normalize('NFKC', text).split())
+
+
+def is_error(result):
+    # Failures are never cached or persisted: a transient error must not
+    # turn into a permanent score
+    return result is None or result[0] is None or getattr(result, 'error', None) is not None
+
+
+def cache_key(namespace, text):
+    '''
+    Hash of (classifier type, model version, normalized text). Storing the
+    digest rather than the text keeps long pastes from inflating the cache.
+    '''
+    classifier_type, model_version = namespace
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{classifier_type}\0{model_version}\0'.encode())
+    h.update(normalize_text(text).encode())
+    return h.digest()
+
+
+def result_size(result):
+    return sys.getsizeof(result) + sum(sys.getsizeof(v) for v in result)
+
+
+class ResultCache:
+    '''
+    In-memory LRU cache of classification results with an optional TTL,
+    bounded by an estimate of its memory use in bytes rather than by entry
+    count. Error results (score None) are never stored.
+    '''
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (result, expires_at, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, namespace, text):
+        key = cache_key(namespace, text)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, expires_at, size = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            self.discard(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def put(self, namespace, text, result):
+        if is_error(result):
+            return
+        key = cache_key(namespace, text)
+        self.discard(key)
+        size = ENTRY_OVERHEAD + len(key) + result_size(result)
+        if size > self.max_bytes:
+            return
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        self.entries[key] = (result, expires_at, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
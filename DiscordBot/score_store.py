@@ -0,0 +1,155 @@
+import argparse
+import asyncio
+import concurrent.futures
+import csv
+import sqlite3
+import threading
+import time
+
+from result_cache import cache_key, is_error
+
+
+SCORE_CACHE_PATH = 'scores.sqlite3'
+SQLITE_MAX_VARIABLES = 500
+
+
+class PersistentScoreCache:
+    '''
+    On-disk classification cache in SQLite (WAL mode), keyed by the same
+    (classifier type, model version, normalized text) digest as ResultCache.
+    Shared by the bot and the evaluation scripts, so scores survive restarts
+    and re-running an evaluation only pays for messages never scored before.
+
+    The bot goes through fetch_many and put_many_soon, which keep SQLite off
+    its event loop; the scripts call the blocking methods directly.
+    '''
+
+    def __init__(self, path=SCORE_CACHE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            ' key BLOB PRIMARY KEY,'
+            ' classifier_type TEXT NOT NULL,'
+            ' model_id TEXT,'
+            ' score REAL NOT NULL,'
+            ' classification TEXT,'
+            ' created REAL NOT NULL)')
+        self.conn.commit()
+        # One thread: writes land in order, and a read sees earlier writes.
+        # Its thread starts on first use, so the scripts never get one
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='score-store')
+
+    def get_many(self, namespace, texts):
+        keys = [cache_key(namespace, text) for text in texts]
+        found = {}
+        with self.lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                chunk = keys[start:start + SQLITE_MAX_VARIABLES]
+                rows = self.conn.execute(
+                    'SELECT key, score, classification FROM scores'
+                    f' WHERE key IN ({",".join("?" * len(chunk))})',
+                    chunk)
+                for key, score, classification in rows:
+                    found[key] = (score, classification)
+        return [found.get(key) for key in keys]
+
+    def get(self, namespace, text):
+        return self.get_many(namespace, [text])[0]
+
+    def put_many(self, namespace, items):
+        '''
+        Stores (text, result) pairs in one transaction. Error results
+        (score None or `error` set) are skipped.
+        '''
+        classifier_type, model_id = namespace
+        now = time.time()
+        rows = [
+            (cache_key(namespace, text), classifier_type, model_id, result[0], result[1], now)
+            for text, result in items
+            if not is_error(result)]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO scores'
+                ' (key, classifier_type, model_id, score, classification, created)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                rows)
+            self.conn.commit()
+
+    def put(self, namespace, text, result):
+        self.put_many(namespace, [(text, result)])
+
+    async def fetch_many(self, namespace, texts):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.get_many, namespace, texts)
+
+    def put_many_soon(self, namespace, items):
+        # Scores are already in the memory cache; nothing waits on the write
+        future = self.executor.submit(self.put_many, namespace, list(items))
+        future.add_done_callback(self.write_done)
+
+    @staticmethod
+    def write_done(future):
+        if future.exception() is not None:
+            print(f'\n[DEBUG] Score store write failed: {future.exception()!r}')
+
+    def preload(self, classifier, texts, batch_size=64):
+        '''
+        Bulk-scores `texts` with `classifier` (anything with classifier_type,
+        model_id and classify_batch), skipping those already stored.
+        Returns the number of texts that needed the model.
+        '''
+        namespace = (classifier.classifier_type, classifier.model_id)
+        texts = list(dict.fromkeys(texts))
+        stored = self.get_many(namespace, texts)
+        missing = [text for text, result in zip(texts, stored) if result is None]
+        for start in range(0, len(missing), batch_size):
+            chunk = missing[start:start + batch_size]
+            self.put_many(namespace, zip(chunk, classifier.classify_batch(chunk)))
+        return len(missing)
+
+    def count(self, namespace=None):
+        with self.lock:
+            if namespace is None:
+                return self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+            return self.conn.execute(
+                'SELECT COUNT(*) FROM scores WHERE classifier_type = ? AND model_id = ?',
+                namespace).fetchone()[0]
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self.lock:
+            self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Preload the persistent score cache from a CSV of messages.')
+    parser.add_argument('--classifier', choices=['gpt4', 'roberta_fakenews'], default='roberta_fakenews')
+    parser.add_argument('--csv', default='data/messages-binary.csv')
+    parser.add_argument('--db', default=SCORE_CACHE_PATH)
+    parser.add_argument('--batch-size', type=int, default=64)
+    args = parser.parse_args()
+
+    if args.classifier == 'gpt4':
+        from gpt4_classifier import GPT4MisinformationClassifier, load_api_key
+        classifier = GPT4MisinformationClassifier(load_api_key())
+    else:
+        from fn_classifier import DistilRoBERTaFakeNewsClassifier
+        classifier = DistilRoBERTaFakeNewsClassifier()
+
+    with open(args.csv, 'r') as f:
+        texts = [row[0] for row in csv.reader(f) if row]
+    store = PersistentScoreCache(args.db)
+    scored = store.preload(classifier, texts, batch_size=args.batch_size)
+    print(f'Scored {scored} new messages; {len(texts) - scored} were already cached.')
+    store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class SemanticCache:
+    '''
+    Verdict cache keyed by message embedding rather than exact text, so a
+    paraphrase of an already classified claim reuses its verdict.
+
+    Embeddings (L2-normalized, `dim` wide) live in one preallocated float32
+    matrix of `capacity` rows; a batch of queries is a single matrix product
+    against it. A query hits when its best cosine similarity is at least
+    `threshold`. When full, the least recently used row is overwritten.
+    '''
+
+    def __init__(self, dim, capacity=20000, threshold=0.97):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.verdicts = [None] * capacity
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.size = 0
+        self.tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return self.size
+
+    def query(self, vectors):
+        '''
+        Returns one (verdict, similarity) per row of `vectors`, or None where
+        no cached verdict is similar enough.
+        '''
+        if self.size == 0 or len(vectors) == 0:
+            self.misses += len(vectors)
+            return [None] * len(vectors)
+        similarity = vectors @ self.vectors[:self.size].T
+        best = similarity.argmax(axis=1)
+        best_similarity = similarity[np.arange(len(vectors)), best]
+        matches = []
+        for row, row_similarity in zip(best.tolist(), best_similarity.tolist()):
+            if row_similarity < self.threshold:
+                self.misses += 1
+                matches.append(None)
+                continue
+            self.hits += 1
+            self.tick += 1
+            self.last_used[row] = self.tick
+            matches.append((self.verdicts[row], row_similarity))
+        return matches
+
+    def add(self, vectors, verdicts):
+        for vector, verdict in zip(vectors, verdicts):
+            if self.size < self.capacity:
+                row = self.size
+                self.size += 1
+            else:
+                row = int(self.last_used.argmin())
+                self.evictions += 1
+            self.tick += 1
+            self.vectors[row] = vector
+            self.verdicts[row] = verdict
+            self.last_used[row] = self.tick
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,236 @@
+# Scale-out mode: one process per gateway shard plus a shared pool of
+# classifier worker processes.
+#
+# A single ModBot runs every guild's traffic and every model call on one
+# core and one GIL. Here each shard is its own discord.Client process
+# (shard_id/shard_count), and all shards send their micro-batches over one
+# multiprocessing request queue to a pool of classifier workers; each shard
+# gets its answers back on its own response queue. Shard 0 receives DMs and
+# is the coordinator: it alone holds reports, the priority queues, the
+# report store and the campaign index, and files what the other shards
+# forward to it (see ModBot.forward_filing / drain_filings).
+#
+# Usage: python sharding.py [--shards 4] [--workers 4] [--classifier ROBERTA_FAKENEWS] [--mode BEST_ACCURACY]
+#        [--model-path shared_model --share-weights]
+
+import argparse
+import asyncio
+import functools
+import itertools
+import multiprocessing
+import os
+import threading
+import types
+
+import classifier_registry
+
+
+# Fresh interpreters: forking a process that already runs threads is unsafe.
+# Only workers sharing weights are forked, from the launcher, before it has
+# run any inference.
+CONTEXT = multiprocessing.get_context('spawn')
+REQUEST_TIMEOUT = 30  # seconds
+
+
+def load_backend(backend, api_key=None, num_threads=None, model_path=None):
+    # Picklable worker factory for a registered backend
+    cls = classifier_registry.load(backend)
+    if api_key is not None:
+        return cls(api_key)
+    return cls(num_threads, model_path=model_path)
+
+
+def _serve(factory, requests, responses, warmup_text):
+    classifier = factory()
+    if warmup_text is not None:
+        classifier.classify_batch([warmup_text])
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        shard_id, request_id, texts = item
+        try:
+            results, error = classifier.classify_batch(texts), None
+        except Exception as e:
+            results, error = None, repr(e)
+        responses[shard_id].put((request_id, results, error))
+
+
+class ServiceClient:
+    '''
+    A shard's handle on the ClassifierService, usable wherever an async
+    `classify_batch` is (e.g. as a MicroBatcher backend). A reader thread
+    hands responses back to the shard's event loop.
+    '''
+
+    def __init__(self, shard_id, requests, responses, timeout=REQUEST_TIMEOUT):
+        self.shard_id = shard_id
+        self.requests = requests
+        self.responses = responses
+        self.timeout = timeout
+        self.pending = {}
+        self.request_ids = itertools.count()
+        self.reader = None
+
+    def __getstate__(self):
+        # Only the queues cross the process boundary
+        return {k: self.__dict__[k] for k in ('shard_id', 'requests', 'responses', 'timeout')}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    async def classify_batch(self, texts):
+        loop = asyncio.get_running_loop()
+        if self.reader is None:
+            self.reader = threading.Thread(target=self.read, args=(loop,), daemon=True)
+            self.reader.start()
+        request_id = next(self.request_ids)
+        future = loop.create_future()
+        self.pending[request_id] = future
+        self.requests.put((self.shard_id, request_id, list(texts)))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self.pending.pop(request_id, None)
+
+    def read(self, loop):
+        while True:
+            item = self.responses.get()
+            if item is None:
+                return
+            loop.call_soon_threadsafe(self.resolve, *item)
+
+    def resolve(self, request_id, results, error):
+        future = self.pending.get(request_id)
+        if future is None or future.done():
+            # Timed out already
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(f'Classifier worker failed: {error}'))
+        else:
+            future.set_result(results)
+
+    def close(self, timeout=5):
+        if self.reader is not None:
+            self.responses.put(None)
+            # Before the interpreter shuts down under the blocked read
+            self.reader.join(timeout)
+            self.reader = None
+
+
+class ClassifierService:
+    '''
+    `workers` classifier processes built by the picklable `factory`, shared
+    by `num_shards` shards over one request queue. With `share_weights` the
+    classifier is built once here and the workers are forked from this
+    process, sharing its weights instead of each loading a copy.
+    '''
+
+    def __init__(self, factory, num_shards, workers=None, warmup_text=None, share_weights=False):
+        self.requests = CONTEXT.Queue()
+        self.responses = [CONTEXT.Queue() for _ in range(num_shards)]
+        context = CONTEXT
+        if share_weights:
+            classifier = factory()
+            factory = lambda: classifier
+            context = multiprocessing.get_context('fork')
+        self.processes = [
+            context.Process(
+                target=_serve,
+                args=(factory, self.requests, self.responses, warmup_text),
+                daemon=True)
+            for _ in range(workers or os.cpu_count())]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def client(self, shard_id):
+        return ServiceClient(shard_id, self.requests, self.responses[shard_id])
+
+    def shutdown(self, timeout=5):
+        for _ in self.processes:
+            self.requests.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+
+
+class ForwardedMessage:
+    '''
+    Stands in, on the coordinator, for a message another shard scored and
+    forwarded: the filing record carries what filing and the mod channel
+    need, so nothing is fetched over REST unless a moderator removes it.
+    '''
+
+    def __init__(self, client, record):
+        self.client = client
+        self.id = record['message_id']
+        self.content = record['content']
+        self.author = types.SimpleNamespace(id=record['author_id'], name=record['author_name'])
+        self.channel = types.SimpleNamespace(id=record['channel_id'])
+        self.guild = types.SimpleNamespace(id=record['guild_id'])
+
+    async def delete(self):
+        channel = self.client.get_channel(self.channel.id) or await self.client.fetch_channel(self.channel.id)
+        await channel.get_partial_message(self.id).delete()
+
+
+def run_shard(shard_id, shard_count, mode, classifier_type, classifier_client, filings):
+    import bot
+    client = bot.ModBot(
+        mode=bot.Mode[mode],
+        classifier_type=bot.Classifier[classifier_type],
+        shard_id=shard_id,
+        shard_count=shard_count,
+        classifier_client=classifier_client,
+        filings=filings)
+    client.run(bot.discord_token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run ModBot as sharded processes with a shared classifier pool.')
+    parser.add_argument('--shards', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None, help='classifier processes (default: one per core)')
+    parser.add_argument('--threads-per-worker', type=int, default=1, help='torch threads in each worker')
+    parser.add_argument('--model-path', default=None, help='directory from fn_classifier.export_model (memory-mapped weights)')
+    parser.add_argument('--share-weights', action='store_true', help='load the model once and fork the workers')
+    parser.add_argument('--classifier', default='ROBERTA_FAKENEWS',
+                        choices=['GPT4', 'ROBERTA_FAKENEWS', 'ROBERTA_FAKENEWS_INT8'])
+    parser.add_argument('--mode', default='BEST_ACCURACY', choices=['BEST_ACCURACY', 'RAPID_RESPONSE_TO_HARM'])
+    args = parser.parse_args()
+
+    import bot
+    backend = args.classifier.lower()
+    if args.classifier == 'GPT4':
+        from gpt4_classifier import load_api_key
+        factory = functools.partial(load_backend, backend, api_key=load_api_key())
+    else:
+        factory = functools.partial(
+            load_backend, backend, num_threads=args.threads_per_worker, model_path=args.model_path)
+    service = ClassifierService(
+        factory, args.shards, workers=args.workers, warmup_text=bot.WARMUP_TEXT,
+        share_weights=args.share_weights and args.classifier != 'GPT4')
+    service.start()
+    filings = CONTEXT.Queue()
+    shards = [
+        CONTEXT.Process(
+            target=run_shard,
+            args=(shard_id, args.shards, args.mode, args.classifier, service.client(shard_id), filings))
+        for shard_id in range(args.shards)]
+    for shard in shards:
+        shard.start()
+    try:
+        for shard in shards:
+            shard.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for shard in shards:
+            shard.terminate()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import argparse
+import contextlib
+import functools
+import os
+import sys
+import time
+
+import pytest
+
+# The bot's modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ScriptedClassifier:
+    '''
+    Scores the texts in `scores` as given and everything else as benign,
+    taking `latency` seconds per batch.
+    '''
+
+    def __init__(self, scores, latency=0.0):
+        self.scores = scores
+        self.latency = latency
+        self.classifier_type = 'scripted'
+        self.model_id = 'scripted'
+        self.calls = 0
+
+    def classify_batch(self, messages):
+        self.calls += len(messages)
+        time.sleep(self.latency)
+        return [(self.scores.get(m, 0.0), 'scripted') for m in messages]
+
+
+@pytest.fixture(scope='session')
+def bot_module(tmp_path_factory):
+    # The bot's own dependencies; these tests run where the bot can
+    pytest.importorskip('discord')
+    pytest.importorskip('uni2ascii')
+    pytest.importorskip('unidecode')
+    import bench_bot
+    cwd = os.getcwd()
+    try:
+        return bench_bot.load_bot_module(str(tmp_path_factory.mktemp('bot')))
+    finally:
+        os.chdir(cwd)
+
+
+async def shut_down(client):
+    await client.notifier.close(0)
+    for task in list(client.late_results) + list(client.edit_tasks):
+        task.cancel()
+    if client.refill_task is not None:
+        client.refill_task.cancel()
+    await client.report_store.close()
+    for pool in client.classifier_pools:
+        pool.shutdown(wait=True)
+    client.score_store.close()
+
+
+@pytest.fixture
+def modbot(bot_module, tmp_path, monkeypatch):
+    '''
+    Async context manager yielding (client, channel): a ModBot wired to
+    bench_bot's Discord stand-ins, with its stores in a scratch directory
+    and a ScriptedClassifier (as `client.classifier`). Mod channel posts
+    are collected in `client.mod_posts`.
+    '''
+    import bench_bot
+    monkeypatch.chdir(tmp_path)
+    # classify_message sets the high-priority override at random; keep it off
+    monkeypatch.setattr(bot_module.random, 'random', lambda: 0.0)
+
+    class ModChannel(bench_bot.FakeChannel):
+        async def send(self, content=None, **kwargs):
+            self.posts.append(content)
+
+    @contextlib.asynccontextmanager
+    async def modbot(scores=None, latency=0.0, mode='BEST_ACCURACY', deadline=None, queue_capacity=None):
+        args = argparse.Namespace(
+            mode=mode, latency=0.0, flag_rate=0.0, send_latency=0.0, deadline=deadline,
+            prefilter=None, intake_max_bytes=None, queue_capacity=queue_capacity, cascade=False)
+        client, guild, channel = bench_bot.build_bot(bot_module, args, bench_bot.Stages())
+        client.classifier = ScriptedClassifier({} if scores is None else scores, latency)
+        client.classifier_factory = functools.partial(lambda classifier: classifier, client.classifier)
+        mod_channel = ModChannel(201, f'group-{bench_bot.GROUP_NUM}-mod', guild)
+        mod_channel.posts = client.mod_posts = []
+        client.mod_channels[guild.id] = mod_channel
+        await client.setup_hook()
+        await client.classifier_ready.wait()
+        try:
+            yield client, channel
+        finally:
+            await shut_down(client)
+
+    return modbot
+
+
+@pytest.fixture
+def post():
+    '''
+    post(client, channel, message_id, text) delivers a channel message to
+    the bot and returns it.
+    '''
+    import bench_bot
+
+    async def post(client, channel, message_id, text):
+        message = bench_bot.FakeMessage(message_id, text, bench_bot.FakeUser(10, 'poster'), channel)
+        await client.on_message(message)
+        return message
+
+    return post
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from batcher import MicroBatcher
+from classifier_registry import ClassificationError
+
+
+class Backend:
+    def __init__(self, fail=None, drop=0):
+        self.batches = []
+        self.fail = fail
+        self.drop = drop
+
+    def classify_batch(self, texts):
+        self.batches.append(list(texts))
+        if self.fail is not None:
+            raise self.fail
+        results = [(len(text) / 100, f'label {text}') for text in texts]
+        return results[:len(results) - self.drop]
+
+
+def test_flushes_when_the_batch_is_full():
+    async def run():
+        backend = Backend()
+        batcher = MicroBatcher(backend.classify_batch, max_batch_size=4, max_wait=60)
+        results = await asyncio.wait_for(batcher.classify_many(['a', 'bb', 'ccc', 'dddd']), 1)
+        return backend.batches, results
+
+    batches, results = asyncio.run(run())
+    assert batches == [['a', 'bb', 'ccc', 'dddd']]
+    assert [label for _, label in results] == ['label a', 'label bb', 'label ccc', 'label dddd']
+
+
+def test_flushes_a_partial_batch_after_max_wait():
+    async def run():
+        backend = Backend()
+        batcher = MicroBatcher(backend.classify_batch, max_batch_size=100, max_wait=0.02)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        results = await batcher.classify_many(['a', 'bb', 'ccc'])
+        return backend.batches, results, loop.time() - start
+
+    batches, results, elapsed = asyncio.run(run())
+    assert batches == [['a', 'bb', 'ccc']]
+    assert len(results) == 3
+    assert elapsed >= 0.02
+
+
+def test_each_caller_gets_its_own_result_across_batches():
+    async def run():
+        backend = Backend()
+        batcher = MicroBatcher(backend.classify_batch, max_batch_size=3, max_wait=0.01)
+        texts = [f'text {i}' * (i + 1) for i in range(8)]
+        results = await asyncio.gather(*(batcher.classify(text) for text in texts))
+        return backend.batches, texts, results
+
+    batches, texts, results = asyncio.run(run())
+    assert [len(batch) for batch in batches] == [3, 3, 2]
+    assert results == [(len(text) / 100, f'label {text}') for text in texts]
+
+
+def test_async_backends_are_awaited():
+    async def classify_batch(texts):
+        await asyncio.sleep(0)
+        return [(0.5, text) for text in texts]
+
+    async def run():
+        batcher = MicroBatcher(classify_batch, max_batch_size=2)
+        return await batcher.classify_many(['a', 'b'])
+
+    assert asyncio.run(run()) == [(0.5, 'a'), (0.5, 'b')]
+
+
+def test_result_count_mismatch_fails_the_whole_batch():
+    async def run():
+        batcher = MicroBatcher(Backend(drop=1).classify_batch, max_batch_size=2)
+        return await asyncio.gather(batcher.classify('a'), batcher.classify('b'), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, ClassificationError) for r in results)
+    assert 'returned 1 results for 2 texts' in str(results[0])
+
+
+def test_backend_exceptions_reach_callers_as_classification_errors():
+    async def run(fail):
+        batcher = MicroBatcher(Backend(fail=fail).classify_batch, max_batch_size=1)
+        with pytest.raises(ClassificationError) as excinfo:
+            await batcher.classify('a')
+        return excinfo.value
+
+    cause = RuntimeError('CUDA out of memory')
+    error = asyncio.run(run(cause))
+    assert error.__cause__ is cause
+    assert 'RuntimeError' in str(error)
+    own = ClassificationError('quota exceeded')
+    assert asyncio.run(run(own)) is own
+
+
+def test_a_failed_batch_does_not_affect_the_next():
+    async def run():
+        backend = Backend(fail=RuntimeError('transient'))
+        batcher = MicroBatcher(backend.classify_batch, max_batch_size=1)
+        with pytest.raises(ClassificationError):
+            await batcher.classify('a')
+        backend.fail = None
+        return await batcher.classify('b')
+
+    assert asyncio.run(run()) == (0.01, 'label b')
@@ -0,0 +1,68 @@
+import asyncio
+
+
+CLAIM = ('BREAKING: the new vaccine contains microchips that let the government '
+         'track your every move. Share this before it gets deleted!')
+COPY = CLAIM.replace('every move', 'every step')
+HIGH = 'The moon landing was filmed in a studio in Nevada, and NASA admits it.'
+MID = 'Drinking bleach cures the flu; hospitals hide this because it is cheap.'
+LOW = 'Wind turbines cause cancer in everyone living within ten miles of them.'
+
+
+def queued(client):
+    return len(client.high_priority_queue) + len(client.low_priority_queue)
+
+
+def test_near_duplicates_join_the_open_report(modbot, post):
+    async def run():
+        async with modbot(scores={CLAIM: 0.9}) as (client, channel):
+            await post(client, channel, 1, CLAIM)
+            calls = client.classifier.calls
+            await post(client, channel, 2, COPY)
+            assert client.classifier.calls == calls
+            assert queued(client) == 1
+            (report,) = client.reports.values()
+            assert report.copy_count == 1
+            assert report.campaign.copies == 1
+            assert len(client.campaign_index) == 1
+
+    asyncio.run(run())
+
+
+def test_rescore_updates_the_report_and_campaign_in_place(modbot, post):
+    async def run():
+        async with modbot(scores={CLAIM: 0.9}) as (client, channel):
+            message = await post(client, channel, 1, CLAIM)
+            await post(client, channel, 2, COPY)
+            (report_id,) = client.reports
+            assert await client.rescore_report(message, report_id, 0.7, {'score': 0.7})
+            report = client.reports[report_id]
+            assert report.copy_count == 1
+            assert report.campaign.score == 0.7
+            assert len(client.campaign_index) == 1
+            assert client.high_priority_queue.priority(report_id) == 7
+
+    asyncio.run(run())
+
+
+def test_filing_over_capacity_spills_without_notifying(modbot, post):
+    async def run():
+        async with modbot(scores={HIGH: 0.9, MID: 0.8, LOW: 0.3}, queue_capacity=2) as (client, channel):
+            await post(client, channel, 1, HIGH)
+            await post(client, channel, 2, MID)
+            # Over capacity: the new low-priority report is spilled as it is filed
+            await post(client, channel, 3, LOW)
+            assert queued(client) == 1
+            assert len(client.spilled) == 2
+            await client.notifier.flush()
+            posts = '\n'.join(client.mod_posts)
+            assert HIGH in posts and MID in posts
+            assert LOW not in posts
+            # Its copies still find the spilled report's campaign
+            calls = client.classifier.calls
+            await post(client, channel, 4, LOW + '!')
+            assert client.classifier.calls == calls
+            assert len(client.spilled) == 2
+            assert client.campaign_index.query(LOW)[0].copies == 1
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+import asyncio
+
+
+FLAGGED = 'The moon landing was filmed in a studio in Nevada, and NASA admits it.'
+BENIGN = 'Lunch is at noon in the usual place.'
+
+
+def queued(client):
+    return len(client.high_priority_queue) + len(client.low_priority_queue)
+
+
+def test_slow_scores_are_filed_provisionally_then_updated(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}, latency=0.2, deadline=0.02) as (client, channel):
+            await post(client, channel, 1, FLAGGED)
+            (report_id,) = client.reports
+            await client.notifier.flush()
+            assert any('Score: pending' in p for p in client.mod_posts)
+            await asyncio.gather(*client.late_results)
+            assert list(client.reports) == [report_id]
+            assert client.high_priority_queue.priority(report_id) == 9
+            assert client.deadline_stats['late_updates'] == 1
+            await client.notifier.flush()
+            assert any('SCORE UPDATE' in p and 'Score: 0.900' in p for p in client.mod_posts)
+
+    asyncio.run(run())
+
+
+def test_benign_late_scores_withdraw_the_report_with_a_notice(modbot, post):
+    async def run():
+        async with modbot(latency=0.2, deadline=0.02) as (client, channel):
+            await post(client, channel, 1, BENIGN)
+            assert queued(client) == 1
+            await asyncio.gather(*client.late_results)
+            assert queued(client) == 0
+            await client.notifier.flush()
+            assert any('WITHDRAWN' in p and BENIGN in p for p in client.mod_posts)
+
+    asyncio.run(run())
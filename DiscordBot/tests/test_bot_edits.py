@@ -0,0 +1,87 @@
+import asyncio
+
+import bench_bot
+
+
+FLAGGED = 'The moon landing was filmed in a studio in Nevada, and NASA admits it.'
+EDITED = 'The moon landing was filmed in a studio in Utah, and NASA admits it.'
+BENIGN = 'Lunch is at noon in the usual place.'
+
+
+def queued(client):
+    return len(client.high_priority_queue) + len(client.low_priority_queue)
+
+
+def edited(message, text):
+    return bench_bot.FakeMessage(message.id, text, message.author, message.channel)
+
+
+def test_unchanged_text_is_not_rescored(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            message = await post(client, channel, 1, FLAGGED)
+            calls = client.classifier.calls
+            await client.handle_edit(edited(message, FLAGGED))
+            assert client.classifier.calls == calls
+            assert client.edit_stats['unchanged'] == 1
+
+    asyncio.run(run())
+
+
+def test_edit_updates_the_queued_report_in_place(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9, EDITED: 0.6}) as (client, channel):
+            message = await post(client, channel, 1, FLAGGED)
+            (report_id,) = client.reports
+            await client.handle_edit(edited(message, EDITED))
+            assert list(client.reports) == [report_id]
+            assert client.reports[report_id].message_obj.content == EDITED
+            assert client.high_priority_queue.priority(report_id) == 6
+            assert client.edit_stats['updates'] == 1
+            await client.notifier.flush()
+            assert any('SCORE UPDATE' in p and EDITED in p for p in client.mod_posts)
+
+    asyncio.run(run())
+
+
+def test_edit_to_benign_text_withdraws_the_report(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            message = await post(client, channel, 1, FLAGGED)
+            await client.handle_edit(edited(message, BENIGN))
+            assert queued(client) == 0
+            assert not client.reports
+
+    asyncio.run(run())
+
+
+def test_edit_to_flagged_text_files_a_report(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            message = await post(client, channel, 1, BENIGN)
+            assert not client.reports
+            await client.handle_edit(edited(message, FLAGGED))
+            (report,) = client.reports.values()
+            assert report.message_obj.content == FLAGGED
+
+    asyncio.run(run())
+
+
+def test_a_burst_of_edits_is_scored_once(bot_module, modbot, post, monkeypatch):
+    monkeypatch.setattr(bot_module, 'EDIT_DEBOUNCE', 0.05)
+
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            before = await post(client, channel, 1, BENIGN)
+            calls = client.classifier.calls
+            for text in (BENIGN + '!', BENIGN + '!!', FLAGGED):
+                after = edited(before, text)
+                await client.on_raw_message_edit(bench_bot.FakeEdit(after, before=before))
+                before = after
+            await asyncio.gather(*client.edit_tasks)
+            assert client.classifier.calls == calls + 1
+            assert client.edit_stats['debounced'] == 2
+            (report,) = client.reports.values()
+            assert report.message_obj.content == FLAGGED
+
+    asyncio.run(run())
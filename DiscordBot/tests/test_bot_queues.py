@@ -0,0 +1,63 @@
+import asyncio
+
+
+HIGH = 'The moon landing was filmed in a studio in Nevada, and NASA admits it.'
+MID = 'Drinking bleach cures the flu; hospitals hide this because it is cheap.'
+LOW = 'Wind turbines cause cancer in everyone living within ten miles of them.'
+SCORES = {HIGH: 0.9, MID: 0.8, LOW: 0.3}
+
+
+def queued(client):
+    return len(client.high_priority_queue) + len(client.low_priority_queue)
+
+
+async def drain(client):
+    # What the moderation flow does when a moderator takes the next report
+    queue = client.high_priority_queue if len(client.high_priority_queue) else client.low_priority_queue
+    report_id = client.take_report(queue)
+    client.reports.pop(report_id)
+    if client.refill_task is not None:
+        await client.refill_task
+    return report_id
+
+
+def test_spilled_reports_are_reloaded_as_the_queues_drain(modbot, post):
+    async def run():
+        async with modbot(scores=SCORES, queue_capacity=2) as (client, channel):
+            for message_id, text in enumerate((HIGH, MID, LOW), 1):
+                await post(client, channel, message_id, text)
+            assert queued(client) == 1
+            assert len(client.spilled) == 2
+            taken = [await drain(client)]
+            # The best spilled report comes back first, one at a time
+            assert queued(client) == 1
+            assert len(client.spilled) == 1
+            (reloaded,) = client.reports.values()
+            assert reloaded.message_obj.content == MID
+            taken.append(await drain(client))
+            assert not client.spilled
+            (reloaded,) = client.reports.values()
+            assert reloaded.message_obj.content == LOW
+            taken.append(await drain(client))
+            assert queued(client) == 0
+            assert len(set(taken)) == 3
+            assert client.queue_stats['spilled'] == 2
+            assert client.queue_stats['reloaded'] == 2
+
+    asyncio.run(run())
+
+
+def test_spilled_reports_of_deleted_messages_are_closed_as_lost(modbot, post):
+    async def run():
+        async with modbot(scores=SCORES, queue_capacity=2) as (client, channel):
+            for message_id, text in enumerate((HIGH, MID, LOW), 1):
+                await post(client, channel, message_id, text)
+            del channel.messages[2]
+            await drain(client)
+            # MID is gone, so LOW is reloaded in its place
+            assert not client.spilled
+            (reloaded,) = client.reports.values()
+            assert reloaded.message_obj.content == LOW
+            assert client.queue_stats['reloaded'] == 1
+
+    asyncio.run(run())
@@ -0,0 +1,84 @@
+import asyncio
+import queue
+
+
+FLAGGED = 'The moon landing was filmed in a studio in Nevada, and NASA admits it.'
+BENIGN = 'Lunch is at noon in the usual place.'
+
+
+def as_shard(client):
+    # A shard other than the coordinator, forwarding into a local queue
+    client.is_coordinator = False
+    client.filings = queue.Queue()
+    return client.filings
+
+
+def forwarded(filings):
+    records = []
+    while not filings.empty():
+        records.append(filings.get())
+    return records
+
+
+def test_shards_forward_only_messages_that_may_need_a_report(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            filings = as_shard(client)
+            await post(client, channel, 1, BENIGN)
+            await post(client, channel, 2, FLAGGED)
+            (record,) = forwarded(filings)
+            assert record['message_id'] == 2
+            assert record['content'] == FLAGGED
+            assert (record['author_id'], record['author_name']) == (10, 'poster')
+            assert record['mod_channel_id'] == client.mod_channels[channel.guild.id].id
+
+    asyncio.run(run())
+
+
+def test_shards_forward_every_new_score_for_a_forwarded_message(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            filings = as_shard(client)
+            message = await post(client, channel, 1, FLAGGED)
+            # The coordinator may have filed it; a benign score withdraws it
+            await client.file_auto_report(message, 0.1, {'score': 0.1})
+            assert [r['score'] for r in forwarded(filings)] == [0.9, 0.1]
+
+    asyncio.run(run())
+
+
+def test_guilds_without_a_mod_channel_are_forwarded(modbot, post):
+    async def run():
+        async with modbot(scores={FLAGGED: 0.9}) as (client, channel):
+            filings = as_shard(client)
+            client.mod_channels.clear()
+            await post(client, channel, 1, FLAGGED)
+            (record,) = forwarded(filings)
+            assert record['mod_channel_id'] is None
+
+    asyncio.run(run())
+
+
+def test_coordinator_files_forwarded_records_without_fetching_messages(modbot):
+    async def run():
+        async with modbot() as (client, channel):
+            fetched = []
+
+            async def fetch_channel(channel_id):
+                fetched.append(channel_id)
+                return type(client.mod_channels[channel.guild.id])(channel_id, 'group-0-mod')
+
+            client.fetch_channel = fetch_channel
+            for message_id, text in [(1, FLAGGED), (2, FLAGGED + '!!')]:
+                await client.file_forwarded({
+                    'guild_id': 500, 'channel_id': 501, 'message_id': message_id, 'mod_channel_id': 502,
+                    'content': text, 'author_id': 7, 'author_name': 'elsewhere',
+                    'score': 0.9, 'info': {'score': 0.9}})
+            # One REST call for the other guild's mod channel, none per message
+            assert fetched == [502]
+            (report,) = client.reports.values()
+            assert report.message_obj.content == FLAGGED
+            assert report.copy_count == 1
+            assert FLAGGED in report.message
+
+    asyncio.run(run())
@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from campaign_index import Campaign, CampaignIndex
+
+
+TEXT = ('BREAKING: the new vaccine contains microchips that let the government '
+        'track your every move. Doctors are being paid to stay silent. Share '
+        'this before it gets deleted!')
+OTHER = ('The city council meets on Thursday to vote on the new bike lanes along '
+         'Main Street; residents can comment online until Wednesday evening.')
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def jaccard(index, a, b):
+    a, b = index.shingles(a), index.shingles(b)
+    return len(a & b) / len(a | b)
+
+
+def test_finds_near_duplicates():
+    index = CampaignIndex()
+    campaign = Campaign('report', 0.9, {})
+    index.add(TEXT, campaign)
+    for copy in [TEXT, TEXT.upper(), '  ' + TEXT.replace(' ', '  '), TEXT.replace('every move', 'every step')]:
+        match = index.query(copy)
+        assert match is not None
+        assert match[0] is campaign
+        assert match[1] >= index.threshold
+
+
+def test_ignores_dissimilar_text():
+    index = CampaignIndex()
+    index.add(TEXT, Campaign('report', 0.9, {}))
+    assert index.query(OTHER) is None
+    assert index.stats()['misses'] == 1
+
+
+def test_pairs_below_the_threshold_do_not_match():
+    index = CampaignIndex()
+    index.add(TEXT, Campaign('report', 0.9, {}))
+    half = TEXT[:len(TEXT) // 2] + OTHER[len(OTHER) // 2:]
+    assert jaccard(index, TEXT, half) < 0.5
+    assert index.query(half) is None
+
+
+def test_returns_the_closest_campaign():
+    index = CampaignIndex()
+    near = Campaign('near', 0.9, {})
+    index.add(TEXT.replace('government', 'state') + ' Wake up!', Campaign('far', 0.9, {}))
+    index.add(TEXT, near)
+    assert index.query(TEXT)[0] is near
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    index = CampaignIndex(ttl=60, clock=clock)
+    index.add(TEXT, Campaign('report', 0.9, {}))
+    clock.now = 59
+    assert index.query(TEXT) is not None
+    clock.now = 61
+    assert index.query(TEXT) is None
+    assert len(index) == 0
+    assert index.stats()['buckets'] == 0
+
+
+def test_oldest_entries_are_evicted_beyond_max_entries():
+    index = CampaignIndex(max_entries=2)
+    index.add(TEXT, Campaign('first', 0.9, {}))
+    index.add(OTHER, Campaign('second', 0.9, {}))
+    index.add('An entirely different third message about the moon landing hoax.', Campaign('third', 0.9, {}))
+    assert len(index) == 2
+    assert index.query(TEXT) is None
+    assert index.query(OTHER)[0].report_id == 'second'
+    assert index.stats()['evictions'] == 1
+
+
+def test_remove_drops_the_entry_and_its_buckets():
+    index = CampaignIndex()
+    first = index.add(TEXT, Campaign('first', 0.9, {}))
+    second = index.add(TEXT, Campaign('second', 0.9, {}))
+    assert index.remove(first)
+    assert not index.remove(first)
+    assert index.query(TEXT)[0].report_id == 'second'
+    assert index.remove(second)
+    assert index.query(TEXT) is None
+    assert index.stats()['buckets'] == 0
+
+
+def test_num_perm_must_split_into_bands():
+    with pytest.raises(ValueError):
+        CampaignIndex(num_perm=64, bands=10)
+
+
+def test_signatures_are_reproducible_across_processes():
+    script = ('from campaign_index import CampaignIndex; '
+              f'print(CampaignIndex(seed=7).signature({TEXT!r}).tolist())')
+    outputs = {
+        subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, check=True,
+            env={'PYTHONHASHSEED': seed, 'PYTHONPATH': os.pathsep.join(sys.path)}).stdout
+        for seed in ('1', '2')}
+    assert len(outputs) == 1
+    assert outputs.pop().strip() == str(CampaignIndex(seed=7).signature(TEXT).tolist())
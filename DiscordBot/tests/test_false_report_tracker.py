@@ -0,0 +1,63 @@
+from false_report_tracker import FalseReportTracker
+
+
+class Clock:
+    def __init__(self, now=1_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_blocks_at_limit_within_window():
+    clock = Clock()
+    tracker = FalseReportTracker(limit=2, span_seconds=100, clock=clock)
+    assert tracker.allowed('u')
+    tracker.record('u')
+    assert tracker.allowed('u')
+    clock.now += 50
+    tracker.record('u')
+    assert not tracker.allowed('u')
+    assert tracker.allowed('someone else')
+
+
+def test_reports_expire_out_of_the_window():
+    clock = Clock()
+    tracker = FalseReportTracker(limit=2, span_seconds=100, clock=clock)
+    tracker.record('u')
+    clock.now += 50
+    tracker.record('u')
+    clock.now += 51
+    assert tracker.count('u') == 1
+    assert tracker.allowed('u')
+    clock.now += 50
+    assert tracker.count('u') == 0
+    assert len(tracker) == 0
+
+
+def test_keeps_only_the_most_recent_limit_reports():
+    clock = Clock()
+    tracker = FalseReportTracker(limit=2, span_seconds=100, clock=clock)
+    for _ in range(10):
+        tracker.record('u')
+        clock.now += 1
+    assert tracker.count('u') == 2
+
+
+def test_sweep_drops_users_with_empty_windows():
+    clock = Clock()
+    tracker = FalseReportTracker(limit=1, span_seconds=100, sweep_interval=10, clock=clock)
+    tracker.record('old')
+    clock.now += 200
+    tracker.record('new')
+    assert len(tracker) == 1
+    assert tracker.snapshot() == [('new', clock.now)]
+
+
+def test_restore_from_snapshot_rows():
+    clock = Clock()
+    tracker = FalseReportTracker(limit=2, span_seconds=100, clock=clock)
+    # Out of order, as they may come back from storage
+    tracker.restore([('u', clock.now - 10), ('u', clock.now - 200), ('u', clock.now - 20)])
+    assert tracker.count('u') == 2
+    assert not tracker.allowed('u')
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from gpt4_classifier import parse_batch_response, parse_classification
+
+
+def reply(items):
+    return json.dumps(items)
+
+
+def test_batch_reply_maps_ids_to_results():
+    output = reply([
+        {'id': 0, 'score': 0.9, 'classification': 'misinformation'},
+        {'id': 1, 'score': 0, 'classification': ' accurate '},
+    ])
+    assert parse_batch_response(output, [0, 1]) == {0: (0.9, 'misinformation'), 1: (0.0, 'accurate')}
+
+
+def test_batch_reply_in_a_code_fence_or_prose():
+    items = reply([{'id': 0, 'score': 0.4, 'classification': 'opinion'}])
+    assert parse_batch_response(f'```json\n{items}\n```', [0]) == {0: (0.4, 'opinion')}
+    assert parse_batch_response(f'Here are the scores: {items} Hope this helps.', [0]) == {0: (0.4, 'opinion')}
+
+
+@pytest.mark.parametrize('output', [
+    '',
+    'I cannot classify these messages.',
+    '[{"id": 0, "score": 0.5, "classification": "x"',
+    '{"id": 0, "score": 0.5, "classification": "x"}',
+    '[1, 2, 3]',
+])
+def test_malformed_batch_replies_parse_to_nothing(output):
+    assert parse_batch_response(output, [0]) == {}
+
+
+def test_invalid_items_are_left_out():
+    output = reply([
+        {'id': 0, 'score': 1.5, 'classification': 'x'},
+        {'id': 1, 'score': -0.1, 'classification': 'x'},
+        {'id': 2, 'score': True, 'classification': 'x'},
+        {'id': 3, 'score': '0.5', 'classification': 'x'},
+        {'id': 4, 'score': 0.5, 'classification': ''},
+        {'id': 5, 'score': 0.5},
+        {'id': 99, 'score': 0.5, 'classification': 'x'},
+        {'id': True, 'score': 0.5, 'classification': 'x'},
+        {'id': 6, 'score': 0.5, 'classification': 'x'},
+    ])
+    assert parse_batch_response(output, range(7)) == {6: (0.5, 'x')}
+
+
+def test_duplicated_ids_are_left_out():
+    output = reply([
+        {'id': 0, 'score': 0.1, 'classification': 'x'},
+        {'id': 0, 'score': 0.9, 'classification': 'y'},
+        {'id': 1, 'score': 0.5, 'classification': 'z'},
+    ])
+    assert parse_batch_response(output, [0, 1]) == {1: (0.5, 'z')}
+
+
+def test_single_reply():
+    assert parse_classification('Score: 0.85\nClassification: misinformation\n') == (0.85, 'misinformation')
+
+
+@pytest.mark.parametrize('output', [
+    'Score: 0.85',
+    'Classification: misinformation',
+    'Score: high\nClassification: misinformation',
+    'Score: 1.2\nClassification: misinformation',
+])
+def test_malformed_single_replies_raise(output):
+    with pytest.raises(ValueError):
+        parse_classification(output)
@@ -0,0 +1,54 @@
+import sys
+
+from intake import ADMIT, DEGRADE, ENTRY_OVERHEAD, SHED, Intake
+
+
+TEXT = 'is this true?'
+SIZE = sys.getsizeof(TEXT) + ENTRY_OVERHEAD
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_admits_then_degrades_then_sheds():
+    intake = Intake(max_bytes=4 * SIZE, degrade_fraction=0.5)
+    decisions = [intake.admit(TEXT)[0] for _ in range(5)]
+    assert decisions == [ADMIT, ADMIT, DEGRADE, DEGRADE, SHED]
+    assert len(intake) == 4
+    assert intake.bytes == 4 * SIZE
+    stats = intake.stats()
+    assert (stats['admitted'], stats['degraded'], stats['shed']) == (2, 2, 1)
+
+
+def test_shed_messages_get_no_ticket():
+    intake = Intake(max_bytes=SIZE - 1)
+    assert intake.admit(TEXT) == (SHED, None)
+    assert intake.bytes == 0
+    assert len(intake) == 0
+
+
+def test_release_frees_room_and_records_wait():
+    clock = Clock()
+    intake = Intake(max_bytes=2 * SIZE, clock=clock)
+    tickets = [intake.admit(TEXT)[1] for _ in range(2)]
+    assert intake.admit(TEXT)[0] == SHED
+    clock.now = 1.5
+    intake.release(tickets[0])
+    assert intake.bytes == SIZE
+    assert intake.admit(TEXT)[0] != SHED
+    stats = intake.stats()
+    assert stats['peak_depth'] == 2
+    assert stats['peak_bytes'] == 2 * SIZE
+    assert stats['time_in_intake']['count'] == 1
+    assert stats['time_in_intake']['max'] == 1.5
+
+
+def test_long_messages_take_more_room():
+    intake = Intake(max_bytes=3 * SIZE)
+    assert intake.admit('x' * 3 * SIZE)[0] == SHED
+    assert intake.admit(TEXT)[0] == ADMIT
@@ -0,0 +1,62 @@
+import asyncio
+
+from notifier import NotificationDispatcher, pack, split_message
+
+
+class Channel:
+    def __init__(self, channel_id=1):
+        self.id = channel_id
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+def test_split_breaks_at_newlines():
+    assert split_message('aaaa\nbbbb\ncc', limit=9) == ['aaaa\nbbbb', 'cc']
+
+
+def test_split_cuts_lines_longer_than_the_limit():
+    assert split_message('x' * 25, limit=10) == ['x' * 10, 'x' * 10, 'x' * 5]
+    assert split_message('', limit=10) == []
+
+
+def test_pack_joins_notes_in_order_within_the_limit():
+    notes = ['one', 'two', 'three', 'four']
+    assert pack(notes, limit=9) == ['one\ntwo', 'three', 'four']
+    assert pack(notes, limit=2000) == ['one\ntwo\nthree\nfour']
+    assert pack([], limit=10) == []
+
+
+def test_pack_splits_long_notes_and_never_exceeds_the_limit():
+    notes = ['a' * 15, 'b' * 3, 'line\n' * 10]
+    digests = pack(notes, limit=12)
+    assert all(len(d) <= 12 for d in digests)
+    assert ''.join(digests).replace('\n', '') == ''.join(notes).replace('\n', '')
+
+
+def test_close_sends_everything_with_a_footer():
+    async def run():
+        dispatcher = NotificationDispatcher(interval=0.01)
+        channel = Channel()
+        dispatcher.notify(channel, 'first')
+        dispatcher.notify(channel, 'second', footer=lambda: 'footer')
+        assert await dispatcher.close() == 0
+        return channel.sent
+
+    assert asyncio.run(run()) == ['first\nsecond\nfooter']
+
+
+def test_close_drops_what_the_rate_limit_cannot_send_in_time():
+    async def run():
+        dispatcher = NotificationDispatcher(interval=0.01, max_length=10, channel_rate=1, channel_period=60)
+        channel = Channel()
+        for i in range(5):
+            dispatcher.notify(channel, f'note {i:05}')
+        dropped = await dispatcher.close(timeout=0.2)
+        return dropped, channel.sent, dispatcher.stats()
+
+    dropped, sent, stats = asyncio.run(run())
+    assert sent == ['note 00000']
+    assert dropped == 4
+    assert stats['dropped'] == 4
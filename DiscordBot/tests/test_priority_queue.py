@@ -0,0 +1,90 @@
+import pytest
+
+from priority_queue import IndexedPriorityQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def drain(queue):
+    items = []
+    while not queue.empty():
+        items.append(queue.pop()[0])
+    return items
+
+
+def test_pops_highest_priority_first_and_ties_in_order():
+    queue = IndexedPriorityQueue()
+    for item_id, priority in [('a', 1), ('b', 5), ('c', 5), ('d', 3)]:
+        queue.push(item_id, priority)
+    assert drain(queue) == ['b', 'c', 'd', 'a']
+
+
+def test_empty_queue_raises():
+    queue = IndexedPriorityQueue()
+    with pytest.raises(IndexError):
+        queue.pop()
+    with pytest.raises(IndexError):
+        queue.peek()
+
+
+def test_aging_lets_old_low_priority_items_overtake():
+    clock = Clock()
+    queue = IndexedPriorityQueue(aging_rate=1.0, clock=clock)
+    queue.push('old', 1)
+    clock.now = 10
+    queue.push('new', 5)
+    assert queue.effective_priority('old') == 11
+    assert queue.peek() == ('old', 1)
+    assert drain(queue) == ['old', 'new']
+
+
+def test_update_keeps_aging_credit():
+    clock = Clock()
+    queue = IndexedPriorityQueue(aging_rate=1.0, clock=clock)
+    queue.push('a', 1)
+    clock.now = 10
+    queue.push('b', 5)
+    queue.update('a', 0)
+    assert queue.enqueued_at('a') == 0
+    assert queue.effective_priority('a') == 10
+    assert queue.peek() == ('a', 0)
+    queue.update('a', -10)
+    assert drain(queue) == ['b', 'a']
+
+
+def test_push_of_queued_item_reprioritizes():
+    queue = IndexedPriorityQueue()
+    queue.push('a', 1)
+    queue.push('b', 2)
+    queue.push('a', 3)
+    assert len(queue) == 2
+    assert queue.priority('a') == 3
+    assert drain(queue) == ['a', 'b']
+
+
+def test_remove():
+    queue = IndexedPriorityQueue()
+    queue.push('a', 1)
+    queue.push('b', 2)
+    assert queue.remove('b')
+    assert not queue.remove('b')
+    assert 'b' not in queue
+    assert queue.peek() == ('a', 1)
+    assert drain(queue) == ['a']
+
+
+def test_invalidated_entries_are_compacted():
+    queue = IndexedPriorityQueue()
+    for i in range(100):
+        queue.push(i, i)
+    for round in range(20):
+        for i in range(100):
+            queue.update(i, i + round + 1)
+    assert len(queue.heap) <= 2 * len(queue) + 64
+    assert drain(queue) == list(reversed(range(100)))
@@ -0,0 +1,35 @@
+import asyncio
+import sqlite3
+
+from report_store import ReportStore
+
+
+def events(store):
+    return [tuple(row) for row in store.conn.execute('SELECT report_id, kind FROM events ORDER BY seq')]
+
+
+def test_a_failed_flush_keeps_its_events_in_order(tmp_path, monkeypatch):
+    store = ReportStore(str(tmp_path / 'reports.sqlite3'))
+    write = store.write
+    failures = [sqlite3.OperationalError('database is locked')]
+
+    def flaky_write(ops):
+        if failures:
+            raise failures.pop()
+        write(ops)
+
+    monkeypatch.setattr(store, 'write', flaky_write)
+
+    async def run():
+        store.record('spilled', 'r1')
+        store.record('reloaded', 'r1')
+        await store.try_flush()
+        assert events(store) == []
+        store.record('withdrawn', 'r1')
+        await store.flush()
+        await store.close()
+
+    asyncio.run(run())
+    store = ReportStore(str(tmp_path / 'reports.sqlite3'))
+    assert events(store) == [('r1', 'spilled'), ('r1', 'reloaded'), ('r1', 'withdrawn')]
+    asyncio.run(store.close())
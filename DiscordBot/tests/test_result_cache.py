@@ -0,0 +1,80 @@
+import result_cache
+from gpt4_classifier import ClassificationResult
+from result_cache import ENTRY_OVERHEAD, ResultCache, cache_key, result_size
+
+
+NAMESPACE = ('stub', 'v1')
+
+
+def entry_size(text, result):
+    return ENTRY_OVERHEAD + len(cache_key(NAMESPACE, text)) + result_size(result)
+
+
+def test_hit_and_miss_counts():
+    cache = ResultCache()
+    assert cache.get(NAMESPACE, 'a') is None
+    cache.put(NAMESPACE, 'a', (0.9, 'misinformation'))
+    assert cache.get(NAMESPACE, 'a') == (0.9, 'misinformation')
+    assert cache.get(('stub', 'v2'), 'a') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_whitespace_and_unicode_form_share_an_entry():
+    cache = ResultCache()
+    cache.put(NAMESPACE, 'the  earth is\nflat', (0.9, 'x'))
+    assert cache.get(NAMESPACE, ' the earth is flat ') == (0.9, 'x')
+    assert cache.get(NAMESPACE, 'ｔｈｅ earth is flat') == (0.9, 'x')
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, 'monotonic', lambda: now[0])
+    cache = ResultCache(ttl=60)
+    cache.put(NAMESPACE, 'a', (0.9, 'x'))
+    now[0] += 59
+    assert cache.get(NAMESPACE, 'a') == (0.9, 'x')
+    now[0] += 2
+    assert cache.get(NAMESPACE, 'a') is None
+    assert len(cache) == 0
+    assert cache.bytes == 0
+    assert cache.stats()['expirations'] == 1
+
+
+def test_evicts_least_recently_used_to_stay_within_bytes():
+    result = (0.9, 'x')
+    size = entry_size('message 0', result)
+    cache = ResultCache(max_bytes=3 * size)
+    for i in range(3):
+        cache.put(NAMESPACE, f'message {i}', result)
+    # Touching message 0 makes message 1 the least recently used
+    assert cache.get(NAMESPACE, 'message 0') is not None
+    cache.put(NAMESPACE, 'message 3', result)
+    assert cache.get(NAMESPACE, 'message 1') is None
+    assert cache.get(NAMESPACE, 'message 0') is not None
+    assert cache.bytes <= cache.max_bytes
+    assert cache.stats()['evictions'] == 1
+
+
+def test_replacing_an_entry_does_not_leak_bytes():
+    cache = ResultCache()
+    cache.put(NAMESPACE, 'a', (0.9, 'x'))
+    size = cache.bytes
+    cache.put(NAMESPACE, 'a', (0.8, 'x'))
+    assert cache.bytes == size
+    assert cache.get(NAMESPACE, 'a') == (0.8, 'x')
+
+
+def test_oversized_results_are_not_stored():
+    cache = ResultCache(max_bytes=100)
+    cache.put(NAMESPACE, 'a', (0.9, 'x' * 1000))
+    assert len(cache) == 0
+    assert cache.bytes == 0
+
+
+def test_error_results_are_not_stored():
+    cache = ResultCache()
+    cache.put(NAMESPACE, 'a', (None, None))
+    cache.put(NAMESPACE, 'b', ClassificationResult(None, None, 'timeout'))
+    cache.put(NAMESPACE, 'c', ClassificationResult(0.5, 'x', 'partial reply'))
+    assert len(cache) == 0
@@ -0,0 +1,37 @@
+import asyncio
+import threading
+
+from score_store import PersistentScoreCache
+
+
+NAMESPACE = ('scripted', 'v1')
+
+
+def test_async_reads_see_earlier_writes(tmp_path):
+    store = PersistentScoreCache(str(tmp_path / 'scores.sqlite3'))
+
+    async def run():
+        store.put_many_soon(NAMESPACE, [('a', (0.9, 'fake')), ('b', (None, 'error'))])
+        return await store.fetch_many(NAMESPACE, ['a', 'b', 'c'])
+
+    assert asyncio.run(run()) == [(0.9, 'fake'), None, None]
+    store.close()
+
+
+def test_writes_run_off_the_calling_thread(tmp_path, monkeypatch):
+    store = PersistentScoreCache(str(tmp_path / 'scores.sqlite3'))
+    threads = []
+    put_many = store.put_many
+
+    def recording_put_many(*args):
+        threads.append(threading.get_ident())
+        put_many(*args)
+
+    monkeypatch.setattr(store, 'put_many', recording_put_many)
+    store.put_many_soon(NAMESPACE, [('a', (0.9, 'fake'))])
+    # close() waits for writes already queued
+    store.close()
+    assert threads and threads[0] != threading.get_ident()
+    reopened = PersistentScoreCache(str(tmp_path / 'scores.sqlite3'))
+    assert reopened.get(NAMESPACE, 'a') == (0.9, 'fake')
+    reopened.close()